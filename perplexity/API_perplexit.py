@@ -1,6 +1,14 @@
 import requests
 import datetime
 import os
+import sys
+import time
+import asyncio
+
+import aiohttp
+
+from rate_limit import TokenBucket
+from result_sink import ResultSink
 
 # Set up the API endpoint and headers
 url = "https://api.perplexity.ai/chat/completions"
@@ -17,24 +25,159 @@ payload = {
     ]
 }
 
-# Make the API call
-response = requests.post(url, headers=headers, json=payload)
-
-# Output directory and unique filename
+# Output directory
 output_dir = "/Users/chandradhitiya/Documents/vscode/bhothiyum/ouput"
-os.makedirs(output_dir, exist_ok=True)
-timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-output_path = os.path.join(output_dir, f"perplexity_output_{timestamp}.md")
-
-# Extract the content and save to markdown file
-if response.status_code == 200:
-    content = response.json()["choices"][0]['message']['content']
-    
-    # Save to markdown file
-    with open(output_path, "w", encoding="utf-8") as file:
-        file.write("# Perplexity AI Response\n\n")
-        file.write(content)
-    
-    print(f"Output saved to {output_path}")
-else:
-    print(f"Error: {response.status_code}")
\ No newline at end of file
+
+# Status codes worth retrying (rate limited / server side failures)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class AsyncPerplexityClient:
+    """Asyncio chat-completions client with a pooled keep-alive connection"""
+
+    def __init__(self, api_key=None, base_url=url, model="sonar-pro", concurrency=8,
+                 rate=None, burst=None, timeout=60, max_retries=3):
+        self.api_key = api_key or os.environ.get("PERPLEXITY_API_KEY", "API-KEY_HERE")
+        self.base_url = base_url
+        self.model = model
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        # Optional requests/sec limit on top of the concurrency bound
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.semaphore = None
+        self.session = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def open(self):
+        """Create the shared session (one connection pool for all requests)"""
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=30)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            }
+        )
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def complete(self, prompt, index=None):
+        """Send one prompt and return a result dict (never raises)"""
+        body = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}]
+        }
+        result = {"index": index, "prompt": prompt, "status": None, "content": None, "error": None}
+
+        start = None
+        for attempt in range(self.max_retries + 1):
+            delay = 2 ** attempt
+            # Hold a concurrency slot only while a request is in flight, not during backoff
+            async with self.semaphore:
+                if start is None:
+                    start = time.perf_counter()
+                if self.bucket:
+                    await self.bucket.acquire_async()
+                try:
+                    async with self.session.post(self.base_url, json=body) as response:
+                        result["status"] = response.status
+                        if response.status == 200:
+                            data = await response.json()
+                            result["content"] = data["choices"][0]["message"]["content"]
+                            result["error"] = None
+                            break
+                        result["error"] = f"HTTP {response.status}"
+                        if response.status not in RETRY_STATUSES:
+                            break
+                        retry_after = response.headers.get("Retry-After")
+                        if retry_after and retry_after.isdigit():
+                            delay = int(retry_after)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    # Includes ContentTypeError for a non-JSON 200 body
+                    result["error"] = str(e) or type(e).__name__
+                except (KeyError, IndexError, TypeError, ValueError) as e:
+                    # A 200 whose JSON is not a chat completion; retrying won't fix it
+                    result["error"] = f"malformed response: {type(e).__name__}: {e}"
+                    break
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(delay)
+
+        result["latency"] = time.perf_counter() - start
+        return result
+
+    async def stream_batch(self, prompts):
+        """Yield results as they finish, at most `concurrency` in flight"""
+        tasks = [asyncio.ensure_future(self.complete(p, i)) for i, p in enumerate(prompts)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def load_prompts(path):
+    """Read one prompt per line, skipping blanks and # comments"""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+
+
+async def run_batch(prompts_file, sink=None, **client_kwargs):
+    """Run every prompt in a file and stream results into a ResultSink"""
+    prompts = load_prompts(prompts_file)
+    owns_sink = sink is None
+    sink = sink or ResultSink(directory=output_dir, prefix="perplexity_api")
+
+    ok = 0
+    try:
+        async with AsyncPerplexityClient(**client_kwargs) as client:
+            async for result in client.stream_batch(prompts):
+                sink.write(dict(result, backend="api", timestamp=datetime.datetime.now().isoformat()))
+                ok += result["content"] is not None
+    finally:
+        if owns_sink:
+            sink.close()
+
+    print(f"{ok}/{len(prompts)} prompts succeeded, results saved under {sink.directory}")
+    return ok
+
+
+if __name__ == "__main__":
+    # Batch mode: python API_perplexit.py prompts.txt [concurrency]
+    if len(sys.argv) > 1:
+        concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+        asyncio.run(run_batch(sys.argv[1], concurrency=concurrency))
+        sys.exit(0)
+
+    # Make the API call
+    response = requests.post(url, headers=headers, json=payload)
+
+    # Extract the content and append it to the result sink
+    # (render Markdown later with: python export_markdown.py <sink files>)
+    if response.status_code == 200:
+        content = response.json()["choices"][0]['message']['content']
+
+        with ResultSink(directory=output_dir, prefix="perplexity_api") as sink:
+            sink.write({
+                "backend": "api",
+                "timestamp": datetime.datetime.now().isoformat(),
+                "prompt": payload["messages"][-1]["content"],
+                "content": content
+            })
+
+        print(f"Output saved to {sink.path}")
+    else:
+        print(f"Error: {response.status_code}")
@@ -0,0 +1,292 @@
+"""One command line for every backend: python -m perplexity <backend> ...
+
+Only the module of the backend that was asked for is imported, so a cron or
+serverless worker that runs `spider` never loads Playwright or Selenium.
+Run `python -m perplexity <backend> --help` for each backend's options.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+# The backends are flat modules next to this file that import each other
+# by bare name
+HERE = os.path.dirname(os.path.abspath(__file__))
+if HERE not in sys.path:
+    sys.path.insert(0, HERE)
+
+
+def read_lines(items):
+    """Arguments as given, with @file expanded to the file's non-empty lines"""
+    lines = []
+    for item in items:
+        if item.startswith("@"):
+            with open(item[1:], encoding="utf-8") as f:
+                lines += [line.strip() for line in f if line.strip()]
+        else:
+            lines.append(item)
+    return lines
+
+
+def load_script(name):
+    """Import a backend script that has no .py extension (playwright_sleath)"""
+    from importlib.machinery import SourceFileLoader
+    from importlib.util import module_from_spec, spec_from_loader
+
+    loader = SourceFileLoader(name, os.path.join(HERE, name))
+    module = module_from_spec(spec_from_loader(name, loader))
+    loader.exec_module(module)
+    return module
+
+
+def open_sink(args, prefix):
+    from result_sink import ResultSink
+    return ResultSink(directory=args.output_dir, prefix=prefix, format=args.format)
+
+
+# ---- backends ----
+
+def cmd_spider(args):
+    import crawer
+
+    links = read_lines(args.links)
+    if len(links) == 1 and os.path.isfile(links[0]):
+        crawer.run_spider(links_file=links[0], proxies=args.proxy or None, frontier_dir=args.frontier_dir,
+                          change_store=args.changes)
+    else:
+        crawer.run_spider(shared_links=links, proxies=args.proxy or None, frontier_dir=args.frontier_dir,
+                          change_store=args.changes)
+
+
+def cmd_playwright(args):
+    import playwright_perplexity
+    from fetch_cache import FetchCache
+
+    async def run(urls, sink):
+        ok = 0
+        async for url, result in playwright_perplexity.scrape_perplexity_shared_links(
+                urls, concurrency=args.concurrency, headless=not args.headful, cache=FetchCache()):
+            if result:
+                ok += 1
+                sink.write(dict(result, backend="playwright"))
+        print(f"{ok}/{len(urls)} links scraped")
+
+    with open_sink(args, "perplexity_playwright") as sink:
+        asyncio.run(run(read_lines(args.links), sink))
+
+
+def cmd_stealth(args):
+    playwright_sleath = load_script("playwright_sleath")
+    from fetch_cache import FetchCache
+
+    cache = FetchCache()
+    with open_sink(args, "perplexity_stealth") as sink:
+        ok = sum(playwright_sleath.scrape_shared_link(url, cache=cache, sink=sink) is not None
+                 for url in read_lines(args.links))
+    print(f"{ok} links scraped")
+
+
+def cmd_selenium(args):
+    import selinum
+
+    ok = 0
+    with selinum.PerplexityScraper(headless=not args.headful, pool_size=args.concurrency) as scraper, \
+            open_sink(args, "perplexity_selenium") as sink:
+        for url, result in scraper.scrape_many(read_lines(args.links)):
+            if result:
+                ok += 1
+                sink.write(dict(result, share_url=url, backend="selenium"))
+    print(f"{ok} links scraped")
+
+
+def cmd_search(args):
+    import requests_BS
+
+    queries = read_lines(args.queries)
+    with requests_BS.PerplexityScraper(headless=not args.headful) as scraper, \
+            open_sink(args, "perplexity_search") as sink:
+        for query, answer in zip(queries, scraper.scrape_many(queries)):
+            if answer:
+                sink.write({"backend": "search", "query": query, "answer": answer})
+
+
+def cmd_scrapingbee(args):
+    import srcapebee_perplexity
+    from fetch_cache import FetchCache
+
+    api_key = args.api_key or os.environ.get("SCRAPINGBEE_API_KEY")
+    if not api_key:
+        sys.exit("scrapingbee needs --api-key or SCRAPINGBEE_API_KEY")
+    change_store = None
+    if args.changes:
+        from change_store import ChangeStore
+        change_store = ChangeStore(args.changes)
+    scraper = srcapebee_perplexity.PerplexitySharedLinkScraper(api_key, cache=FetchCache(),
+                                                               change_store=change_store)
+    executor = srcapebee_perplexity.ScrapingBeeExecutor(scraper, concurrency=args.concurrency)
+    with open_sink(args, "perplexity_scrapingbee") as sink:
+        for url, result in executor.scrape_many(read_lines(args.links)):
+            if result and not result.get("unchanged"):
+                sink.write(dict(result, backend="scrapingbee"))
+    executor.report()
+    if change_store is not None:
+        change_store.close()
+
+
+def cmd_dispatch(args):
+    import fetch_dispatcher
+
+    tiers = [fetch_dispatcher.http_tier()]
+    api_key = args.api_key or os.environ.get("SCRAPINGBEE_API_KEY")
+    if api_key:
+        from srcapebee_perplexity import PerplexitySharedLinkScraper
+        tiers.append(fetch_dispatcher.scrapingbee_tier(PerplexitySharedLinkScraper(api_key)))
+    if not args.no_browser:
+        tiers.append(fetch_dispatcher.playwright_tier())
+    os.makedirs(os.path.dirname(args.state) or ".", exist_ok=True)
+    dispatcher = fetch_dispatcher.FetchDispatcher(tiers, state_path=args.state)
+    with open_sink(args, "perplexity_dispatch") as sink:
+        for url in read_lines(args.links):
+            result = dispatcher.scrape(url)
+            if result:
+                sink.write(result)
+    dispatcher.save()
+    dispatcher.report()
+
+
+def cmd_api(args):
+    import API_perplexit
+
+    with open_sink(args, "perplexity_api") as sink:
+        asyncio.run(API_perplexit.run_batch(args.prompts, sink=sink, concurrency=args.concurrency))
+
+
+def cmd_websocket(args):
+    import websocket_preplexity
+
+    async def run(questions, sink):
+        async with websocket_preplexity.AsyncPerplexityWebSocketClient(
+                max_in_flight=args.concurrency, sink=sink) as client:
+            async for question, response in client.query_many(questions):
+                if isinstance(response, Exception):
+                    print(f"{question}: {response}")
+
+    with open_sink(args, "perplexity_websocket") as sink:
+        asyncio.run(run(read_lines(args.questions), sink))
+
+
+def cmd_apify(args):
+    import preplextiy
+
+    with open_sink(args, "perplexity_apify") as sink:
+        asyncio.run(preplextiy.run_batch(args.actor_id, preplextiy.load_inputs(args.inputs),
+                                         sink=sink, concurrency=args.concurrency))
+
+
+def cmd_export(args):
+    import glob
+
+    import export_markdown
+
+    paths = [p for pattern in args.inputs for p in sorted(glob.glob(pattern))]
+    files = export_markdown.export(paths, args.markdown_dir, args.per_record)
+    print(f"Exported {len(paths)} input file(s) to {len(files)} Markdown file(s) in {args.markdown_dir}")
+
+
+def cmd_dedupe(args):
+    import glob
+
+    import near_duplicates
+
+    paths = [p for pattern in args.inputs for p in sorted(glob.glob(pattern))]
+    near_duplicates.dedupe(paths, args.index, args.threshold)
+
+
+def cmd_sources(args):
+    import glob
+
+    import source_index
+
+    if args.inputs:
+        paths = [p for pattern in args.inputs for p in sorted(glob.glob(pattern))]
+        source_index.build(paths, args.index)
+    source_index.report(args.index, args.domain, args.url, args.top, args.limit)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m perplexity", description=__doc__.splitlines()[0])
+    parser.add_argument("--output-dir", default="results", help="result sink directory")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default="jsonl")
+    parser.add_argument("--debug-artifacts", metavar="SPEC",
+                        help='debug screenshots: "off", "failures" or "sampled:<percent>"')
+    parser.add_argument("--metrics-port", type=int, help="serve OpenMetrics stage timings on this port")
+    parser.add_argument("--metrics-json", metavar="PATH", help="dump stage timings to this file every 15s")
+    commands = parser.add_subparsers(dest="command", metavar="backend", required=True)
+
+    def add(name, func, help, inputs="links", input_help="shared links, or @file with one per line",
+            concurrency=None, nargs="+"):
+        sub = commands.add_parser(name, help=help, description=help)
+        sub.add_argument(inputs, nargs=nargs, help=input_help)
+        if concurrency:
+            sub.add_argument("-c", "--concurrency", type=int, default=concurrency)
+        sub.set_defaults(func=func)
+        return sub
+
+    sub = add("spider", cmd_spider, "Scrapy spider (a single file argument is streamed through the frontier)")
+    sub.add_argument("--proxy", action="append", help="proxy URL; repeat for several")
+    sub.add_argument("--frontier-dir")
+    sub.add_argument("--changes", metavar="PATH", help="change store; only new or changed links are written")
+    add("playwright", cmd_playwright, "pooled headless Chromium", concurrency=8).add_argument(
+        "--headful", action="store_true")
+    add("stealth", cmd_stealth, "stealth Playwright script, one browser per link")
+    add("selenium", cmd_selenium, "pooled Selenium Chrome drivers", concurrency=4).add_argument(
+        "--headful", action="store_true")
+    add("search", cmd_search, "type queries into the Perplexity search page",
+        inputs="queries", input_help="queries, or @file with one per line").add_argument(
+        "--headful", action="store_true")
+    sub = add("scrapingbee", cmd_scrapingbee, "ScrapingBee API with tier escalation", concurrency=5)
+    sub.add_argument("--api-key")
+    sub.add_argument("--changes", metavar="PATH", help="change store; only new or changed links are written")
+    sub = add("dispatch", cmd_dispatch, "cheapest-first HTTP -> ScrapingBee -> browser dispatcher")
+    sub.add_argument("--api-key", help="ScrapingBee key; the ScrapingBee tier is skipped without one")
+    sub.add_argument("--no-browser", action="store_true", help="leave out the Playwright tier")
+    sub.add_argument("--state", default=".cache/dispatch_state.json")
+    add("api", cmd_api, "Perplexity chat-completions API", inputs="prompts",
+        input_help="file with one prompt per line", concurrency=8, nargs=None)
+    add("websocket", cmd_websocket, "Perplexity socket.io endpoint", inputs="questions",
+        input_help="questions, or @file with one per line", concurrency=16)
+    sub = add("apify", cmd_apify, "Apify actor runs", inputs="inputs", input_help="JSONL file of actor inputs",
+              concurrency=32, nargs=None)
+    sub.add_argument("--actor-id", required=True)
+    sub = add("export", cmd_export, "render sink files as Markdown", inputs="inputs",
+              input_help="JSONL/Parquet files or glob patterns")
+    sub.add_argument("--markdown-dir", default="markdown")
+    sub.add_argument("--per-record", action="store_true")
+    sub = add("dedupe", cmd_dedupe, "flag near-duplicate answers in sink files", inputs="inputs",
+              input_help="JSONL/Parquet files or glob patterns")
+    sub.add_argument("--index", default=".cache/near_duplicates.idx", help="index file, reused across runs")
+    sub.add_argument("--threshold", type=float, default=0.8, help="estimated Jaccard similarity of duplicates")
+    sub = add("sources", cmd_sources, "index cited sources of sink files and query them", inputs="inputs",
+              input_help="JSONL/Parquet files or glob patterns to add first", nargs="*")
+    sub.add_argument("--index", default=".cache/sources.sqlite3", help="index database, updated incrementally")
+    sub.add_argument("--domain", help="list answers citing this domain or its subdomains")
+    sub.add_argument("--url", help="list answers citing this URL")
+    sub.add_argument("--top", type=int, metavar="N", help="list the N most cited domains")
+    sub.add_argument("-n", "--limit", type=int, default=50, help="answers listed per query")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # Read by debug_artifacts and metrics when the backend first imports them
+    if args.debug_artifacts:
+        os.environ["PERPLEXITY_DEBUG_ARTIFACTS"] = args.debug_artifacts
+    if args.metrics_port:
+        os.environ["PERPLEXITY_METRICS_PORT"] = str(args.metrics_port)
+    if args.metrics_json:
+        os.environ["PERPLEXITY_METRICS_JSON"] = args.metrics_json
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
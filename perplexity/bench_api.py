@@ -0,0 +1,40 @@
+import asyncio
+import sys
+import time
+
+from API_perplexit import AsyncPerplexityClient
+from benchmark import summarize, print_table, dump_json
+from mock_servers import LocalServer, ChatCompletionsHandler
+
+
+async def run_level(base_url, concurrency, requests_count):
+    """Send `requests_count` prompts at one concurrency level"""
+    prompts = [f"prompt {i}" for i in range(requests_count)]
+    latencies = []
+    async with AsyncPerplexityClient(api_key="bench", base_url=base_url, concurrency=concurrency) as client:
+        start = time.perf_counter()
+        async for result in client.stream_batch(prompts):
+            if result["content"] is not None:
+                latencies.append(result["latency"])
+        elapsed = time.perf_counter() - start
+    return summarize(latencies, elapsed, concurrency=concurrency, errors=requests_count - len(latencies))
+
+
+def main(levels=(1, 4, 16, 64), requests_count=256, latency=0.05, json_path=None):
+    ChatCompletionsHandler.latency = latency
+    with LocalServer(ChatCompletionsHandler) as server:
+        endpoint = server.base_url + "/chat/completions"
+        rows = [asyncio.run(run_level(endpoint, c, requests_count)) for c in levels]
+
+    print_table(rows, ["concurrency", "count", "errors", "per_sec", "p50_ms", "p99_ms"])
+    if json_path:
+        dump_json({"benchmark": "api_chat_completions", "results": rows}, json_path)
+    return rows
+
+
+if __name__ == "__main__":
+    # python bench_api.py [requests] [json_output]
+    main(
+        requests_count=int(sys.argv[1]) if len(sys.argv) > 1 else 256,
+        json_path=sys.argv[2] if len(sys.argv) > 2 else None
+    )
@@ -0,0 +1,99 @@
+import asyncio
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+
+from benchmark import dump_json, print_table
+from mock_servers import LocalServer, apify_handler
+from preplextiy import ApifyRunManager
+from result_sink import ResultSink
+
+# Run times in seconds, cycled over the inputs. Each is well clear of the 1 s
+# waitForFinish long poll and of the backoff poll after it, so every run
+# takes a fixed number of polls
+RUN_SECONDS = (0.2, 0.5, 1.4, 1.7)
+WAIT_FOR_FINISH = 1
+
+
+def inputs(count, items, failing):
+    """Actor inputs: `failing` runs that fail, the rest return `items` items each
+
+    Runs outlasting the waitForFinish long poll are polled again after a
+    backoff.
+    """
+    return [{"query": f"question {i}", "maxResults": items, "runSeconds": RUN_SECONDS[i % len(RUN_SECONDS)],
+             "fail": i < failing} for i in range(count)]
+
+
+def expected_polls(runs):
+    """Polls each run needs: one, plus one more if it outlasts the long poll"""
+    return sum(1 + (run["runSeconds"] > WAIT_FOR_FINISH) for run in runs)
+
+
+async def run_all(base_url, runs, page_size, sink):
+    summaries = []
+    # A connection per run, so no long poll queues behind another one and
+    # the poll count does not depend on timing
+    async with ApifyRunManager("bench~actor", token="bench", base_url=f"{base_url}/v2", concurrency=len(runs),
+                               poll_initial=0.1, poll_max=1.0, wait_for_finish=WAIT_FOR_FINISH,
+                               page_size=page_size) as manager:
+        async for summary in manager.run_many(runs, sink):
+            summaries.append(summary)
+        stats = dict(manager.stats)
+    return summaries, stats
+
+
+def main(count=51, items=345, failing=1, page_size=100, json_path=None):
+    handler = apify_handler()
+    runs = inputs(count, items, failing)
+    with tempfile.TemporaryDirectory() as directory, LocalServer(handler) as server:
+        start = time.perf_counter()
+        with ResultSink(directory=directory, prefix="bench_apify") as sink:
+            summaries, stats = asyncio.run(run_all(server.base_url, runs, page_size, sink))
+        elapsed = time.perf_counter() - start
+        records = [json.loads(line) for path in glob.glob(os.path.join(directory, "*.jsonl"))
+                   for line in open(path, encoding="utf-8")]
+
+    succeeded = count - failing
+    pages_per_run = items // page_size + 1
+    by_status = {}
+    for summary in summaries:
+        by_status[summary["status"]] = by_status.get(summary["status"], 0) + 1
+
+    # Every run finishes once, failed runs are counted and not drained, and
+    # every item of the others reaches the sink, tagged with its run
+    assert len(summaries) == count, summaries
+    assert by_status == {"SUCCEEDED": succeeded, "FAILED": failing}, by_status
+    assert not any(s["error"] for s in summaries), [s["error"] for s in summaries if s["error"]]
+    assert stats["runs"] == handler.counts["starts"] == count, (stats, handler.counts)
+    assert stats["failed"] == failing, stats
+    assert stats["items"] == len(records) == succeeded * items, (stats, len(records))
+    assert stats["pages"] == handler.counts["pages"] == succeeded * pages_per_run, (stats, handler.counts)
+    assert stats["polls"] == handler.counts["polls"] == expected_polls(runs), (stats, handler.counts)
+    assert all(s["items"] == (0 if s["status"] == "FAILED" else items) for s in summaries)
+    assert len({(r["run_id"], r["rank"]) for r in records}) == len(records)
+
+    row = {
+        "runs": count,
+        "failed": stats["failed"],
+        "items": stats["items"],
+        "polls": stats["polls"],
+        "pages": stats["pages"],
+        "elapsed_s": round(elapsed, 2),
+        "items_per_sec": round(stats["items"] / elapsed),
+    }
+    print_table([row], list(row))
+    if json_path:
+        dump_json({"benchmark": "apify_runs", "page_size": page_size, "results": [row]}, json_path)
+    return row
+
+
+if __name__ == "__main__":
+    # python bench_apify.py [runs] [json_output]
+    main(
+        count=int(sys.argv[1]) if len(sys.argv) > 1 else 51,
+        json_path=sys.argv[2] if len(sys.argv) > 2 else None
+    )
@@ -0,0 +1,81 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmark import dump_json, print_table
+from change_store import ChangeStore
+from metrics import default_metrics
+from mock_servers import LocalServer, fixture_site, shared_link_html
+from result_sink import ResultSink
+from srcapebee_perplexity import PerplexitySharedLinkScraper, ScrapingBeeExecutor
+
+
+def parses():
+    stage = default_metrics.snapshot()["stages"].get("scrapingbee.extract")
+    return stage["count"] if stage else 0
+
+
+def run(name, base_url, count, directory, change_store=None):
+    """One scheduled re-scrape of every link through the ScrapingBee scraper"""
+    scraper = PerplexitySharedLinkScraper("bench-key", change_store=change_store)
+    scraper.client.HTML_API_URL = f"{base_url}/api/v1/"
+    scraper.random_delay = lambda: None
+    executor = ScrapingBeeExecutor(scraper, concurrency=8)
+    sink_dir = os.path.join(directory, name)
+    parsed_before = parses()
+    start = time.perf_counter()
+    written = 0
+    with ResultSink(directory=sink_dir, prefix="bench") as sink:
+        for _, result in executor.scrape_many(f"https://www.perplexity.ai/search/{i}" for i in range(count)):
+            if result and not result.get("unchanged"):
+                sink.write(dict(result, backend="scrapingbee"))
+                written += 1
+    elapsed = time.perf_counter() - start
+    return {
+        "run": name,
+        "links": count,
+        "parsed": parses() - parsed_before,
+        "written": written,
+        "written_kb": round(sum(e.stat().st_size for e in os.scandir(sink_dir)) / 1024, 1),
+        "elapsed_s": round(elapsed, 2),
+        "links_per_sec": round(count / elapsed, 1),
+    }
+
+
+def main(count=300, changed_pct=5, noise_pct=10, json_path=None):
+    rng = random.Random(0)
+    pages = [shared_link_html(i, padding_kb=16) for i in range(count)]
+    rows = []
+    with tempfile.TemporaryDirectory() as directory, LocalServer(fixture_site(pages, latency=0)) as server:
+        served = server.httpd.RequestHandlerClass.pages
+        with ChangeStore(os.path.join(directory, "changes.sqlite3")) as store:
+            rows.append(run("first run", server.base_url, count, directory, store))
+
+            # Between runs a few answers change, and more pages change only in
+            # bytes the extractor ignores (build ids, nonces)
+            links = rng.sample(range(count), count * (changed_pct + noise_pct) // 100)
+            changed = links[:count * changed_pct // 100]
+            for i in changed:
+                served[i] = shared_link_html(i + count, padding_kb=16)
+            for i in links[len(changed):]:
+                served[i] = served[i].replace("<head>", '<head><meta name="build" content="2">')
+
+            rows.append(run("rescrape full", server.base_url, count, directory))
+            rows.append(run("rescrape incremental", server.base_url, count, directory, store))
+            stats = dict(store.stats)
+    print_table(rows, ["run", "links", "parsed", "written", "written_kb", "elapsed_s", "links_per_sec"])
+    print(f"Change store: {stats}")
+    if json_path:
+        dump_json({"benchmark": "changes", "changed_pct": changed_pct, "noise_pct": noise_pct,
+                   "store": stats, "results": rows}, json_path)
+    return rows
+
+
+if __name__ == "__main__":
+    # python bench_changes.py [links] [json_output]
+    main(
+        count=int(sys.argv[1]) if len(sys.argv) > 1 else 300,
+        json_path=sys.argv[2] if len(sys.argv) > 2 else None
+    )
@@ -0,0 +1,40 @@
+import sys
+import time
+
+from benchmark import dump_json, print_table, summarize
+from mock_servers import LocalServer, SearchPageHandler
+from requests_BS import PerplexityScraper
+
+
+def run(base_url, strategy, queries):
+    """Time each query in one session with the given wait strategy"""
+    scraper = PerplexityScraper(headless=True, search_url=base_url, visit_google=False,
+                                wait_strategy=strategy, quiet_ms=800)
+    latencies, complete = [], 0
+    start = time.perf_counter()
+    with scraper:
+        for query in queries:
+            t0 = time.perf_counter()
+            result = scraper.scrape(query, max_retries=1)
+            latencies.append(time.perf_counter() - t0)
+            complete += bool(result and result.rstrip().endswith("[END]"))
+    return summarize(latencies, time.perf_counter() - start, strategy=strategy, complete=complete)
+
+
+def main(count=5, json_path=None):
+    queries = [f"completion query {i}" for i in range(count)]
+    with LocalServer(SearchPageHandler) as server:
+        rows = [run(server.base_url, strategy, queries) for strategy in ("sleep", "stable")]
+
+    print_table(rows, ["strategy", "count", "complete", "mean_ms", "p50_ms", "p95_ms"])
+    if json_path:
+        dump_json({"benchmark": "completion_detection", "results": rows}, json_path)
+    return rows
+
+
+if __name__ == "__main__":
+    # python bench_completion.py [queries] [json_output]
+    main(
+        count=int(sys.argv[1]) if len(sys.argv) > 1 else 5,
+        json_path=sys.argv[2] if len(sys.argv) > 2 else None
+    )
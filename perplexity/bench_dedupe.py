@@ -0,0 +1,116 @@
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import deque
+
+from benchmark import dump_json, percentile, print_table, summarize
+from near_duplicates import NearDuplicateIndex
+
+WORDS = ["quantum", "model", "answer", "source", "india", "cars", "engine", "price", "battery", "range",
+         "safety", "design", "market", "growth", "policy", "data", "energy", "climate", "health", "study"]
+
+
+def corpus(count, seed=0, near_pct=20, exact_pct=10, window=100_000):
+    """Yield (answer, source) for a synthetic stream of answers
+
+    Answers are eight sentences drawn from a large sentence pool. near_pct %
+    re-use one of the last `window` new answers with one to three words
+    changed (re-scrapes, citation and formatting drift), exact_pct % repeat
+    one verbatim; source is the index of the original answer, or None for
+    new answers.
+    """
+    rng = random.Random(seed)
+    vocabulary = [f"{rng.choice(WORDS)}{i}" for i in range(5000)]
+    sentences = [" ".join(rng.choices(vocabulary, k=15)) + "." for _ in range(50000)]
+    originals = deque(maxlen=window)  # (index, sentence numbers)
+    for i in range(count):
+        roll = rng.random() * 100
+        if originals and roll < near_pct + exact_pct:
+            source, picked = originals[rng.randrange(len(originals))]
+            words = " ".join(sentences[n] for n in picked).split()
+            if roll < near_pct:
+                for _ in range(rng.randint(1, 3)):
+                    words[rng.randrange(len(words))] = rng.choice(vocabulary)
+            yield " ".join(words), source
+        else:
+            picked = [rng.randrange(len(sentences)) for _ in range(8)]
+            originals.append((i, picked))
+            yield " ".join(sentences[n] for n in picked), None
+
+
+def main(count=1_000_000, json_path=None):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "answers.idx")
+        index = NearDuplicateIndex(path)
+        latencies = []
+        truth = []
+        flagged = correct = false_flags = missed = 0
+
+        start = time.perf_counter()
+        for answer, source in corpus(count):
+            t = time.perf_counter()
+            item_id, duplicate_of = index.add(answer)
+            latencies.append(time.perf_counter() - t)
+            truth.append(source if source is not None else item_id)
+            if duplicate_of is None:
+                missed += source is not None
+            else:
+                flagged += 1
+                # Right if it landed in the cluster of the answer it was copied from
+                if source is None:
+                    false_flags += 1
+                elif truth[duplicate_of] == source:
+                    correct += 1
+        elapsed = time.perf_counter() - start
+
+        t = time.perf_counter()
+        index.save()
+        save_s = time.perf_counter() - t
+        index.close()
+
+        # Re-open the mapped file and query it like a fresh process would
+        t = time.perf_counter()
+        index = NearDuplicateIndex(path)
+        open_ms = (time.perf_counter() - t) * 1000
+        probes = [answer for answer, _ in corpus(1000, seed=1)]
+        t = time.perf_counter()
+        for answer in probes:
+            index.query(answer)
+        query_us = (time.perf_counter() - t) / len(probes) * 1e6
+        file_bytes = os.path.getsize(path)
+        clusters = len(index.clusters_of())
+        index.close()
+
+    duplicates = sum(1 for i, source in enumerate(truth) if source != i)
+    row = summarize(latencies, elapsed, answers=count)
+    row.update({
+        "inserts_per_sec": round(count / elapsed),
+        "p50_us": round(percentile(latencies, 50) * 1e6),
+        "p99_us": round(percentile(latencies, 99) * 1e6),
+        "recall": round((flagged - false_flags) / duplicates, 4) if duplicates else None,
+        "precision": round(correct / flagged, 4) if flagged else None,
+        "false_flags": false_flags,
+        "missed": missed,
+        "clusters": clusters,
+        "index_mb": round(file_bytes / 1024 / 1024, 1),
+        "bytes_per_answer": round(file_bytes / count, 1),
+        "save_s": round(save_s, 2),
+        "open_ms": round(open_ms, 2),
+        "query_us_mapped": round(query_us),
+    })
+    print_table([row], ["answers", "inserts_per_sec", "p50_us", "p99_us", "recall", "precision", "clusters"])
+    print()
+    print_table([row], ["index_mb", "bytes_per_answer", "save_s", "open_ms", "query_us_mapped"])
+    if json_path:
+        dump_json({"benchmark": "near_duplicates", "results": [row]}, json_path)
+    return row
+
+
+if __name__ == "__main__":
+    # python bench_dedupe.py [answers] [json_output]
+    main(
+        count=int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+        json_path=sys.argv[2] if len(sys.argv) > 2 else None
+    )
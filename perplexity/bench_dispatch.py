@@ -0,0 +1,64 @@
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmark import dump_json, print_table
+from fetch_dispatcher import FetchDispatcher, http_tier, scrapingbee_tier
+from mock_servers import LocalServer, TieredSiteHandler, scrapingbee_handler
+from srcapebee_perplexity import PARAM_TIERS, PerplexitySharedLinkScraper
+
+
+def make_scraper(server):
+    scraper = PerplexitySharedLinkScraper("bench-key", tiers=PARAM_TIERS)
+    scraper.client.HTML_API_URL = f"{server.base_url}/api/v1/"
+    scraper.random_delay = lambda: None
+    return scraper
+
+
+def run(name, site, bee, urls, concurrency, learn):
+    scraper = make_scraper(bee)
+    tiers = [scrapingbee_tier(scraper)] if name == "scrapingbee-only" else [http_tier(), scrapingbee_tier(scraper)]
+    # min_samples above the link count turns learning off
+    dispatcher = FetchDispatcher(tiers, min_samples=5 if learn else len(urls) + 1, explore=0.02)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pages = sum(result is not None for result in pool.map(dispatcher.scrape, urls))
+    elapsed = time.perf_counter() - start
+    stats = dispatcher.stats()
+    return {
+        "mode": name,
+        "links": len(urls),
+        "pages": pages,
+        "attempts": sum(s["attempts"] for s in stats),
+        "wasted": sum(s["attempts"] - s["successes"] for s in stats),
+        "elapsed_s": round(elapsed, 2),
+        "pages_per_sec": round(pages / elapsed, 2),
+        "credits": scraper.credits["spent"],
+        "tiers": stats,
+    }
+
+
+def main(count=300, concurrency=5, json_path=None):
+    with LocalServer(TieredSiteHandler) as site, LocalServer(scrapingbee_handler(max_concurrent=concurrency)) as bee:
+        kinds = ["static", "app", "gated"]
+        urls = [f"{site.base_url}/{kinds[i % 3]}/bench-{i}" for i in range(count)]
+        rows = [
+            run("scrapingbee-only", site, bee, urls, concurrency, learn=False),
+            run("escalate", site, bee, urls, concurrency, learn=False),
+            run("escalate-learned", site, bee, urls, concurrency, learn=True),
+        ]
+    print_table(rows, ["mode", "pages", "attempts", "wasted", "elapsed_s", "pages_per_sec", "credits"])
+    print()
+    print_table([dict(t, mode=r["mode"]) for r in rows for t in r["tiers"]],
+                ["mode", "tier", "attempts", "successes", "skipped", "success_rate", "p50_ms", "p95_ms"])
+    if json_path:
+        dump_json({"benchmark": "fetch_dispatch", "results": rows}, json_path)
+    return rows
+
+
+if __name__ == "__main__":
+    # python bench_dispatch.py [links] [json_output]
+    main(
+        count=int(sys.argv[1]) if len(sys.argv) > 1 else 300,
+        json_path=sys.argv[2] if len(sys.argv) > 2 else None
+    )
@@ -0,0 +1,89 @@
+import glob
+import multiprocessing
+import os
+import re
+import resource
+import sys
+import time
+
+from benchmark import dump_json, print_table
+from mock_servers import shared_link_html
+
+
+def legacy_bs4_extract(html):
+    """The BeautifulSoup extraction the ScrapingBee scraper used before extractor.py"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    content_div = soup.find('div', class_=re.compile(r'prose|shared-content|answer-container'))
+    return {
+        'title': soup.title.string if soup.title else None,
+        'main_answer': content_div.get_text(" ", strip=True) if content_div else None,
+        'sources': [{'text': a.get_text(strip=True), 'url': a['href']}
+                    for a in soup.select('footer a[href^="http"]')],
+        'related': [li.get_text(strip=True) for li in soup.select('.related-content li, .suggested-questions li')],
+    }
+
+
+def load_corpus(corpus_dir=None, count=200):
+    """Saved shared-link pages from a directory, or a synthetic corpus"""
+    if corpus_dir:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(corpus_dir, "**", "*.htm*"), recursive=True)):
+            with open(path, "rb") as f:
+                pages.append(f.read())
+        return pages
+    return [shared_link_html(i).encode("utf-8") for i in range(count)]
+
+
+def run_engine(name, corpus_dir, count, queue):
+    """Child process: time one engine over the corpus and report peak RSS growth"""
+    if name == "lxml":
+        from extractor import extract
+    else:
+        extract = legacy_bs4_extract
+    pages = load_corpus(corpus_dir, count)
+    extract(pages[0])  # import and selector warm-up
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    for html in pages:
+        extract(html)
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    queue.put({
+        "engine": name,
+        "pages": len(pages),
+        "mb": round(sum(map(len, pages)) / 1024 / 1024, 1),
+        "elapsed_s": round(elapsed, 3),
+        "pages_per_sec": round(len(pages) / elapsed, 1),
+        # ru_maxrss is KB on Linux
+        "peak_rss_mb": round(rss_after / 1024, 1),
+        "rss_growth_mb": round((rss_after - rss_before) / 1024, 1),
+    })
+
+
+def main(corpus_dir=None, count=200, json_path=None):
+    ctx = multiprocessing.get_context("spawn")
+    rows = []
+    for name in ("bs4", "lxml"):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=run_engine, args=(name, corpus_dir, count, queue))
+        proc.start()
+        rows.append(queue.get())
+        proc.join()
+
+    rows[1]["speedup"] = round(rows[1]["pages_per_sec"] / rows[0]["pages_per_sec"], 2)
+    print_table(rows, ["engine", "pages", "mb", "pages_per_sec", "peak_rss_mb", "rss_growth_mb", "speedup"])
+    if json_path:
+        dump_json({"benchmark": "extraction", "results": rows}, json_path)
+    return rows
+
+
+if __name__ == "__main__":
+    # python bench_extract.py [corpus_dir|-] [json_output]
+    main(
+        corpus_dir=sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] != "-" else None,
+        json_path=sys.argv[2] if len(sys.argv) > 2 else None
+    )
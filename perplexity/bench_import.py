@@ -0,0 +1,92 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmark import dump_json, print_table
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# CLI backend -> module it imports (see __main__.py)
+BACKEND_MODULES = {
+    "spider": "crawer",
+    "playwright": "playwright_perplexity",
+    "stealth": "playwright_sleath",
+    "selenium": "selinum",
+    "search": "requests_BS",
+    "scrapingbee": "srcapebee_perplexity",
+    "dispatch": "fetch_dispatcher",
+    "api": "API_perplexit",
+    "websocket": "websocket_preplexity",
+    "apify": "preplextiy",
+    "export": "export_markdown",
+    "dedupe": "near_duplicates",
+    "sources": "source_index",
+}
+
+SNIPPET = """
+import sys, time
+sys.path.insert(0, {here!r})
+start = time.perf_counter()
+if {module!r} == "playwright_sleath":
+    from importlib.machinery import SourceFileLoader
+    from importlib.util import module_from_spec, spec_from_loader
+    loader = SourceFileLoader("playwright_sleath", {here!r} + "/playwright_sleath")
+    loader.exec_module(module_from_spec(spec_from_loader("playwright_sleath", loader)))
+else:
+    __import__({module!r})
+print(time.perf_counter() - start)
+"""
+
+
+def time_import(module, runs):
+    """Import time of `module` in fresh interpreters, plus total process wall time"""
+    imports, walls = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", SNIPPET.format(here=HERE, module=module)],
+                              capture_output=True, text=True)
+        walls.append(time.perf_counter() - start)
+        if proc.returncode:
+            return {"error": proc.stderr.strip().splitlines()[-1]}
+        imports.append(float(proc.stdout.strip()))
+    return {"import_ms": round(statistics.median(imports) * 1000, 1),
+            "import_min_ms": round(min(imports) * 1000, 1),
+            "process_ms": round(statistics.median(walls) * 1000, 1)}
+
+
+def main(backends=None, runs=5, budget_ms=None, json_path=None):
+    rows = []
+    for backend in backends or BACKEND_MODULES:
+        row = dict(backend=backend, module=BACKEND_MODULES[backend], **time_import(BACKEND_MODULES[backend], runs))
+        if budget_ms is not None and "error" not in row:
+            row["within_budget"] = row["process_ms"] <= budget_ms
+        rows.append(row)
+
+    # The CLI itself, before any backend is imported
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "perplexity", "--help"], cwd=os.path.dirname(HERE),
+                   capture_output=True)
+    cli_ms = round((time.perf_counter() - start) * 1000, 1)
+
+    print_table(rows, ["backend", "module", "import_ms", "import_min_ms", "process_ms", "within_budget", "error"])
+    print(f"\npython -m perplexity --help: {cli_ms} ms")
+    if json_path:
+        dump_json({"benchmark": "import_time", "runs": runs, "budget_ms": budget_ms,
+                   "cli_help_ms": cli_ms, "results": rows}, json_path)
+    return all(row.get("within_budget", True) for row in rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold-start import time of each CLI backend")
+    parser.add_argument("backends", nargs="*", help=f"any of {', '.join(BACKEND_MODULES)} (default: all)")
+    parser.add_argument("-n", "--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, help="exit with status 1 if a backend's process time exceeds this")
+    parser.add_argument("-o", "--output", help="write the JSON report here")
+    args = parser.parse_args()
+    unknown = set(args.backends) - set(BACKEND_MODULES)
+    if unknown:
+        parser.error(f"unknown backend(s): {', '.join(sorted(unknown))}")
+    sys.exit(0 if main(args.backends, args.runs, args.budget_ms, args.output) else 1)
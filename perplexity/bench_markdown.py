@@ -0,0 +1,90 @@
+import sys
+import time
+import tracemalloc
+
+import lxml.html
+
+from benchmark import dump_json, percentile, print_table
+from extractor import CONTENT_XPATHS, extract, first_match, parse
+from html_markdown import to_markdown
+from mock_servers import shared_link_html
+
+URL = "https://www.perplexity.ai/search/bench"
+
+
+def html2text_markdown(markup):
+    import html2text
+
+    h = html2text.HTML2Text()
+    h.ignore_links = False
+    h.ignore_images = True
+    return h.handle(markup).strip()
+
+
+def html2text_pipeline(html):
+    """What the ScrapingBee scraper did before: serialize the answer, re-parse it with html2text"""
+    return html2text_markdown(extract(html, url=URL, with_html=True)["main_html"])
+
+
+def single_pass_pipeline(html):
+    """extract() converting the answer element straight from the parsed tree"""
+    return extract(html, url=URL, with_markdown=True)["main_markdown"]
+
+
+PIPELINES = {
+    # name -> (whole pipeline on raw HTML, conversion of an already parsed answer element)
+    "html2text": (html2text_pipeline,
+                  lambda element: html2text_markdown(lxml.html.tostring(element, encoding="unicode"))),
+    "single_pass": (single_pass_pipeline, lambda element: to_markdown(element, base_url=URL)),
+}
+
+
+def run(name, pages):
+    pipeline, convert = PIPELINES[name]
+    pipeline(pages[0])  # imports and selector warm-up
+
+    latencies = []
+    start = time.perf_counter()
+    for html in pages:
+        t = time.perf_counter()
+        pipeline(html)
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+
+    # Allocation peak of the conversion alone, on an already parsed tree; the
+    # parse is the same for both and would swamp the difference
+    peaks = []
+    for html in pages[:20]:
+        element = first_match(parse(html), CONTENT_XPATHS)[0]
+        tracemalloc.start()
+        convert(element)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return {
+        "pipeline": name,
+        "pages": len(pages),
+        "ms_per_page": round(elapsed / len(pages) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "convert_alloc_kb": round(max(peaks) / 1024, 1),
+        "markdown_kb": round(len(pipeline(pages[0]).encode("utf-8")) / 1024, 1),
+    }
+
+
+def main(count=100, sections=30, json_path=None):
+    # Long multi-section answers, where conversion dominates the parse
+    pages = [shared_link_html(i, sections=sections, paragraphs=6) for i in range(count)]
+    rows = [run(name, pages) for name in PIPELINES]
+    rows[1]["speedup"] = round(rows[0]["ms_per_page"] / rows[1]["ms_per_page"], 2)
+    print_table(rows, ["pipeline", "pages", "ms_per_page", "p95_ms", "convert_alloc_kb", "markdown_kb", "speedup"])
+    if json_path:
+        dump_json({"benchmark": "markdown", "sections": sections, "results": rows}, json_path)
+    return rows
+
+
+if __name__ == "__main__":
+    # python bench_markdown.py [pages] [json_output]
+    main(
+        count=int(sys.argv[1]) if len(sys.argv) > 1 else 100,
+        json_path=sys.argv[2] if len(sys.argv) > 2 else None
+    )
@@ -0,0 +1,64 @@
+import sys
+import time
+
+from playwright.sync_api import sync_playwright
+
+from benchmark import dump_json, print_table, summarize
+from mock_servers import HeavyPageHandler, LocalServer
+from resource_filter import DEFAULT_DENIED_DOMAINS, ResourceFilter
+
+
+def load_pages(browser, url, resource_filter, count):
+    """Load the fixture `count` times and return per-page load latencies"""
+    latencies = []
+    context = browser.new_context()
+    for _ in range(count):
+        page = context.new_page()
+        resource_filter.install(page)
+        start = time.perf_counter()
+        page.goto(url, wait_until="load")
+        page.inner_text(".prose")
+        latencies.append(time.perf_counter() - start)
+        page.close()
+    context.close()
+    return latencies
+
+
+def main(count=20, json_path=None):
+    filters = {
+        # Allow-all filter still counts bytes, giving the unfiltered baseline
+        "unfiltered": ResourceFilter(allowed_types=None, denied_domains=()),
+        "filtered": ResourceFilter(denied_domains=DEFAULT_DENIED_DOMAINS | {"localhost"}),
+    }
+    rows = []
+    with LocalServer(HeavyPageHandler) as server, sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        for name, resource_filter in filters.items():
+            start = time.perf_counter()
+            latencies = load_pages(browser, server.base_url + "/", resource_filter, count)
+            totals = resource_filter.summary()
+            rows.append(summarize(
+                latencies, time.perf_counter() - start,
+                mode=name,
+                kb_per_page=round(totals["bytes_loaded"] / count / 1024, 1),
+                requests_per_page=round(totals["requests_allowed"] / count, 1),
+                saved_per_page=round(totals["requests_saved"] / count, 1)
+            ))
+        browser.close()
+
+    base, filtered = rows
+    filtered["kb_saved_per_page"] = round(base["kb_per_page"] - filtered["kb_per_page"], 1)
+    filtered["load_time_change_pct"] = round((filtered["mean_ms"] / base["mean_ms"] - 1) * 100, 1)
+    print_table(rows, ["mode", "count", "mean_ms", "p95_ms", "kb_per_page", "requests_per_page",
+                       "saved_per_page", "kb_saved_per_page", "load_time_change_pct"])
+    if json_path:
+        dump_json({"benchmark": "resource_filter", "results": rows}, json_path)
+    return rows
+
+
+if __name__ == "__main__":
+    # python bench_resources.py [pages] [json_output]
+    main(
+        count=int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+        json_path=sys.argv[2] if len(sys.argv) > 2 else None
+    )
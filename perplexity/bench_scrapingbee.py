@@ -0,0 +1,56 @@
+import sys
+import time
+
+from benchmark import dump_json, print_table
+from mock_servers import LocalServer, scrapingbee_handler
+from srcapebee_perplexity import PARAM_TIERS, PerplexitySharedLinkScraper, ScrapingBeeExecutor
+
+
+def make_scraper(server, tiers):
+    scraper = PerplexitySharedLinkScraper("bench-key", tiers=tiers)
+    scraper.client.HTML_API_URL = f"{server.base_url}/api/v1/"
+    scraper.random_delay = lambda: None
+    return scraper
+
+
+def run(name, server, urls, tiers, concurrency):
+    scraper = make_scraper(server, tiers)
+    start = time.perf_counter()
+    if concurrency == 1:
+        pages = sum(scraper.scrape_shared_link(url) is not None for url in urls)
+    else:
+        pages = sum(result is not None for _, result in ScrapingBeeExecutor(scraper, concurrency).scrape_many(urls))
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": name,
+        "concurrency": concurrency,
+        "links": len(urls),
+        "pages": pages,
+        "elapsed_s": round(elapsed, 2),
+        "pages_per_sec": round(pages / elapsed, 2),
+        "credits": scraper.credits["spent"],
+        "credits_per_page": round(scraper.credits_per_page or 0, 1),
+    }
+
+
+def main(count=100, concurrency=5, json_path=None):
+    urls = [f"https://www.perplexity.ai/search/bench-{i}" for i in range(count)]
+    with LocalServer(scrapingbee_handler(max_concurrent=concurrency)) as server:
+        rows = [
+            # What the scraper did before: one link at a time, always the stealth parameters
+            run("sequential-stealth", server, urls, PARAM_TIERS[-1:], 1),
+            run("sequential-escalating", server, urls, PARAM_TIERS, 1),
+            run("executor-escalating", server, urls, PARAM_TIERS, concurrency),
+        ]
+    print_table(rows, ["mode", "concurrency", "pages", "elapsed_s", "pages_per_sec", "credits", "credits_per_page"])
+    if json_path:
+        dump_json({"benchmark": "scrapingbee_executor", "results": rows}, json_path)
+    return rows
+
+
+if __name__ == "__main__":
+    # python bench_scrapingbee.py [links] [json_output]
+    main(
+        count=int(sys.argv[1]) if len(sys.argv) > 1 else 100,
+        json_path=sys.argv[2] if len(sys.argv) > 2 else None
+    )
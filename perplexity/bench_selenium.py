@@ -0,0 +1,59 @@
+import contextlib
+import io
+import sys
+import time
+
+from benchmark import dump_json, print_table
+from mock_servers import LocalServer, StandInDriver, TieredSiteHandler
+from selinum import PerplexityScraper
+
+
+def run(name, urls, pool_size, max_uses, launch_seconds, warmup_url):
+    scraper = PerplexityScraper(headless=True, pool_size=pool_size, max_uses=max_uses)
+    scraper.warmup_url = warmup_url
+
+    def setup_driver():
+        return StandInDriver(launch_seconds)
+
+    scraper.setup_driver = setup_driver
+    start = time.perf_counter()
+    with scraper, contextlib.redirect_stdout(io.StringIO()):
+        if pool_size == 1:
+            results = [scraper.scrape_shared_link(url) for url in urls]
+        else:
+            results = [result for _, result in scraper.scrape_many(urls)]
+    elapsed = time.perf_counter() - start
+    pages = sum(1 for r in results if r and r["main_answer"] != "Not found")
+    return {
+        "mode": name,
+        "pool_size": pool_size,
+        "max_uses": max_uses,
+        "links": len(urls),
+        "pages": pages,
+        "drivers": scraper.pool.stats["created"],
+        "elapsed_s": round(elapsed, 2),
+        "urls_per_min": round(pages / elapsed * 60, 1),
+    }
+
+
+def main(count=40, pool_size=4, launch_seconds=1.0, json_path=None):
+    with LocalServer(TieredSiteHandler) as site:
+        urls = [f"{site.base_url}/static/bench-{i}" for i in range(count)]
+        rows = [
+            # The previous behaviour: a fresh driver (and Google visit) for every link
+            run("per-call", urls, 1, 1, launch_seconds, site.base_url),
+            run("warm-1", urls, 1, 50, launch_seconds, site.base_url),
+            run(f"pool-{pool_size}", urls, pool_size, 50, launch_seconds, site.base_url),
+        ]
+    print_table(rows, ["mode", "pool_size", "pages", "drivers", "elapsed_s", "urls_per_min"])
+    if json_path:
+        dump_json({"benchmark": "selenium_pool", "launch_seconds": launch_seconds, "results": rows}, json_path)
+    return rows
+
+
+if __name__ == "__main__":
+    # python bench_selenium.py [links] [json_output]
+    main(
+        count=int(sys.argv[1]) if len(sys.argv) > 1 else 40,
+        json_path=sys.argv[2] if len(sys.argv) > 2 else None
+    )
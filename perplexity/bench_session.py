@@ -0,0 +1,51 @@
+import sys
+import time
+
+from benchmark import dump_json, print_table
+from mock_servers import LocalServer, SearchPageHandler
+from requests_BS import PerplexityScraper
+
+
+def per_call(base_url, queries):
+    """Current behaviour: one browser launch per scrape() call"""
+    scraper = PerplexityScraper(headless=True, search_url=base_url, visit_google=False)
+    start = time.perf_counter()
+    ok = sum(scraper.scrape(q) is not None for q in queries)
+    return ok, time.perf_counter() - start
+
+
+def session(base_url, queries):
+    """Session mode: one warm browser and page for every query"""
+    scraper = PerplexityScraper(headless=True, search_url=base_url, visit_google=False)
+    start = time.perf_counter()
+    ok = sum(r is not None for r in scraper.scrape_many(queries))
+    return ok, time.perf_counter() - start
+
+
+def main(count=5, json_path=None):
+    queries = [f"benchmark query {i}" for i in range(count)]
+    rows = []
+    with LocalServer(SearchPageHandler) as server:
+        for name, runner in (("per_call", per_call), ("session", session)):
+            ok, elapsed = runner(server.base_url, queries)
+            rows.append({
+                "mode": name,
+                "queries": count,
+                "ok": ok,
+                "elapsed_s": round(elapsed, 2),
+                "queries_per_min": round(count / elapsed * 60, 2)
+            })
+
+    rows[1]["speedup"] = round(rows[1]["queries_per_min"] / rows[0]["queries_per_min"], 2)
+    print_table(rows, ["mode", "queries", "ok", "elapsed_s", "queries_per_min", "speedup"])
+    if json_path:
+        dump_json({"benchmark": "requests_bs_session", "results": rows}, json_path)
+    return rows
+
+
+if __name__ == "__main__":
+    # python bench_session.py [queries] [json_output]
+    main(
+        count=int(sys.argv[1]) if len(sys.argv) > 1 else 5,
+        json_path=sys.argv[2] if len(sys.argv) > 2 else None
+    )
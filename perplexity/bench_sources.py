@@ -0,0 +1,107 @@
+import os
+import random
+import sys
+import tempfile
+import time
+from itertools import accumulate
+
+from benchmark import dump_json, percentile, print_table
+from source_index import SourceIndex
+
+DOMAINS = 50_000
+PAGES_PER_DOMAIN = 200
+
+
+def shares(count, seed=0, per_share=10):
+    """Yield (share URL, sources) for a synthetic stream of answers
+
+    Domains are Zipf-distributed (a few sites like wikipedia.org are cited
+    everywhere, most are cited rarely), a third of them under a subdomain,
+    with a fixed pool of pages per domain.
+    """
+    rng = random.Random(seed)
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(DOMAINS)))
+    for i in range(count):
+        picked = rng.choices(range(DOMAINS), cum_weights=cum_weights, k=per_share)
+        sources = []
+        for d in picked:
+            host = f"{'docs.' if d % 3 == 0 else 'www.'}site{d}.com"
+            sources.append({"text": f"Source {d}", "url": f"https://{host}/page/{rng.randrange(PAGES_PER_DOMAIN)}"})
+        yield f"https://www.perplexity.ai/search/bench-{i}", sources
+
+
+def time_queries(query, terms):
+    """Per-query latencies in ms and the total ids returned"""
+    latencies, total = [], 0
+    for term in terms:
+        t = time.perf_counter()
+        total += len(query(term))
+        latencies.append((time.perf_counter() - t) * 1000)
+    return latencies, total
+
+
+def main(count=200_000, json_path=None):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sources.sqlite3")
+        citations = 0
+        start = time.perf_counter()
+        with SourceIndex(path) as index:
+            for share, sources in shares(count):
+                index.add(share, sources)
+                citations += len(sources)
+        elapsed = time.perf_counter() - start
+        file_bytes = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+
+        # Re-open like a query process would; the first batch of a row is cold
+        rows = []
+        with SourceIndex(path) as index:
+            popular = [f"site{d}.com" for d in range(10)]
+            mid = [f"site{d}.com" for d in range(1000, 1100)]
+            rare = [f"site{d}.com" for d in range(DOMAINS - 100, DOMAINS)]
+            urls = [f"https://www.site{d}.com/page/0" for d in range(1, 101)]
+            for name, query, terms in (
+                    ("domain, top 10", index.domain_ids, popular),
+                    ("domain, rank ~1000", index.domain_ids, mid),
+                    ("domain, long tail", index.domain_ids, rare),
+                    ("url", index.url_ids, urls)):
+                latencies, total = time_queries(query, terms)
+                rows.append({
+                    "query": name,
+                    "queries": len(terms),
+                    "avg_answers": round(total / len(terms)),
+                    "p50_ms": round(percentile(latencies, 50), 3),
+                    "p99_ms": round(percentile(latencies, 99), 3),
+                    "max_ms": round(max(latencies), 3),
+                })
+            t = time.perf_counter()
+            keys = index.citing_domain("site0.com", limit=1000)
+            resolve_ms = (time.perf_counter() - t) * 1000
+            t = time.perf_counter()
+            top = index.top_domains(20)
+            top_s = time.perf_counter() - t
+
+    ingest = {
+        "shares": count,
+        "citations": citations,
+        "shares_per_sec": round(count / elapsed),
+        "citations_per_sec": round(citations / elapsed),
+        "elapsed_s": round(elapsed, 1),
+        "index_mb": round(file_bytes / 1024 / 1024, 1),
+        "bytes_per_citation": round(file_bytes / citations, 1),
+    }
+    print_table([ingest], list(ingest))
+    print()
+    print_table(rows, ["query", "queries", "avg_answers", "p50_ms", "p99_ms", "max_ms"])
+    print(f"\n{len(keys)} share URLs citing site0.com resolved in {resolve_ms:.1f} ms; top 20 domains in {top_s:.2f} s")
+    if json_path:
+        dump_json({"benchmark": "sources", "ingest": ingest, "results": rows,
+                   "resolve_1000_ms": round(resolve_ms, 2), "top_domains_s": round(top_s, 2)}, json_path)
+    return ingest, rows
+
+
+if __name__ == "__main__":
+    # python bench_sources.py [shares] [json_output]
+    main(
+        count=int(sys.argv[1]) if len(sys.argv) > 1 else 200_000,
+        json_path=sys.argv[2] if len(sys.argv) > 2 else None
+    )
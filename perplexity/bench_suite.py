@@ -0,0 +1,219 @@
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import time
+
+from bench_extract import load_corpus
+from benchmark import dump_json, print_table, summarize
+from mock_servers import LocalServer, fixture_site
+
+BACKENDS = ("spider", "playwright", "selenium", "requests_bs", "scrapingbee")
+
+
+def bench_spider(base_url, count):
+    """Scrapy spider through the fixture site used as a rate-limited proxy"""
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+
+    from crawer import PerplexitySharedLinkSpider
+
+    settings = dict(PerplexitySharedLinkSpider.custom_settings)
+    settings.update({
+        'FEEDS': {},
+        'FETCH_CACHE_ENABLED': False,
+        'LOG_LEVEL': 'ERROR',
+        'TELNETCONSOLE_ENABLED': False,
+        'DOWNLOADER_MIDDLEWARES': {'crawer.AdaptiveProxyThrottleMiddleware': 600},
+        'ADAPTIVE_THROTTLE_TARGET_LATENCY': 0.25,
+    })
+
+    class BenchSpider(PerplexitySharedLinkSpider):
+        custom_settings = settings
+
+    stats = {"pages": 0, "latencies": []}
+
+    def item_scraped(item, response, spider):
+        if item.get('main_content'):
+            stats["pages"] += 1
+            stats["latencies"].append(response.meta.get('download_latency', 0))
+
+    process = CrawlerProcess()
+    crawler = process.create_crawler(BenchSpider)
+    crawler.signals.connect(item_scraped, signal=signals.item_scraped)
+    process.crawl(crawler, shared_links=[f"http://www.perplexity.ai/limited/{i}" for i in range(count)],
+                  proxies=[base_url])
+    process.start()
+    return stats["pages"], stats["latencies"]
+
+
+def bench_playwright(base_url, count):
+    """playwright_perplexity's pooled async scraper, one page at a time"""
+    import asyncio
+
+    from playwright_perplexity import scrape_perplexity_shared_links
+
+    async def run():
+        pages, latencies = 0, []
+        last = time.perf_counter()
+        async for _, result in scrape_perplexity_shared_links(
+                [f"{base_url}/search/{i}" for i in range(count)], concurrency=1, pages_per_context=1):
+            now = time.perf_counter()
+            latencies.append(now - last)
+            last = now
+            pages += bool(result and result["content"]["main_answer"])
+        return pages, latencies
+
+    return asyncio.run(run())
+
+
+def bench_selenium(base_url, count):
+    """selinum.PerplexityScraper with one warm driver"""
+    from selinum import PerplexityScraper
+
+    pages, latencies = 0, []
+    with PerplexityScraper(headless=True, pool_size=1, visit_google=False) as scraper:
+        # Launch the driver up front, so a missing Chrome is reported rather than timed
+        with scraper.pool.driver():
+            pass
+        for i in range(count):
+            start = time.perf_counter()
+            result = scraper.scrape_shared_link(f"{base_url}/search/{i}")
+            latencies.append(time.perf_counter() - start)
+            pages += bool(result and result["main_answer"] != "Not found")
+    return pages, latencies
+
+
+def bench_requests_bs(base_url, count):
+    """requests_BS.PerplexityScraper session mode against the streaming search page"""
+    from requests_BS import PerplexityScraper
+
+    pages, latencies = 0, []
+    with PerplexityScraper(headless=True, search_url=f"{base_url}/stream", visit_google=False) as scraper:
+        for i in range(count):
+            start = time.perf_counter()
+            result = scraper.scrape(f"benchmark question {i}")
+            latencies.append(time.perf_counter() - start)
+            pages += bool(result)
+    return pages, latencies
+
+
+def bench_scrapingbee(base_url, count):
+    """ScrapingBee client, tier escalation and parser against the fixture's HTML API"""
+    from srcapebee_perplexity import PerplexitySharedLinkScraper
+
+    scraper = PerplexitySharedLinkScraper("bench-key")
+    scraper.client.HTML_API_URL = f"{base_url}/api/v1/"
+    scraper.random_delay = lambda: None
+    pages, latencies = 0, []
+    for i in range(count):
+        start = time.perf_counter()
+        result = scraper.scrape_shared_link(f"https://www.perplexity.ai/search/{i}")
+        latencies.append(time.perf_counter() - start)
+        pages += bool(result and result["content"].get("main_answer"))
+    return pages, latencies
+
+
+def run_backend(name, base_url, count, queue):
+    """Child process: run one backend and report throughput, latency, peak RSS and CPU"""
+    import contextlib
+    import io
+
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            pages, latencies = globals()[f"bench_{name}"](base_url, count)
+    except Exception as e:
+        queue.put({"backend": name, "error": f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"})
+        return
+    elapsed = time.perf_counter() - start
+
+    # Browsers run as child processes; CPU and RSS of reaped children are included
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    row = summarize(latencies, elapsed, backend=name, pages=pages)
+    row.update({
+        "pages_per_sec": round(pages / elapsed, 2),
+        "cpu_s": round(own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime, 2),
+        # ru_maxrss is KB on Linux
+        "peak_rss_mb": round(max(own.ru_maxrss, children.ru_maxrss) / 1024, 1),
+    })
+    queue.put(row)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(old_path, rows):
+    """Print pages/sec and p95 changes against an earlier report"""
+    with open(old_path, encoding="utf-8") as f:
+        old = {r["backend"]: r for r in json.load(f)["results"] if "error" not in r}
+    diff = []
+    for row in rows:
+        before = old.get(row["backend"])
+        if before and "error" not in row:
+            diff.append({
+                "backend": row["backend"],
+                "pages_per_sec": f"{before['pages_per_sec']} -> {row['pages_per_sec']}",
+                "p95_ms": f"{before['p95_ms']} -> {row['p95_ms']}",
+                "peak_rss_mb": f"{before['peak_rss_mb']} -> {row['peak_rss_mb']}",
+            })
+    print_table(diff, ["backend", "pages_per_sec", "p95_ms", "peak_rss_mb"])
+
+
+def main(backends=BACKENDS, count=50, corpus_dir=None, rate=50, timeout=600, json_path=None, baseline=None):
+    pages = load_corpus(corpus_dir, count)
+    ctx = multiprocessing.get_context("spawn")
+    rows = []
+    with LocalServer(fixture_site(pages, rate=rate)) as server:
+        for name in backends:
+            queue = ctx.Queue()
+            proc = ctx.Process(target=run_backend, args=(name, server.base_url, count, queue))
+            proc.start()
+            try:
+                rows.append(queue.get(timeout=timeout))
+            except Exception:
+                proc.kill()
+                rows.append({"backend": name, "error": f"timed out after {timeout}s"})
+            proc.join()
+        limited = server.httpd.RequestHandlerClass.counts["limited"]
+
+    ok = [r for r in rows if "error" not in r]
+    print_table(ok, ["backend", "pages", "pages_per_sec", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb", "cpu_s"])
+    for row in rows:
+        if "error" in row:
+            print(f"{row['backend']}: skipped ({row['error']})")
+    if baseline:
+        print()
+        compare(baseline, rows)
+    if json_path:
+        dump_json({
+            "benchmark": "suite",
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "links": count,
+            "corpus": corpus_dir or "synthetic",
+            "rate_limited_responses": limited,
+            "results": rows,
+        }, json_path)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run every scraping backend against a local fixture site")
+    parser.add_argument("backends", nargs="*", default=list(BACKENDS), help=f"any of {', '.join(BACKENDS)}")
+    parser.add_argument("-n", "--links", type=int, default=50)
+    parser.add_argument("--corpus", help="directory of saved shared-link HTML pages (default: synthetic)")
+    parser.add_argument("--rate", type=int, default=50, help="requests/second allowed on /limited")
+    parser.add_argument("--timeout", type=int, default=600, help="seconds per backend")
+    parser.add_argument("-o", "--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    args = parser.parse_args()
+    main(args.backends, args.links, args.corpus, args.rate, args.timeout, args.output, args.baseline)
@@ -0,0 +1,93 @@
+import multiprocessing
+import random
+import sys
+import time
+
+from benchmark import dump_json, print_table, summarize
+
+
+def run_crawl(mode, proxies, count, queue):
+    """Child process: crawl `count` links through `proxies` stand-in proxies"""
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+
+    from crawer import PerplexitySharedLinkSpider
+    from mock_servers import LocalServer, rate_limited_proxy
+
+    servers = [LocalServer(rate_limited_proxy(rate=20, max_in_flight=4)).start() for _ in range(proxies)]
+    settings = dict(PerplexitySharedLinkSpider.custom_settings)
+    settings.update({
+        'FEEDS': {},
+        'FETCH_CACHE_ENABLED': False,
+        'LOG_LEVEL': 'ERROR',
+        'TELNETCONSOLE_ENABLED': False,
+        'DOWNLOADER_MIDDLEWARES': {'crawer.AdaptiveProxyThrottleMiddleware': 600},
+        'ADAPTIVE_THROTTLE_TARGET_LATENCY': 0.25,
+        'ADAPTIVE_THROTTLE_MAX_CONCURRENCY': 16,
+    })
+    if mode == "fixed":
+        # The spider's previous behaviour: one request at a time, fixed delay, random proxy
+        settings.update({'ADAPTIVE_THROTTLE_ENABLED': False, 'DOWNLOAD_DELAY': 0.05})
+
+    class BenchSpider(PerplexitySharedLinkSpider):
+        custom_settings = settings
+
+        def start_requests(self):
+            for request in super().start_requests():
+                if mode == "fixed":
+                    request.meta['proxy'] = random.choice(self.proxies)
+                yield request
+
+    stats = {"pages": 0, "latencies": []}
+
+    def item_scraped(item, response, spider):
+        if item.get('main_content'):
+            stats["pages"] += 1
+
+    def response_received(response, request, spider):
+        if 'download_latency' in request.meta:
+            stats["latencies"].append(request.meta['download_latency'])
+
+    process = CrawlerProcess()
+    crawler = process.create_crawler(BenchSpider)
+    crawler.signals.connect(item_scraped, signal=signals.item_scraped)
+    crawler.signals.connect(response_received, signal=signals.response_received)
+    process.crawl(
+        crawler,
+        shared_links=[f"http://www.perplexity.ai/search/bench-{i}" for i in range(count)],
+        proxies=[server.base_url for server in servers],
+    )
+    start = time.perf_counter()
+    process.start()
+    elapsed = time.perf_counter() - start
+    for server in servers:
+        server.stop()
+
+    row = summarize(stats["latencies"], elapsed, mode=mode, proxies=proxies, pages=stats["pages"],
+                    throttled=sum(server.httpd.RequestHandlerClass.counts["limited"] for server in servers))
+    row["pages_per_sec"] = round(stats["pages"] / elapsed, 2)
+    queue.put(row)
+
+
+def main(count=400, proxy_counts=(1, 2, 4, 8), json_path=None):
+    ctx = multiprocessing.get_context("spawn")
+    rows = []
+    for mode, proxies in [("fixed", max(proxy_counts))] + [("adaptive", n) for n in proxy_counts]:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=run_crawl, args=(mode, proxies, count, queue))
+        proc.start()
+        rows.append(queue.get())
+        proc.join()
+
+    print_table(rows, ["mode", "proxies", "pages", "throttled", "pages_per_sec", "p50_ms", "p99_ms"])
+    if json_path:
+        dump_json({"benchmark": "proxy_throttle", "results": rows}, json_path)
+    return rows
+
+
+if __name__ == "__main__":
+    # python bench_throttle.py [links] [json_output]
+    main(
+        count=int(sys.argv[1]) if len(sys.argv) > 1 else 400,
+        json_path=sys.argv[2] if len(sys.argv) > 2 else None
+    )
@@ -0,0 +1,68 @@
+import asyncio
+import sys
+import time
+
+from benchmark import dump_json, print_table, summarize
+from mock_servers import SocketIOStandIn
+from websocket_preplexity import AsyncPerplexityWebSocketClient
+
+
+async def run_level(server, in_flight, count):
+    """Push `count` queries through one connection with `in_flight` outstanding"""
+    latencies = []
+
+    async def timed(client, question):
+        response = await client.query(question)
+        latencies.append(response["latency"])
+
+    async with AsyncPerplexityWebSocketClient(ws_url=server.ws_url, max_in_flight=in_flight) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(timed(client, f"question {i}") for i in range(count)),
+                                       return_exceptions=True)
+        elapsed = time.perf_counter() - start
+    errors = sum(isinstance(r, Exception) for r in results)
+    return summarize(latencies, elapsed, in_flight=in_flight, errors=errors)
+
+
+async def run_streaming(server, in_flight, count):
+    """Time to first streamed chunk vs. time to the complete answer"""
+    first_chunk = []
+    complete = []
+
+    async def timed(client, question):
+        async for kind, value in client.stream(question):
+            if kind == "final":
+                first_chunk.append(value["first_chunk_latency"])
+                complete.append(value["latency"])
+
+    async with AsyncPerplexityWebSocketClient(ws_url=server.ws_url, max_in_flight=in_flight) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(timed(client, f"question {i}") for i in range(count)),
+                             return_exceptions=True)
+        elapsed = time.perf_counter() - start
+    ttfb = summarize(first_chunk, elapsed)
+    row = summarize(complete, elapsed, in_flight=in_flight)
+    row["ttfb_p50_ms"] = ttfb["p50_ms"]
+    row["ttfb_p99_ms"] = ttfb["p99_ms"]
+    return row
+
+
+async def main(levels=(1, 8, 64, 256), count=512, latency=0.05, json_path=None):
+    async with SocketIOStandIn(latency=latency) as server:
+        rows = [await run_level(server, level, count) for level in levels]
+        streaming = [await run_streaming(server, level, count) for level in levels]
+
+    print_table(rows, ["in_flight", "count", "errors", "per_sec", "p50_ms", "p99_ms"])
+    print("\nStreaming (time to first chunk vs. complete answer)")
+    print_table(streaming, ["in_flight", "count", "per_sec", "ttfb_p50_ms", "ttfb_p99_ms", "p50_ms", "p99_ms"])
+    if json_path:
+        dump_json({"benchmark": "websocket_multiplex", "results": rows, "streaming": streaming}, json_path)
+    return rows
+
+
+if __name__ == "__main__":
+    # python bench_websocket.py [queries] [json_output]
+    asyncio.run(main(
+        count=int(sys.argv[1]) if len(sys.argv) > 1 else 512,
+        json_path=sys.argv[2] if len(sys.argv) > 2 else None
+    ))
@@ -0,0 +1,44 @@
+import json
+import statistics
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies, elapsed, **extra):
+    """Throughput and latency summary for one benchmark run"""
+    summary = {
+        "count": len(latencies),
+        "elapsed_s": round(elapsed, 4),
+        "per_sec": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else None,
+    }
+    for pct in (50, 95, 99):
+        value = percentile(latencies, pct)
+        summary[f"p{pct}_ms"] = round(value * 1000, 2) if value is not None else None
+    summary.update(extra)
+    return summary
+
+
+def print_table(rows, columns):
+    """Print benchmark rows as an aligned text table"""
+    widths = [max(len(str(c)), *(len(str(r.get(c, ""))) for r in rows)) for c in columns]
+    print("  ".join(str(c).ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row.get(c, "")).ljust(w) for c, w in zip(columns, widths)))
+
+
+def dump_json(data, path=None):
+    """Write results as JSON to a file or stdout"""
+    text = json.dumps(data, indent=2, sort_keys=True)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
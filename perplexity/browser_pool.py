@@ -0,0 +1,186 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright
+
+from metrics import timer
+from proxy_pool import ProxyBlocked, playwright_proxy
+
+
+class _ContextSlot:
+    """One browser context and its page bookkeeping"""
+
+    def __init__(self, context, proxy=None):
+        self.context = context
+        self.proxy = proxy  # ProxyPool entry this context routes through
+        self.active = 0     # pages currently open
+        self.uses = 0       # pages handed out over the context lifetime
+        self.broken = False
+
+
+class BrowserPool:
+    """Long-lived async Chromium shared by many concurrent pages
+
+    Pages are spread over at most `contexts` live contexts, each holding up
+    to `pages_per_context` open pages. A context is retired after
+    `max_uses_per_context` pages (or when a page in it crashes) and closed once
+    its last page is released; the browser itself is relaunched only if it
+    disconnects. With a `proxy_pool`, every context gets its own proxy from
+    the pool, page outcomes are reported back to it, and a context is retired
+    once its proxy is banned or cooling down.
+    """
+
+    def __init__(self, headless=True, launch_args=None, context_options=None, init_script=None,
+                 contexts=2, pages_per_context=4, max_uses_per_context=50, proxy=None,
+                 resource_filter=None, proxy_pool=None):
+        self.headless = headless
+        self.launch_args = launch_args or []
+        self.context_options = context_options or {}
+        self.init_script = init_script
+        self.contexts = contexts
+        self.pages_per_context = pages_per_context
+        self.max_uses_per_context = max_uses_per_context
+        self.proxy = proxy
+        self.resource_filter = resource_filter
+        self.proxy_pool = proxy_pool
+
+        self.playwright = None
+        self.browser = None
+        self.live = []
+        self.retired = []
+        self.lock = asyncio.Lock()
+        self.semaphore = asyncio.Semaphore(contexts * pages_per_context)
+        self.stats = {"launches": 0, "contexts": 0, "pages": 0, "recycled": 0, "crashes": 0}
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        self.playwright = await async_playwright().start()
+        await self._launch()
+
+    async def close(self):
+        for slot in self.live + self.retired:
+            await self._close_context(slot)
+        self.live, self.retired = [], []
+        if self.browser:
+            try:
+                await self.browser.close()
+            except Exception:
+                pass
+            self.browser = None
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
+
+    async def _launch(self):
+        options = {"headless": self.headless, "args": self.launch_args}
+        if self.proxy:
+            options["proxy"] = self.proxy
+        with timer("launch", "playwright"):
+            self.browser = await self.playwright.chromium.launch(**options)
+        self.live, self.retired = [], []
+        self.stats["launches"] += 1
+
+    async def _new_slot(self):
+        options = dict(self.context_options)
+        proxy = self.proxy_pool.pick() if self.proxy_pool else None
+        if proxy:
+            options["proxy"] = playwright_proxy(proxy)
+        with timer("new_context", "playwright"):
+            context = await self.browser.new_context(**options)
+            if self.init_script:
+                await context.add_init_script(self.init_script)
+        slot = _ContextSlot(context, proxy)
+        self.live.append(slot)
+        self.stats["contexts"] += 1
+        return slot
+
+    async def _close_context(self, slot):
+        try:
+            await slot.context.close()
+        except Exception:
+            pass
+
+    async def _checkout(self):
+        """Pick the least busy live context, creating or recycling as needed"""
+        async with self.lock:
+            if not self.browser or not self.browser.is_connected():
+                if self.browser:
+                    self.stats["crashes"] += 1
+                await self._launch()
+
+            if self.proxy_pool:
+                for slot in [s for s in self.live if s.proxy and not self.proxy_pool.is_available(s.proxy)]:
+                    self.live.remove(slot)
+                    self.retired.append(slot)
+            candidates = [s for s in self.live if s.active < self.pages_per_context]
+            if candidates:
+                slot = min(candidates, key=lambda s: s.active)
+            else:
+                slot = await self._new_slot()
+
+            slot.active += 1
+            slot.uses += 1
+            if slot.uses >= self.max_uses_per_context:
+                # Stop handing out this context; it closes when it drains
+                self.live.remove(slot)
+                self.retired.append(slot)
+                self.stats["recycled"] += 1
+            return slot
+
+    async def _checkin(self, slot):
+        async with self.lock:
+            slot.active -= 1
+            if slot.broken and slot in self.live:
+                self.live.remove(slot)
+                self.retired.append(slot)
+            if slot in self.retired and slot.active == 0:
+                self.retired.remove(slot)
+                await self._close_context(slot)
+
+    @asynccontextmanager
+    async def page(self):
+        """Borrow a fresh page from the pool for the duration of the block
+
+        Raise ProxyBlocked inside the block when the target refuses the page,
+        so the context's proxy is marked as banned.
+        """
+        await self.semaphore.acquire()
+        slot = None
+        try:
+            slot = await self._checkout()
+            try:
+                page = await slot.context.new_page()
+                if self.resource_filter:
+                    await self.resource_filter.install_async(page)
+            except Exception:
+                slot.broken = True
+                raise
+            self.stats["pages"] += 1
+            start = time.perf_counter()
+            try:
+                yield page
+            except Exception as e:
+                if page.is_closed() or not self.browser.is_connected() or isinstance(e, ProxyBlocked):
+                    slot.broken = True
+                if slot.proxy:
+                    self.proxy_pool.report_error(slot.proxy, e)
+                raise
+            else:
+                if slot.proxy:
+                    self.proxy_pool.report_success(slot.proxy, time.perf_counter() - start)
+            finally:
+                try:
+                    await page.close()
+                except Exception:
+                    slot.broken = True
+        finally:
+            if slot:
+                await self._checkin(slot)
+            self.semaphore.release()
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from fetch_cache import normalize_url
+from metrics import count
+
+
+def digest(data):
+    """16-byte BLAKE2b digest of bytes or str"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def source_urls(sources):
+    """Source URLs from either [{"text", "url"}] dicts or plain URL strings"""
+    return [s["url"] if isinstance(s, dict) else s for s in sources or ()]
+
+
+class ChangeStore:
+    """Last-seen state of each shared link, for incremental re-scrapes
+
+    Keyed by normalized share_url, the store keeps a digest of the raw page
+    and digests of the extracted answer, sources and related questions.
+    raw_unchanged() lets a scraper skip parsing and writing when the bytes are
+    the same as last time; record() returns a compact change record (which
+    fields changed, sources added/removed) only when the content differs, and
+    None otherwise. Use one store per backend: their answer text differs
+    (plain text from the spider, Markdown from ScrapingBee). Thread safe;
+    writes are committed every `commit_every` updates and on close().
+    """
+
+    def __init__(self, path=".cache/changes.sqlite3", commit_every=500):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.commit_every = commit_every
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.stats = {"unchanged_raw": 0, "unchanged_content": 0, "new": 0, "updated": 0}
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                raw BLOB NOT NULL,
+                content BLOB NOT NULL,
+                answer BLOB,
+                related BLOB,
+                sources TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                changed_at REAL NOT NULL,
+                checked_at REAL NOT NULL
+            ) WITHOUT ROWID;
+        """)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def raw_unchanged(self, url, body, backend="default"):
+        """True if `body` is byte-for-byte what record() last saw for `url`"""
+        with self.lock:
+            row = self.db.execute("SELECT raw FROM pages WHERE url = ?", (normalize_url(url),)).fetchone()
+            if row is None or row[0] != digest(body):
+                return False
+            self.stats["unchanged_raw"] += 1
+        count("unchanged", backend=backend, stage="raw")
+        return True
+
+    def record(self, url, body, answer, sources, related, backend="default"):
+        """Save the latest state of `url`; a change record if its content differs, else None"""
+        key = normalize_url(url)
+        urls = source_urls(sources)
+        answer_digest = digest(answer or "")
+        related_digest = digest("\n".join(related or ()))
+        sources_digest = digest("\n".join(urls))
+        content = digest(answer_digest + sources_digest + related_digest)
+        now = time.time()
+
+        with self.lock:
+            row = self.db.execute(
+                "SELECT content, answer, related, sources FROM pages WHERE url = ?", (key,)).fetchone()
+            if row and row[0] == content:
+                # Same content, new bytes (nonces, timestamps): remember the bytes only
+                self.db.execute("UPDATE pages SET raw = ?, checked_at = ? WHERE url = ?",
+                                (digest(body), now, key))
+                self._dirty()
+                change = None
+            else:
+                self.db.execute(
+                    "INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(url) DO UPDATE SET "
+                    "raw = excluded.raw, content = excluded.content, answer = excluded.answer, "
+                    "related = excluded.related, sources = excluded.sources, "
+                    "changed_at = excluded.changed_at, checked_at = excluded.checked_at",
+                    (key, digest(body), content, answer_digest, related_digest, json.dumps(urls), now, now, now))
+                self._dirty()
+                change = self._change(url, content, row, answer_digest, related_digest, urls, now)
+            self.stats[change["change"] if change else "unchanged_content"] += 1
+
+        count("unchanged" if change is None else "changed", backend=backend,
+              stage="content" if change is None else change["change"])
+        return change
+
+    @staticmethod
+    def _change(url, content, row, answer_digest, related_digest, urls, now):
+        change = {
+            "share_url": url,
+            "change": "updated" if row else "new",
+            "detected_at": datetime.fromtimestamp(now).isoformat(),
+            "content_hash": content.hex(),
+        }
+        if row is None:
+            return change
+        old_content, old_answer, old_related, old_sources = row
+        old_urls = json.loads(old_sources)
+        change["previous_hash"] = old_content.hex()
+        change["fields"] = [field for field, changed in (
+            ("answer", old_answer != answer_digest),
+            ("sources", old_urls != urls),
+            ("related_questions", old_related != related_digest),
+        ) if changed]
+        if old_urls != urls:
+            old, new = set(old_urls), set(urls)
+            change["sources_added"] = [u for u in urls if u not in old]
+            change["sources_removed"] = [u for u in old_urls if u not in new]
+        return change
+
+    def _dirty(self):
+        """Count an update and commit every `commit_every` (lock held)"""
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.db.commit()
+            self.pending = 0
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def flush(self):
+        with self.lock:
+            self.db.commit()
+            self.pending = 0
+
+    def close(self):
+        self.flush()
+        self.db.close()
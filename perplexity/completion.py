@@ -0,0 +1,103 @@
+import re
+import time
+
+ANSWER_SELECTORS = [".prose", ".answer-content", "[role='article']"]
+
+# Resolves once an answer container has text and no DOM mutation has been
+# seen for `quietMs`, or with ok=false when `timeoutMs` runs out
+STABLE_TEXT_JS = """
+([selectors, quietMs, minLength, timeoutMs]) => new Promise((resolve) => {
+    const find = () => {
+        for (const s of selectors) {
+            const el = document.querySelector(s);
+            if (el && el.innerText.trim().length >= minLength) return el;
+        }
+        return null;
+    };
+    let timer = null;
+    let done = false;
+    const finish = (ok) => {
+        if (done) return;
+        done = true;
+        observer.disconnect();
+        clearTimeout(timer);
+        clearTimeout(deadline);
+        const el = find();
+        resolve({ok: ok, text: el ? el.innerText : null});
+    };
+    const arm = () => {
+        clearTimeout(timer);
+        if (find()) timer = setTimeout(() => finish(true), quietMs);
+    };
+    const observer = new MutationObserver(arm);
+    observer.observe(document.body, {childList: true, subtree: true, characterData: true});
+    const deadline = setTimeout(() => finish(false), timeoutMs);
+    arm();
+})
+"""
+
+
+class CompletionDetector:
+    """Wait for a streamed answer to finish instead of sleeping a fixed time
+
+    By default the answer is complete once its container has at least
+    `min_length` characters and the DOM has been quiet for `quiet_ms`. If
+    `stream_url_pattern` is given, the detector also watches for the network
+    request that carries the stream. Once that request finishes, only a short
+    settle period is needed. Call arm() before submitting the query and
+    wait() after.
+    """
+
+    def __init__(self, page, selectors=ANSWER_SELECTORS, quiet_ms=1500, timeout_ms=60000,
+                 min_length=50, stream_url_pattern=None, settle_ms=200):
+        self.page = page
+        self.selectors = selectors
+        self.quiet_ms = quiet_ms
+        self.timeout_ms = timeout_ms
+        self.min_length = min_length
+        self.stream_url = re.compile(stream_url_pattern) if stream_url_pattern else None
+        self.settle_ms = settle_ms
+        self.stream_done = False
+        self.started = None
+        self.elapsed = None
+
+    def _is_stream(self, request):
+        return bool(self.stream_url and self.stream_url.search(request.url))
+
+    def _on_finished(self, request):
+        if self._is_stream(request):
+            self.stream_done = True
+
+    def arm(self):
+        """Start listening for the stream request (call before submitting)"""
+        self.stream_done = False
+        self.started = time.perf_counter()
+        if self.stream_url:
+            self.page.on("requestfinished", self._on_finished)
+        return self
+
+    def wait(self):
+        """Block until the answer is complete; return its text or None on timeout"""
+        quiet_ms = self.quiet_ms
+        remaining = self.timeout_ms
+        try:
+            if self.stream_url:
+                if not self.stream_done:
+                    self.page.wait_for_event("requestfinished", predicate=self._is_stream,
+                                             timeout=self.timeout_ms)
+                # The stream is over; only wait for the final render
+                quiet_ms = self.settle_ms
+                remaining = max(1000, self.timeout_ms - int((time.perf_counter() - self.started) * 1000))
+            state = self.page.evaluate(
+                STABLE_TEXT_JS,
+                [self.selectors, quiet_ms, self.min_length, remaining]
+            )
+        except Exception as e:
+            print(f"Completion detection failed: {str(e)}")
+            return None
+        finally:
+            if self.stream_url:
+                self.page.remove_listener("requestfinished", self._on_finished)
+            self.elapsed = time.perf_counter() - self.started
+
+        return state["text"] if state["ok"] else None
@@ -0,0 +1,180 @@
+import atexit
+import itertools
+import os
+import queue
+import random
+import re
+import threading
+from datetime import datetime
+
+MODES = ("off", "failures", "sampled")
+
+
+class DebugArtifacts:
+    """Policy and background writer for debug screenshots
+
+    mode "off" never captures, "failures" captures failed pages only, and
+    "sampled" captures every failure plus `sample_percent` % of successful
+    pages. Screenshots are taken as viewport JPEGs (no full-page PNG
+    encoding) and written to `directory` by a single background thread,
+    so the scraper only pays for the capture itself. Files are named
+    <prefix>-<time>-<pid>-<seq>-<label>.jpg and never overwrite each other;
+    the oldest are deleted once the directory holds more than `max_files`
+    files or `max_bytes` bytes. Captures arriving while `queue_size` writes
+    are already pending are dropped rather than stalling the scraper.
+    """
+
+    def __init__(self, mode="failures", sample_percent=1.0, directory="debug", prefix="perplexity",
+                 max_files=200, max_bytes=100 * 1024 * 1024, quality=70, full_page=False,
+                 include_html=False, queue_size=32):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        self.mode = mode
+        self.sample_percent = sample_percent
+        self.directory = directory
+        self.prefix = prefix
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self.full_page = full_page
+        self.include_html = include_html
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.sequence = itertools.count(1)
+        self.lock = threading.Lock()
+        self.writer = None
+        self.files = None  # [(path, size)], oldest first; loaded by the writer
+        self.stats = {"captured": 0, "written": 0, "dropped": 0, "deleted": 0, "errors": 0}
+
+    @classmethod
+    def from_spec(cls, spec, **kwargs):
+        """Build from "off", "failures" or "sampled:<percent>" (e.g. "sampled:5")"""
+        mode, _, percent = (spec or "failures").partition(":")
+        if percent:
+            kwargs["sample_percent"] = float(percent)
+        return cls(mode=mode, **kwargs)
+
+    def should_capture(self, failed):
+        if self.mode == "off":
+            return False
+        if failed:
+            return True
+        return self.mode == "sampled" and random.random() * 100 < self.sample_percent
+
+    def _name(self, label, failed, extension):
+        label = re.sub(r"[^a-zA-Z0-9]+", "_", label or "page").strip("_")[-60:] or "page"
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        kind = "error" if failed else "ok"
+        return f"{self.prefix}-{timestamp}-{os.getpid()}-{next(self.sequence):06d}-{kind}-{label}.{extension}"
+
+    def capture(self, page, label=None, failed=False):
+        """Screenshot a sync Playwright page or Selenium driver if the policy says so
+
+        Returns the file name that will be written, or None. Never raises.
+        """
+        if not self.should_capture(failed):
+            return None
+        try:
+            if hasattr(page, "get_screenshot_as_png"):
+                image, extension = page.get_screenshot_as_png(), "png"
+                html = page.page_source if self.include_html else None
+            else:
+                image = page.screenshot(type="jpeg", quality=self.quality, full_page=self.full_page)
+                extension = "jpg"
+                html = page.content() if self.include_html else None
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Debug capture failed: {e}")
+            return None
+        return self._submit(label, failed, image, extension, html)
+
+    async def capture_async(self, page, label=None, failed=False):
+        """capture() for an async Playwright page"""
+        if not self.should_capture(failed):
+            return None
+        try:
+            image = await page.screenshot(type="jpeg", quality=self.quality, full_page=self.full_page)
+            html = await page.content() if self.include_html else None
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Debug capture failed: {e}")
+            return None
+        return self._submit(label, failed, image, "jpg", html)
+
+    def _submit(self, label, failed, image, extension, html):
+        name = self._name(label, failed, extension)
+        self._start()
+        try:
+            self.queue.put_nowait((name, image, html))
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return None
+        self.stats["captured"] += 1
+        return os.path.join(self.directory, name)
+
+    # ---- background writer ----
+
+    def _start(self):
+        with self.lock:
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._run, name="debug-artifacts", daemon=True)
+                self.writer.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._scan()
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            name, image, html = item
+            try:
+                self._write(name, image)
+                if html is not None:
+                    self._write(os.path.splitext(name)[0] + ".html", html.encode("utf-8"))
+                self.stats["written"] += 1
+                self._enforce_retention()
+            except OSError as e:
+                self.stats["errors"] += 1
+                print(f"Could not write debug artifact {name}: {e}")
+
+    def _scan(self):
+        """Pick up artifacts left by earlier runs so retention covers them too"""
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.startswith(self.prefix + "-"):
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.path, stat.st_size))
+        self.files = [(path, size) for _, path, size in sorted(found)]
+        self.total_bytes = sum(size for _, size in self.files)
+
+    def _write(self, name, data):
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        self.files.append((path, len(data)))
+        self.total_bytes += len(data)
+
+    def _enforce_retention(self):
+        while self.files and (len(self.files) > self.max_files or self.total_bytes > self.max_bytes):
+            path, size = self.files.pop(0)
+            self.total_bytes -= size
+            try:
+                os.remove(path)
+                self.stats["deleted"] += 1
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        """Write everything still queued and stop the writer"""
+        with self.lock:
+            writer, self.writer = self.writer, None
+        if writer:
+            self.queue.put(None)
+            writer.join()
+
+
+# Shared by the scripts; set PERPLEXITY_DEBUG_ARTIFACTS to "off", "failures"
+# or "sampled:<percent>" to change what gets captured
+default_artifacts = DebugArtifacts.from_spec(os.environ.get("PERPLEXITY_DEBUG_ARTIFACTS"))
@@ -0,0 +1,115 @@
+import argparse
+import glob
+import json
+import os
+import re
+
+
+def _decode(value):
+    """Parquet sinks store nested values as JSON strings"""
+    if isinstance(value, str) and value[:1] in "[{":
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value
+
+
+def normalize_record(record):
+    """Map any backend's result record onto one shape for rendering"""
+    record = {k: _decode(v) for k, v in record.items()}
+    content = record.get("content") if isinstance(record.get("content"), dict) else {}
+    metadata = record.get("metadata") or {}
+
+    sources = []
+    for source in content.get("sources") or record.get("sources") or []:
+        if isinstance(source, dict):
+            sources.append({"text": source.get("text") or source.get("title") or source.get("url", "Link"),
+                            "url": source.get("url", "#")})
+        else:
+            sources.append({"text": source, "url": source})
+
+    return {
+        "title": record.get("title") or metadata.get("title") or record.get("query")
+                 or record.get("prompt") or "Perplexity AI Results",
+        "url": record.get("share_url") or record.get("source_url") or record.get("url") or metadata.get("url"),
+        "timestamp": record.get("timestamp") or metadata.get("timestamp"),
+        "backend": record.get("backend"),
+        "answer": content.get("main_answer") or record.get("main_answer") or record.get("main_content")
+                  or record.get("answer") or (record.get("content") if isinstance(record.get("content"), str) else None),
+        "sources": sources,
+        "related": content.get("related_questions") or content.get("related")
+                   or record.get("related_questions") or record.get("related") or [],
+    }
+
+
+def render_markdown(record):
+    """Render one result record as a Markdown section"""
+    r = normalize_record(record)
+    lines = [f"# {r['title']}", ""]
+    if r["url"]:
+        lines.append(f"**Source:** [{r['url']}]({r['url']})  ")
+    if r["timestamp"]:
+        lines.append(f"**Captured:** {r['timestamp']}  ")
+    if r["backend"]:
+        lines.append(f"**Backend:** {r['backend']}")
+    lines += ["", "## Answer", r["answer"] or "No answer found.", ""]
+    if r["sources"]:
+        lines.append("## Sources")
+        lines += [f"- [{s['text']}]({s['url']})" for s in r["sources"]]
+        lines.append("")
+    if r["related"]:
+        lines.append("## Related Questions")
+        lines += [f"- {q}" for q in r["related"]]
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def read_records(path):
+    """Yield records from a JSONL or Parquet sink file"""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches():
+            yield from batch.to_pylist()
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def slugify(text, limit=60):
+    return re.sub(r"[^a-zA-Z0-9]+", "_", text or "result").strip("_")[:limit] or "result"
+
+
+def export(paths, output_dir, per_record=False):
+    """Render sink files to Markdown: one .md per input file, or per record"""
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    for path in paths:
+        base = os.path.splitext(os.path.basename(path))[0]
+        if per_record:
+            for i, record in enumerate(read_records(path)):
+                target = os.path.join(output_dir, f"{base}-{i:06d}-{slugify(normalize_record(record)['title'])}.md")
+                with open(target, "w", encoding="utf-8") as f:
+                    f.write(render_markdown(record))
+                written.append(target)
+        else:
+            target = os.path.join(output_dir, f"{base}.md")
+            with open(target, "w", encoding="utf-8") as f:
+                for record in read_records(path):
+                    f.write(render_markdown(record) + "\n---\n\n")
+            written.append(target)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export result sink files to Markdown")
+    parser.add_argument("inputs", nargs="+", help="JSONL/Parquet files or glob patterns")
+    parser.add_argument("-o", "--output-dir", default="markdown")
+    parser.add_argument("--per-record", action="store_true", help="one Markdown file per result")
+    args = parser.parse_args()
+
+    paths = [p for pattern in args.inputs for p in sorted(glob.glob(pattern))]
+    files = export(paths, args.output_dir, args.per_record)
+    print(f"Exported {len(paths)} input file(s) to {len(files)} Markdown file(s) in {args.output_dir}")
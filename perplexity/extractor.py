@@ -0,0 +1,151 @@
+from functools import lru_cache
+from urllib.parse import urljoin
+
+import lxml.html
+from cssselect import GenericTranslator
+from lxml import etree
+
+from html_markdown import to_markdown
+from metrics import count
+
+_css = GenericTranslator()
+
+
+def _compile(*selectors):
+    """Precompile CSS selectors (or raw XPath prefixed with 'xpath=') once at import"""
+    compiled = []
+    for selector in selectors:
+        if selector.startswith("xpath="):
+            compiled.append(etree.XPath(selector[len("xpath="):]))
+        else:
+            compiled.append(etree.XPath(_css.css_to_xpath(selector)))
+    return compiled
+
+
+# Each list is tried in order; the first selector that matches wins.
+# These are the union of what the spider, ScrapingBee and browser scrapers used.
+CONTENT_XPATHS = _compile(
+    ".prose",
+    ".answer-content",
+    "div.shared-content",
+    "article.content",
+    "div.answer-container",
+    "[role='article']",
+    # Loose class match used by the ScrapingBee and stealth scrapers
+    "xpath=//div[contains(@class, 'prose') or contains(@class, 'shared-content') "
+    "or contains(@class, 'answer')]"
+)
+SOURCE_XPATHS = _compile(
+    ".sources a[href]",
+    "div.sources a[href]",
+    "footer a[href^='http']",
+    "a[rel='nofollow'][href]",
+)
+RELATED_XPATHS = _compile(
+    ".related-question",
+    ".related-questions li",
+    ".suggested-questions li",
+    ".suggested-questions a",
+    ".related-content li",
+)
+TITLE_XPATH = etree.XPath("//title")
+H1_XPATH = etree.XPath("//h1")
+
+
+def clean_text(text):
+    """Collapse runs of whitespace into single spaces"""
+    return " ".join(text.split()) if text else ""
+
+
+def first_match(root, xpaths, fallback=None):
+    """Elements matched by the first xpath that finds anything
+
+    With `fallback`, a match by any but the first xpath is counted as a
+    selector fallback under that name, a sign the page layout has drifted.
+    """
+    for i, xpath in enumerate(xpaths):
+        found = xpath(root)
+        if found:
+            if i and fallback:
+                count("selector_fallback", backend="extractor", stage=fallback)
+            return found
+    return []
+
+
+def parse(html, encoding=None):
+    """Parse raw HTML (bytes or str) into an lxml tree
+
+    Bytes are decoded with `encoding` when given (e.g. the charset of the
+    HTTP Content-Type header); otherwise lxml looks for a BOM or <meta>
+    charset and falls back to Latin-1.
+    """
+    if encoding and isinstance(html, bytes):
+        return lxml.html.document_fromstring(html, parser=_parser(encoding))
+    return lxml.html.document_fromstring(html)
+
+
+@lru_cache(maxsize=16)
+def _parser(encoding):
+    return lxml.html.HTMLParser(encoding=encoding)
+
+
+def has_answer(html, encoding=None):
+    """True if the page has a non-empty answer container; cheaper than extract()"""
+    if html is None or (not isinstance(html, etree._Element) and not html.strip()):
+        return False
+    try:
+        root = html if isinstance(html, etree._Element) else parse(html, encoding)
+    except etree.ParserError:
+        return False
+    content = first_match(root, CONTENT_XPATHS)
+    return bool(content and clean_text(content[0].text_content()))
+
+
+def extract(html, url=None, with_html=False, with_markdown=False, encoding=None):
+    """Extract a shared-link answer from raw HTML into the common result schema
+
+    Returns {"title", "main_answer", "sources": [{"text", "url"}],
+    "related_questions"}. With `with_html`, also returns the answer element's
+    markup as "main_html"; with `with_markdown`, the answer converted straight
+    from the parsed tree as "main_markdown". Relative links are resolved
+    against `url`; `encoding` decodes bytes as in parse().
+    """
+    empty = {"title": None, "main_answer": None, "sources": [], "related_questions": []}
+    if with_html:
+        empty["main_html"] = None
+    if with_markdown:
+        empty["main_markdown"] = None
+    if html is None or (not isinstance(html, etree._Element) and not html.strip()):
+        return empty
+    try:
+        root = html if isinstance(html, etree._Element) else parse(html, encoding)
+    except etree.ParserError:
+        return empty
+
+    title = TITLE_XPATH(root)
+    h1 = H1_XPATH(root)
+    content = first_match(root, CONTENT_XPATHS, fallback="content")
+
+    sources = []
+    seen = set()
+    for a in first_match(root, SOURCE_XPATHS):
+        href = a.get("href")
+        if not href:
+            continue
+        href = urljoin(url, href) if url else href
+        if href in seen:
+            continue
+        seen.add(href)
+        sources.append({"text": clean_text(a.text_content()), "url": href})
+
+    result = {
+        "title": clean_text(title[0].text_content()) if title else (clean_text(h1[0].text_content()) if h1 else None),
+        "main_answer": clean_text(content[0].text_content()) if content else None,
+        "sources": sources,
+        "related_questions": [q for q in (clean_text(el.text_content()) for el in first_match(root, RELATED_XPATHS)) if q],
+    }
+    if with_html:
+        result["main_html"] = lxml.html.tostring(content[0], encoding="unicode", with_tail=False) if content else None
+    if with_markdown:
+        result["main_markdown"] = to_markdown(content[0], base_url=url) if content else None
+    return result
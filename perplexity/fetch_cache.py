@@ -0,0 +1,266 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+SCRIPT_RE = re.compile(r"<script\b[^>]*>.*?</script\s*>", re.I | re.S)
+
+
+def normalize_url(url):
+    """Canonical form used as the cache key
+
+    Lowercases scheme and host, drops default ports, fragments and utm_*
+    parameters, sorts the query string and trims a trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_")
+    )
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def strip_scripts(html):
+    """Drop <script> blocks so a rendered snapshot can be replayed statically"""
+    return SCRIPT_RE.sub("", html)
+
+
+class CacheEntry:
+    """A cached response body plus its freshness metadata"""
+
+    def __init__(self, url, backend, body, status, etag, last_modified, stored_at, expires_at):
+        self.url = url
+        self.backend = backend
+        self.body = body
+        self.status = status
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+
+    @property
+    def fresh(self):
+        return time.time() < self.expires_at
+
+    def validator_headers(self):
+        """Conditional request headers for revalidating this entry"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class FetchCache:
+    """Content-addressed on-disk cache of fetched pages shared by all backends
+
+    Entries are keyed by (backend, normalized URL). Bodies are stored once per
+    SHA-256 digest, zlib-compressed, under `directory/objects`, so identical
+    pages fetched by different backends share storage. A SQLite index keeps
+    TTLs, validators and access times. Least recently used entries are evicted
+    once the stored objects exceed `max_bytes`.
+    """
+
+    def __init__(self, directory=".cache/fetch", default_ttl=24 * 3600, ttl_by_backend=None,
+                 max_bytes=512 * 1024 * 1024, compression_level=6):
+        self.directory = directory
+        self.default_ttl = default_ttl
+        self.ttl_by_backend = ttl_by_backend or {}
+        self.max_bytes = max_bytes
+        self.compression_level = compression_level
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "revalidated": 0, "stores": 0, "evictions": 0}
+
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self.db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                backend TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                status INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_lru ON entries (accessed_at);
+            CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest);
+        """)
+        # Running size of the stored objects, so put() doesn't re-sum the table
+        self.stored_bytes = self.total_bytes()
+
+    def key(self, url, backend):
+        return hashlib.sha256(f"{backend}\n{normalize_url(url)}".encode("utf-8")).hexdigest()
+
+    def _object_path(self, digest):
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+    def _read_object(self, digest):
+        with open(self._object_path(digest), "rb") as f:
+            return zlib.decompress(f.read())
+
+    def _write_object(self, digest, body):
+        """Store a body once per digest; returns its compressed size"""
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return os.path.getsize(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = zlib.compress(body, self.compression_level)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.stored_bytes += len(data)
+        return len(data)
+
+    def _drop_object_if_unused(self, digest, size):
+        """Delete a body once no entry references it; True if it was removed"""
+        (refs,) = self.db.execute("SELECT COUNT(*) FROM entries WHERE digest = ?", (digest,)).fetchone()
+        if refs:
+            return False
+        try:
+            os.remove(self._object_path(digest))
+        except FileNotFoundError:
+            pass
+        self.stored_bytes -= size
+        return True
+
+    def lookup(self, url, backend):
+        """Return the cached entry for url/backend, fresh or stale, or None"""
+        key = self.key(url, backend)
+        with self.lock:
+            row = self.db.execute(
+                "SELECT digest, status, etag, last_modified, stored_at, expires_at FROM entries WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if not row:
+                return None
+            digest, status, etag, last_modified, stored_at, expires_at = row
+            try:
+                body = self._read_object(digest)
+            except (OSError, zlib.error):
+                self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.db.commit()
+                return None
+            self.db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+        return CacheEntry(url, backend, body, status, etag, last_modified, stored_at, expires_at)
+
+    def get(self, url, backend, revalidate=False):
+        """Return a fresh entry, optionally revalidating a stale one, else None"""
+        entry = self.lookup(url, backend)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        if entry.fresh:
+            self.stats["hits"] += 1
+            return entry
+        self.stats["stale"] += 1
+        if revalidate and entry.validator_headers() and self.revalidate(entry):
+            return entry
+        return None
+
+    def revalidate(self, entry, timeout=15):
+        """Conditional GET against the origin; refresh the TTL on 304"""
+        import requests
+
+        try:
+            response = requests.get(entry.url, headers=entry.validator_headers(), timeout=timeout)
+        except requests.RequestException:
+            return False
+        if response.status_code != 304:
+            return False
+        self.refresh(entry.url, entry.backend)
+        entry.expires_at = time.time() + self.ttl_for(entry.backend)
+        self.stats["revalidated"] += 1
+        return True
+
+    def ttl_for(self, backend):
+        return self.ttl_by_backend.get(backend, self.default_ttl)
+
+    def put(self, url, backend, body, status=200, headers=None, ttl=None):
+        """Store a response body (bytes or str) with validators from `headers`"""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        now = time.time()
+        digest = hashlib.sha256(body).hexdigest()
+        key = self.key(url, backend)
+        with self.lock:
+            size = self._write_object(digest, body)
+            old = self.db.execute("SELECT digest, size FROM entries WHERE key = ?", (key,)).fetchone()
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, normalize_url(url), backend, digest, size, status,
+                 headers.get("etag"), headers.get("last-modified"),
+                 now, now + (ttl if ttl is not None else self.ttl_for(backend)), now)
+            )
+            if old and old[0] != digest:
+                self._drop_object_if_unused(*old)
+            self.stats["stores"] += 1
+            if self.stored_bytes > self.max_bytes:
+                self._evict()
+            self.db.commit()
+
+    def refresh(self, url, backend, ttl=None):
+        """Extend an entry's lifetime after a successful revalidation"""
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "UPDATE entries SET expires_at = ?, accessed_at = ? WHERE key = ?",
+                (now + (ttl if ttl is not None else self.ttl_for(backend)), now, self.key(url, backend))
+            )
+            self.db.commit()
+
+    def delete(self, url, backend):
+        key = self.key(url, backend)
+        with self.lock:
+            row = self.db.execute("SELECT digest, size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row:
+                self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._drop_object_if_unused(*row)
+                self.db.commit()
+
+    def total_bytes(self):
+        """Size of the stored objects, summed from the index"""
+        (total,) = self.db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM entries)"
+        ).fetchone()
+        return total
+
+    def _evict(self):
+        """Drop least recently used entries until under max_bytes (lock held)"""
+        while self.stored_bytes > self.max_bytes:
+            oldest = self.db.execute(
+                "SELECT key, digest, size FROM entries ORDER BY accessed_at LIMIT 64"
+            ).fetchall()
+            if not oldest:
+                self.stored_bytes = 0
+                return
+            for key, digest, size in oldest:
+                self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._drop_object_if_unused(digest, size)
+                self.stats["evictions"] += 1
+                if self.stored_bytes <= self.max_bytes:
+                    return
+
+    def close(self):
+        self.db.close()
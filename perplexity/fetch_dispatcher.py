@@ -0,0 +1,255 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from extractor import extract, has_answer
+
+
+def url_pattern(url):
+    """Host plus first path segment, e.g. www.perplexity.ai/search"""
+    parts = urlsplit(url)
+    segment = parts.path.strip("/").split("/", 1)[0]
+    return f"{parts.hostname or ''}/{segment}"
+
+
+class FetchTier:
+    """One way of getting a page: `fetch(url)` returns HTML (str or bytes) or None
+
+    `cost` is a relative price used in reports (e.g. credits per request);
+    the dispatcher tries tiers in the order they are given.
+    """
+
+    def __init__(self, name, fetch, cost=1):
+        self.name = name
+        self.fetch = fetch
+        self.cost = cost
+
+
+class TierStats:
+    """Attempts, outcomes and recent latencies of one tier"""
+
+    def __init__(self, name, cost, window=1000):
+        self.name = name
+        self.cost = cost
+        self.attempts = 0
+        self.successes = 0
+        self.errors = 0
+        self.skipped = 0
+        self.latencies = deque(maxlen=window)
+
+    def latency_ms(self, pct):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return round(ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))] * 1000, 1)
+
+    def as_dict(self):
+        return {
+            "tier": self.name,
+            "cost": self.cost,
+            "attempts": self.attempts,
+            "successes": self.successes,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "success_rate": round(self.successes / self.attempts, 3) if self.attempts else None,
+            "p50_ms": self.latency_ms(50),
+            "p95_ms": self.latency_ms(95),
+        }
+
+
+class FetchDispatcher:
+    """Fetch each URL with the cheapest tier that yields an answer
+
+    Tiers are tried in order and a tier only escalates to the next one when
+    its page has no answer content (see extractor.has_answer) or it raised.
+    Outcomes are counted per URL pattern (`pattern(url)`, host and first path
+    segment by default): once a tier has `min_samples` attempts on a pattern
+    and succeeds less than `min_success_rate` of the time, later URLs of that
+    pattern skip it. A skipped tier is still tried with probability `explore`,
+    and counts are halved past `window` attempts, so a pattern that starts
+    working again is noticed. With `state_path` the learned counts are loaded
+    on start and written by save(). Safe to share between threads.
+    """
+
+    def __init__(self, tiers, pattern=url_pattern, min_samples=5, min_success_rate=0.1,
+                 explore=0.05, window=200, state_path=None):
+        if not tiers:
+            raise ValueError("FetchDispatcher needs at least one tier")
+        self.tiers = list(tiers)
+        self.pattern = pattern
+        self.min_samples = min_samples
+        self.min_success_rate = min_success_rate
+        self.explore = explore
+        self.window = window
+        self.state_path = state_path
+        self.lock = threading.Lock()
+        self.tier_stats = {tier.name: TierStats(tier.name, tier.cost) for tier in self.tiers}
+        self.patterns = {}  # pattern -> {tier name: [attempts, successes]}
+        if state_path and os.path.exists(state_path):
+            with open(state_path, encoding="utf-8") as f:
+                self.patterns = json.load(f)
+
+    def should_try(self, pattern, tier):
+        """False if `tier` is known to fail on `pattern` (apart from exploration)"""
+        attempts, successes = self.patterns.get(pattern, {}).get(tier.name, (0, 0))
+        if attempts < self.min_samples or successes / attempts >= self.min_success_rate:
+            return True
+        return random.random() < self.explore
+
+    def plan(self, url):
+        """Tiers to try for `url`, cheapest first"""
+        pattern = self.pattern(url)
+        with self.lock:
+            planned = [tier for tier in self.tiers if self.should_try(pattern, tier)]
+            if not planned:
+                # Every tier has been failing; try them all rather than none
+                return self.tiers
+            for tier in self.tiers:
+                if tier not in planned:
+                    self.tier_stats[tier.name].skipped += 1
+            return planned
+
+    def _record(self, pattern, tier, success, latency, error=False):
+        with self.lock:
+            stats = self.tier_stats[tier.name]
+            stats.attempts += 1
+            stats.successes += success
+            stats.errors += error
+            stats.latencies.append(latency)
+            counts = self.patterns.setdefault(pattern, {}).setdefault(tier.name, [0, 0])
+            counts[0] += 1
+            counts[1] += success
+            if counts[0] > self.window:
+                counts[0] //= 2
+                counts[1] //= 2
+
+    def fetch(self, url):
+        """(tier name, HTML) from the first tier whose page has an answer, else (None, None)"""
+        pattern = self.pattern(url)
+        for tier in self.plan(url):
+            start = time.perf_counter()
+            try:
+                html = tier.fetch(url)
+            except Exception as e:
+                print(f"{tier.name} failed for {url}: {e}")
+                self._record(pattern, tier, False, time.perf_counter() - start, error=True)
+                continue
+            found = has_answer(html)
+            self._record(pattern, tier, found, time.perf_counter() - start)
+            if found:
+                return tier.name, html
+        return None, None
+
+    def scrape(self, url):
+        """Extracted result (extractor.extract schema plus url and backend), or None"""
+        tier, html = self.fetch(url)
+        if tier is None:
+            return None
+        return dict(extract(html, url=url), url=url, backend=tier)
+
+    def stats(self):
+        with self.lock:
+            return [self.tier_stats[tier.name].as_dict() for tier in self.tiers]
+
+    def learned(self):
+        """{pattern: [tier names that are skipped]}"""
+        with self.lock:
+            return {pattern: [tier.name for tier in self.tiers
+                              if counts.get(tier.name, (0, 0))[0] >= self.min_samples
+                              and counts[tier.name][1] / counts[tier.name][0] < self.min_success_rate]
+                    for pattern, counts in self.patterns.items()}
+
+    def save(self, path=None):
+        """Write the learned per-pattern counts atomically"""
+        path = path or self.state_path
+        with self.lock:
+            data = json.dumps(self.patterns)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def report(self):
+        for stats in self.stats():
+            if stats["attempts"] or stats["skipped"]:
+                print(f"  {stats['tier']}: {stats['successes']}/{stats['attempts']} succeeded, "
+                      f"{stats['skipped']} skipped, p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms")
+
+
+def http_tier(session=None, timeout=15, headers=None, proxy_pool=None):
+    """Plain HTTP GET with requests; only works where the answer is in the served HTML"""
+    import requests
+    from w3lib.encoding import html_to_unicode
+
+    from proxy_pool import proxy_url
+
+    session = session or requests.Session()
+    headers = headers or {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                      "Chrome/117.0.0.0 Safari/537.36",
+        "Accept-Language": "en-US,en;q=0.9",
+    }
+
+    def fetch(url):
+        proxy = proxy_pool.pick() if proxy_pool else None
+        proxies = {"http": proxy_url(proxy), "https": proxy_url(proxy)} if proxy else None
+        start = time.perf_counter()
+        try:
+            response = session.get(url, headers=headers, timeout=timeout, proxies=proxies)
+        except Exception as e:
+            if proxy:
+                proxy_pool.report_error(proxy, e)
+            raise
+        if proxy:
+            proxy_pool.report_status(proxy, response.status_code, time.perf_counter() - start)
+        if response.status_code != 200:
+            return None
+        # Decode with the header charset, then BOM, then <meta>, like Scrapy does
+        return html_to_unicode(response.headers.get("Content-Type"), response.content)[1]
+
+    return FetchTier("http", fetch, cost=0)
+
+
+def scrapingbee_tier(scraper, retries=1):
+    """ScrapingBee API through a PerplexitySharedLinkScraper (escalates its own parameter tiers)"""
+    return FetchTier("scrapingbee", lambda url: scraper.fetch_html(url, retries), cost=scraper.tiers[0][2])
+
+
+def playwright_tier(resource_filter=None, cache=None, proxy_pool=None):
+    """Full browser render with Playwright; the most reliable and the slowest"""
+    def fetch(url):
+        from playwright_perplexity import render_shared_link
+        return render_shared_link(url, resource_filter, cache, proxy_pool)
+
+    return FetchTier("playwright", fetch, cost=10)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from result_sink import ResultSink
+
+    # python fetch_dispatcher.py links.txt [SCRAPINGBEE_API_KEY]
+    tiers = [http_tier()]
+    if len(sys.argv) > 2:
+        from srcapebee_perplexity import PerplexitySharedLinkScraper
+        tiers.append(scrapingbee_tier(PerplexitySharedLinkScraper(sys.argv[2])))
+    tiers.append(playwright_tier())
+
+    dispatcher = FetchDispatcher(tiers, state_path=".cache/dispatch_state.json")
+    os.makedirs(".cache", exist_ok=True)
+    with open(sys.argv[1], encoding="utf-8") as f, ResultSink(prefix="perplexity_dispatch") as sink:
+        for line in f:
+            url = line.strip()
+            if not url:
+                continue
+            result = dispatcher.scrape(url)
+            print(f"{url}: {result['backend'] if result else 'failed'}")
+            if result:
+                sink.write(result)
+    dispatcher.save()
+    dispatcher.report()
@@ -0,0 +1,329 @@
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from fetch_cache import normalize_url
+
+PENDING, IN_FLIGHT, DONE, FAILED = 0, 1, 2, 3
+
+
+def directory_for(path, root=".cache/frontier"):
+    """Frontier directory for a links file, keyed on its absolute path"""
+    path = os.path.abspath(path)
+    digest = hashlib.blake2b(path.encode("utf-8"), digest_size=6).hexdigest()
+    return os.path.join(root, f"{os.path.basename(path)}-{digest}")
+
+
+def fingerprint(url):
+    """16-byte digest of the normalized URL"""
+    return hashlib.blake2b(normalize_url(url).encode("utf-8"), digest_size=16).digest()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 16-byte fingerprints"""
+
+    def __init__(self, capacity, error_rate, bits=None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, fp):
+        # Double hashing on the two halves of the fingerprint
+        h1 = int.from_bytes(fp[:8], "little")
+        h2 = int.from_bytes(fp[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, fp):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(fp))
+
+    def add(self, fp):
+        bits = self.bits
+        for p in self._positions(fp):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+
+class ScalableBloomFilter:
+    """Bloom filter that adds a larger, stricter layer whenever the last one fills up
+
+    Each new layer has `growth` times the capacity and `tightening` times the
+    error rate of the previous one, so the compound false positive rate stays
+    below `error_rate` however many keys are added.
+    """
+
+    MAGIC = b"SBF1"
+
+    def __init__(self, initial_capacity=1_000_000, error_rate=0.001, growth=2, tightening=0.5):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.layers = []
+
+    def __len__(self):
+        return sum(layer.count for layer in self.layers)
+
+    def __contains__(self, fp):
+        return any(fp in layer for layer in reversed(self.layers))
+
+    def add(self, fp):
+        if not self.layers or self.layers[-1].count >= self.layers[-1].capacity:
+            n = len(self.layers)
+            self.layers.append(BloomFilter(
+                self.initial_capacity * self.growth ** n,
+                self.error_rate * (1 - self.tightening) * self.tightening ** n
+            ))
+        self.layers[-1].add(fp)
+
+    @property
+    def nbytes(self):
+        return sum(len(layer.bits) for layer in self.layers)
+
+    def save(self, path):
+        """Write all layers to `path` atomically"""
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.MAGIC)
+            f.write(len(self.layers).to_bytes(4, "little"))
+            for layer in self.layers:
+                f.write(layer.capacity.to_bytes(8, "little"))
+                f.write(repr(layer.error_rate).encode().ljust(32))
+                f.write(layer.count.to_bytes(8, "little"))
+                f.write(layer.bits)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """Read a filter written by save(); a fresh one if `path` is missing"""
+        bloom = cls(**kwargs)
+        if not os.path.exists(path):
+            return bloom
+        with open(path, "rb") as f:
+            if f.read(4) != cls.MAGIC:
+                raise ValueError(f"Not a Bloom filter file: {path}")
+            for _ in range(int.from_bytes(f.read(4), "little")):
+                capacity = int.from_bytes(f.read(8), "little")
+                error_rate = float(f.read(32).decode().strip())
+                count = int.from_bytes(f.read(8), "little")
+                layer = BloomFilter(capacity, error_rate)
+                layer.bits = bytearray(f.read(len(layer.bits)))
+                layer.count = count
+                bloom.layers.append(layer)
+        return bloom
+
+
+class SeenSet:
+    """Exact set of fingerprints: a Bloom filter in memory, the truth in SQLite
+
+    New keys (Bloom miss) are buffered and written in batches without a disk
+    lookup; only Bloom hits are checked against the on-disk index. The caller
+    owns the connection and commits; flush() writes the buffer.
+    """
+
+    def __init__(self, db, bloom_path, table="seen", initial_capacity=1_000_000, error_rate=0.001):
+        self.db = db
+        self.table = table
+        self.bloom_path = bloom_path
+        self.buffer = {}
+        self.db.execute(f"CREATE TABLE IF NOT EXISTS {table} (fp BLOB PRIMARY KEY) WITHOUT ROWID")
+        self.bloom = ScalableBloomFilter.load(bloom_path, initial_capacity=initial_capacity,
+                                              error_rate=error_rate)
+        (rows,) = self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+        if len(self.bloom) != rows:
+            # The process stopped between a commit and the next Bloom save
+            self._rebuild(initial_capacity, error_rate)
+
+    def _rebuild(self, initial_capacity, error_rate):
+        self.bloom = ScalableBloomFilter(initial_capacity=initial_capacity, error_rate=error_rate)
+        for (fp,) in self.db.execute(f"SELECT fp FROM {self.table}"):
+            self.bloom.add(fp)
+
+    def __contains__(self, fp):
+        if fp not in self.bloom:
+            return False
+        return fp in self.buffer or self.db.execute(
+            f"SELECT 1 FROM {self.table} WHERE fp = ?", (fp,)).fetchone() is not None
+
+    def add(self, fp):
+        """Add a fingerprint; True if it was not seen before"""
+        if fp in self:
+            return False
+        self.bloom.add(fp)
+        self.buffer[fp] = None
+        return True
+
+    def flush(self):
+        if self.buffer:
+            self.db.executemany(f"INSERT OR IGNORE INTO {self.table} VALUES (?)",
+                                ((fp,) for fp in self.buffer))
+            self.buffer = {}
+
+    def save_bloom(self):
+        """Persist the Bloom filter; call right after the commit that wrote the buffer"""
+        self.bloom.save(self.bloom_path)
+
+
+class Frontier:
+    """Persistent, deduplicated queue of shared links that survives restarts
+
+    URLs are deduplicated by normalized form through a SeenSet and queued in
+    SQLite with a state (pending, in flight, done, failed). Input files are
+    streamed and their read offsets are stored, so ingest() continues where the
+    last checkpoint left off. A checkpoint is taken every `checkpoint_every`
+    state changes or `checkpoint_interval` seconds. On open, links that were in
+    flight when the process stopped are queued again.
+    """
+
+    def __init__(self, directory=".cache/frontier", checkpoint_every=1000, checkpoint_interval=30,
+                 initial_capacity=1_000_000, error_rate=0.001):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+        self.lock = threading.RLock()
+        self.changes = 0
+        self.last_checkpoint = time.monotonic()
+        self.offsets = {}
+
+        self.db = sqlite3.connect(os.path.join(directory, "frontier.sqlite3"), check_same_thread=False)
+        self.db.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS queue (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL,
+                state INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS queue_state ON queue (state, id);
+            CREATE TABLE IF NOT EXISTS inputs (path TEXT PRIMARY KEY, offset INTEGER NOT NULL);
+        """)
+        self.seen = SeenSet(self.db, os.path.join(directory, "seen.bloom"),
+                            initial_capacity=initial_capacity, error_rate=error_rate)
+        requeued = self.db.execute("UPDATE queue SET state = ? WHERE state = ?", (PENDING, IN_FLIGHT)).rowcount
+        self.db.commit()
+        if requeued:
+            print(f"Frontier: re-queued {requeued} links that were in flight")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, url):
+        """Queue a link unless it was seen before; True if queued"""
+        url = url.strip()
+        if not url:
+            return False
+        with self.lock:
+            if not self.seen.add(fingerprint(url)):
+                return False
+            self.db.execute("INSERT INTO queue (url) VALUES (?)", (url,))
+            self._changed()
+            return True
+
+    def add_many(self, urls):
+        return sum(self.add(url) for url in urls)
+
+    def ingest(self, path, limit=None):
+        """Stream up to `limit` lines from `path` into the queue, resuming at the saved offset
+
+        Returns the number of lines read; 0 means the file is exhausted.
+        """
+        key = os.path.abspath(path)
+        with self.lock:
+            offset = self.offsets.get(key)
+            if offset is None:
+                row = self.db.execute("SELECT offset FROM inputs WHERE path = ?", (key,)).fetchone()
+                offset = row[0] if row else 0
+            lines = 0
+            with open(path, "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    offset += len(line)
+                    self.add(line.decode("utf-8", "replace"))
+                    lines += 1
+                    if limit and lines >= limit:
+                        break
+            self.offsets[key] = offset
+            if lines:
+                self._changed()
+            return lines
+
+    def pending(self, limit=1000):
+        """Take up to `limit` pending links as [(id, url)], marking them in flight"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id, url FROM queue WHERE state = ? ORDER BY id LIMIT ?", (PENDING, limit)
+            ).fetchall()
+            if rows:
+                self.db.executemany("UPDATE queue SET state = ?, attempts = attempts + 1 WHERE id = ?",
+                                    ((IN_FLIGHT, row[0]) for row in rows))
+                self._changed(len(rows))
+            return rows
+
+    def mark_done(self, link_id):
+        self._set_state(link_id, DONE)
+
+    def mark_failed(self, link_id):
+        self._set_state(link_id, FAILED)
+
+    def retry_failed(self):
+        """Queue failed links again; returns how many"""
+        with self.lock:
+            count = self.db.execute("UPDATE queue SET state = ? WHERE state = ?", (PENDING, FAILED)).rowcount
+            self._changed(count)
+            return count
+
+    def requeue_done(self):
+        """Queue finished links again for a fresh pass; returns how many"""
+        with self.lock:
+            count = self.db.execute("UPDATE queue SET state = ? WHERE state = ?", (PENDING, DONE)).rowcount
+            self._changed(count)
+            return count
+
+    def _set_state(self, link_id, state):
+        with self.lock:
+            self.db.execute("UPDATE queue SET state = ? WHERE id = ?", (state, link_id))
+            self._changed()
+
+    def _changed(self, count=1):
+        self.changes += count
+        if (self.changes >= self.checkpoint_every
+                or time.monotonic() - self.last_checkpoint >= self.checkpoint_interval):
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Commit queue, seen set and input offsets together, then save the Bloom filter"""
+        with self.lock:
+            self.seen.flush()
+            self.db.executemany("INSERT OR REPLACE INTO inputs VALUES (?, ?)", self.offsets.items())
+            self.db.commit()
+            self.seen.save_bloom()
+            self.changes = 0
+            self.last_checkpoint = time.monotonic()
+
+    def stats(self):
+        names = {PENDING: "pending", IN_FLIGHT: "in_flight", DONE: "done", FAILED: "failed"}
+        with self.lock:
+            counts = dict.fromkeys(names.values(), 0)
+            for state, count in self.db.execute("SELECT state, COUNT(*) FROM queue GROUP BY state"):
+                counts[names[state]] = count
+            counts["seen"] = len(self.seen.bloom)
+            counts["bloom_kb"] = self.seen.bloom.nbytes // 1024
+            return counts
+
+    def close(self):
+        with self.lock:
+            self.checkpoint()
+            self.db.close()
@@ -0,0 +1,199 @@
+import re
+from urllib.parse import urljoin
+
+import lxml.html
+from lxml import etree
+
+from metrics import timed
+
+BLOCK_TAGS = frozenset([
+    "p", "div", "section", "article", "main", "header", "footer", "aside", "nav", "figure",
+    "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol", "li", "pre", "blockquote", "table", "hr",
+    "dl", "dt", "dd", "details", "summary",
+])
+SKIP_TAGS = frozenset(["script", "style", "noscript", "template", "svg", "button", "img", "video",
+                       "audio", "iframe", "canvas", "head", "form", "input", "select", "textarea"])
+HEADINGS = {"h1": "#", "h2": "##", "h3": "###", "h4": "####", "h5": "#####", "h6": "######"}
+EMPHASIS = {"strong": "**", "b": "**", "em": "_", "i": "_", "del": "~~", "s": "~~"}
+
+_WS = re.compile(r"\s+")
+_SPECIAL = re.compile(r"([\\`*_\[\]])")
+_BLOCK_MARKER = re.compile(r"^(\s*)(#+(?=\s|$)|[-+](?=\s|$)|\d+(?=\.(?:\s|$)))", re.M)
+_CITATION = re.compile(r"^\[?(\d{1,3})\]?$")
+_TRAILING_SPACE = re.compile(r"[ \t]+\n")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def _text(text):
+    """A text node as Markdown: whitespace collapsed, inline syntax escaped"""
+    return _SPECIAL.sub(r"\\\1", _WS.sub(" ", text))
+
+
+def _escape_block_start(text):
+    """Escape text that would start a heading or list item at a line start"""
+    def escape(m):
+        marker = m.group(2)
+        return m.group(1) + (marker + "\\" if marker[0].isdigit() else "\\" + marker)
+    return _BLOCK_MARKER.sub(escape, text)
+
+
+class _Converter:
+    """One walk over an lxml tree, emitting Markdown blocks as it goes"""
+
+    def __init__(self, base_url=None):
+        self.base_url = base_url
+
+    def blocks(self, el, out):
+        """Append the Markdown blocks for `el`'s content to `out`"""
+        inline = []
+        if el.text:
+            inline.append(_text(el.text))
+        for child in el:
+            tag = child.tag
+            if not isinstance(tag, str) or tag in SKIP_TAGS:
+                pass  # comments, processing instructions, media and scripts
+            elif tag in BLOCK_TAGS:
+                self._flush(inline, out)
+                self.block(child, tag, out)
+            else:
+                inline.append(self.inline(child, tag))
+            if child.tail:
+                inline.append(_text(child.tail))
+        self._flush(inline, out)
+        return out
+
+    @staticmethod
+    def _flush(inline, out):
+        if inline:
+            text = "".join(inline).strip()
+            if text:
+                out.append(_escape_block_start(text))
+            inline.clear()
+
+    def block(self, el, tag, out):
+        if tag in HEADINGS:
+            text = self.inline_content(el).strip()
+            if text:
+                out.append(f"{HEADINGS[tag]} {text}")
+        elif tag == "ul" or tag == "ol":
+            items = self.list_items(el, ordered=tag == "ol")
+            if items:
+                out.append("\n".join(items))
+        elif tag == "li":
+            out.append("\n".join(self.list_items([el], ordered=False)))
+        elif tag == "pre":
+            out.append("```\n" + el.text_content().strip("\n") + "\n```")
+        elif tag == "blockquote":
+            quoted = "\n\n".join(self.blocks(el, []))
+            if quoted:
+                out.append("\n".join("> " + line if line else ">" for line in quoted.split("\n")))
+        elif tag == "table":
+            table = self.table(el)
+            if table:
+                out.append(table)
+        elif tag == "hr":
+            out.append("---")
+        else:
+            self.blocks(el, out)
+
+    def list_items(self, items, ordered):
+        lines = []
+        number = 0
+        for li in items:
+            if not isinstance(li.tag, str) or li.tag in SKIP_TAGS:
+                continue
+            number += 1
+            marker = f"{number}. " if ordered else "- "
+            parts = self.blocks(li, [])
+            if not parts:
+                continue
+            indent = " " * len(marker)
+            body = "\n".join(parts).replace("\n", "\n" + indent)
+            lines.append(marker + body)
+        return lines
+
+    def table(self, el):
+        rows = []
+        for tr in el.iter("tr"):
+            cells = [self.inline_content(td).strip().replace("|", "\\|")
+                     for td in tr if td.tag in ("td", "th")]
+            if cells:
+                rows.append(cells)
+        if not rows:
+            return ""
+        width = max(len(r) for r in rows)
+        lines = []
+        for i, cells in enumerate(rows):
+            cells += [""] * (width - len(cells))
+            lines.append("| " + " | ".join(cells) + " |")
+            if i == 0:
+                lines.append("|" + " --- |" * width)
+        return "\n".join(lines)
+
+    def inline_content(self, el):
+        parts = [_text(el.text)] if el.text else []
+        for child in el:
+            tag = child.tag
+            if isinstance(tag, str) and tag not in SKIP_TAGS:
+                parts.append(self.inline(child, tag))
+            if child.tail:
+                parts.append(_text(child.tail))
+        return "".join(parts)
+
+    def inline(self, el, tag):
+        if tag == "br":
+            return "\n"
+        if tag == "a":
+            return self.link(el)
+        if tag == "code":
+            text = el.text_content()
+            return f"`{text}`" if text.strip() else text
+        text = self.inline_content(el)
+        mark = EMPHASIS.get(tag)
+        if mark and text.strip():
+            # Markers must hug the text: "** bold**" is not bold
+            stripped = text.strip()
+            lead = " " if text[0].isspace() else ""
+            trail = " " if text[-1].isspace() else ""
+            return f"{lead}{mark}{stripped}{mark}{trail}"
+        return text
+
+    def link(self, el):
+        text = self.inline_content(el).strip()
+        href = (el.get("href") or "").strip()
+        if not href or href.startswith(("#", "javascript:")):
+            return text
+        url = urljoin(self.base_url, href) if self.base_url else href
+        citation = _CITATION.match(_WS.sub(" ", el.text_content()).strip())
+        if citation or "citation" in (el.get("class") or "").split():
+            # Inline source references render as compact numbered links
+            return f"[{citation.group(1) if citation else text or '*'}]({url})"
+        return f"[{text}]({url})" if text else f"<{url}>"
+
+
+@timed("markdown", "extractor")
+def to_markdown(html, base_url=None, encoding=None):
+    """Markdown for an lxml element, or for raw HTML (str or bytes)
+
+    Walks the tree once: headings, paragraphs, nested lists, tables, code,
+    quotes, emphasis and links are converted; scripts, images and form
+    controls are dropped. Relative links are resolved against `base_url`
+    and citation links ([1], class="citation") become compact "[1](url)".
+    Markdown syntax in the page's text is backslash-escaped. Bytes are decoded with `encoding` when given, else from a <meta>
+    charset or BOM.
+    """
+    if html is None:
+        return ""
+    if not isinstance(html, etree._Element):
+        if not html.strip():
+            return ""
+        parser = lxml.html.HTMLParser(encoding=encoding) if encoding and isinstance(html, bytes) else None
+        html = lxml.html.fragment_fromstring(html, create_parent="div", parser=parser)
+    converter = _Converter(base_url)
+    out = []
+    if html.tag in BLOCK_TAGS and html.tag not in ("div", "section", "article", "main"):
+        converter.block(html, html.tag, out)
+    else:
+        converter.blocks(html, out)
+    text = "\n\n".join(out)
+    return _BLANK_LINES.sub("\n\n", _TRAILING_SPACE.sub("\n", text)).strip()
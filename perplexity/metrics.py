@@ -0,0 +1,215 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+
+# Upper bounds in seconds, from sub-millisecond parsing to minute-long page loads
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram: one bisect and three adds per observation"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class _Timer:
+    """Context manager that observes its duration into a stage histogram"""
+    __slots__ = ("metrics", "key", "start")
+
+    def __init__(self, metrics, key):
+        self.metrics = metrics
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.metrics._observe(self.key, time.perf_counter() - self.start)
+        if exc_type is not None:
+            self.metrics.count("error", backend=self.key[0], stage=self.key[1])
+
+
+class Metrics:
+    """Per-stage timings and event counters shared by all backends
+
+    Stages (launch, goto, wait, extract, markdown, write, ...) are timed with
+    `with metrics.timer(stage, backend):` or the @metrics.timed decorator and
+    kept as fixed-bucket histograms. Events such as retries, blocks and
+    selector fallbacks are plain counters. The registry can be scraped as
+    OpenMetrics text (openmetrics(), or serve(port) for a /metrics
+    endpoint) or written as JSON every few seconds (dump_every(path)).
+    Safe to share between threads.
+    """
+
+    def __init__(self, namespace="perplexity", buckets=BUCKETS):
+        self.namespace = namespace
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.histograms = {}  # (backend, stage) -> Histogram
+        self.counters = {}    # (event, backend, stage) -> int
+        self.started = time.time()
+        self.server = None
+        self.dumper = None
+
+    def timer(self, stage, backend="default"):
+        return _Timer(self, (backend, stage))
+
+    def timed(self, stage, backend="default"):
+        """Decorator form of timer()"""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage, backend):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def observe(self, stage, seconds, backend="default"):
+        """Record a duration measured elsewhere (e.g. Scrapy's download_latency)"""
+        self._observe((backend, stage), seconds)
+
+    def _observe(self, key, seconds):
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def count(self, event, n=1, backend="default", stage=""):
+        key = (event, backend, stage)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    # ---- export ----
+
+    def snapshot(self):
+        """Plain dict of every histogram summary and counter"""
+        with self.lock:
+            stages = {f"{backend}.{stage}": h.as_dict() for (backend, stage), h in sorted(self.histograms.items())}
+            events = {".".join(p for p in key if p): n for key, n in sorted(self.counters.items())}
+        return {"timestamp": time.time(), "uptime_s": round(time.time() - self.started, 1),
+                "stages": stages, "events": events}
+
+    def openmetrics(self):
+        """OpenMetrics text exposition of the registry"""
+        name = f"{self.namespace}_stage_seconds"
+        events = f"{self.namespace}_events"
+        lines = [f"# TYPE {name} histogram", f"# UNIT {name} seconds",
+                 f"# HELP {name} Time spent in each scrape stage."]
+        with self.lock:
+            for (backend, stage), h in sorted(self.histograms.items()):
+                labels = f'backend="{backend}",stage="{stage}"'
+                cumulative = 0
+                for bound, n in zip(self.buckets + ("+Inf",), h.counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_count{{{labels}}} {h.count}")
+                lines.append(f"{name}_sum{{{labels}}} {h.sum}")
+            lines += [f"# TYPE {events} counter", f"# HELP {events} Retries, blocks, selector fallbacks and errors."]
+            for (event, backend, stage), n in sorted(self.counters.items()):
+                labels = f'event="{event}",backend="{backend}"' + (f',stage="{stage}"' if stage else "")
+                lines.append(f"{events}_total{{{labels}}} {n}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9108, host="127.0.0.1"):
+        """Serve openmetrics() at http://host:port/metrics from a daemon thread"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.openmetrics().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"Metrics at http://{host}:{self.server.server_address[1]}/metrics")
+        return self.server
+
+    def dump_json(self, path):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp, path)
+
+    def dump_every(self, path, interval=15):
+        """Rewrite `path` with snapshot() every `interval` seconds (and at exit)"""
+        import atexit
+
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.dump_json(path)
+
+        self.dumper = threading.Thread(target=run, name="metrics-dump", daemon=True)
+        self.dumper.start()
+        atexit.register(lambda: (stop.set(), self.dump_json(path)))
+        return stop
+
+
+# Shared registry used by the scrapers. PERPLEXITY_METRICS_PORT serves it as
+# OpenMetrics, PERPLEXITY_METRICS_JSON dumps it to a file every 15 seconds.
+default_metrics = Metrics()
+timer = default_metrics.timer
+timed = default_metrics.timed
+count = default_metrics.count
+observe = default_metrics.observe
+
+if os.environ.get("PERPLEXITY_METRICS_PORT"):
+    default_metrics.serve(int(os.environ["PERPLEXITY_METRICS_PORT"]))
+if os.environ.get("PERPLEXITY_METRICS_JSON"):
+    default_metrics.dump_every(os.environ["PERPLEXITY_METRICS_JSON"])
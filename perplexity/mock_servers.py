@@ -0,0 +1,656 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class QuietHandler(BaseHTTPRequestHandler):
+    """Base handler: HTTP/1.1 keep-alive and no per-request logging"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def send_body(self, body, status=200, content_type="text/html; charset=utf-8", headers=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, data, status=200, headers=None):
+        self.send_body(json.dumps(data), status, "application/json", headers)
+
+
+class ChatCompletionsHandler(QuietHandler):
+    """Stand-in for POST /chat/completions with a fixed service latency"""
+    latency = 0.05
+
+    def do_POST(self):
+        body = json.loads(self.read_body() or b"{}")
+        prompt = body.get("messages", [{}])[-1].get("content", "")
+        time.sleep(self.latency)
+        self.send_json({
+            "id": "mock",
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": f"Answer to: {prompt}"}}]
+        })
+
+
+class LocalHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class LocalServer:
+    """Run a handler class on 127.0.0.1 in a background thread"""
+
+    def __init__(self, handler_cls, port=0):
+        self.httpd = LocalHTTPServer(("127.0.0.1", port), handler_cls)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+SEARCH_PAGE = """<!doctype html>
+<html><head><title>Perplexity fixture</title></head>
+<body>
+<main>
+  <textarea placeholder="ask anything"></textarea>
+  <button aria-label="Search">Search</button>
+  <div id="answer"></div>
+</main>
+<script>
+document.querySelector("button").addEventListener("click", function () {
+  var q = document.querySelector("textarea").value;
+  setTimeout(function () {
+    var div = document.createElement("div");
+    div.className = "prose";
+    div.textContent = "Fixture answer for " + q + ". ";
+    document.getElementById("answer").appendChild(div);
+    // Stream the rest of the answer in chunks, like the real page does
+    var sent = 0;
+    var timer = setInterval(function () {
+      div.textContent += "Lorem ipsum dolor sit amet, consectetur adipiscing elit. ";
+      if (++sent >= CHUNKS) {
+        clearInterval(timer);
+        div.textContent += "[END]";
+      }
+    }, CHUNK_MS);
+  }, ANSWER_DELAY_MS);
+});
+</script>
+</body></html>
+"""
+
+
+class SearchPageHandler(QuietHandler):
+    """Stand-in for the Perplexity search page: the answer streams in after a delay"""
+    answer_delay_ms = 500
+    chunks = 20
+    chunk_ms = 150
+
+    def do_GET(self):
+        self.send_body(
+            SEARCH_PAGE
+            .replace("ANSWER_DELAY_MS", str(self.answer_delay_ms))
+            .replace("CHUNKS", str(self.chunks))
+            .replace("CHUNK_MS", str(self.chunk_ms))
+        )
+
+
+class HeavyPageHandler(QuietHandler):
+    """Shared-link style page that pulls in images, fonts, media and a third-party script
+
+    The third-party script is served from `localhost` while the page itself
+    is loaded from 127.0.0.1, so a domain denylist can be exercised locally.
+    """
+    images = 12
+    image_bytes = 150_000
+    font_bytes = 80_000
+    media_bytes = 1_000_000
+    script_bytes = 40_000
+
+    def page(self):
+        port = self.server.server_address[1]
+        imgs = "".join(f'<img src="/img/{i}.png">' for i in range(self.images))
+        return f"""<!doctype html>
+<html><head><title>Heavy fixture</title>
+<style>@font-face {{ font-family: F; src: url(/font.woff2); }} body {{ font-family: F; }}</style>
+<script src="/app.js"></script>
+<script src="http://localhost:{port}/tracker.js"></script>
+</head><body>
+<h1>Heavy fixture</h1>
+<div class="prose">{"Answer text. " * 200}</div>
+<div class="sources"><a href="https://example.com/a">A</a><a href="https://example.org/b">B</a></div>
+<ul class="related-questions"><li>Related one?</li><li>Related two?</li></ul>
+{imgs}
+<video src="/clip.mp4" autoplay muted></video>
+</body></html>"""
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/" or path.startswith("/search"):
+            self.send_body(self.page())
+        elif path.startswith("/img/"):
+            self.send_body(b"\0" * self.image_bytes, content_type="image/png")
+        elif path == "/font.woff2":
+            self.send_body(b"\0" * self.font_bytes, content_type="font/woff2")
+        elif path == "/clip.mp4":
+            self.send_body(b"\0" * self.media_bytes, content_type="video/mp4")
+        elif path.endswith(".js"):
+            self.send_body("//" + "x" * self.script_bytes, content_type="application/javascript")
+        else:
+            self.send_body("not found", status=404)
+
+
+def shared_link_html(seed, sections=6, paragraphs=4, sources=8, padding_kb=64):
+    """Synthetic Perplexity shared-link page, deterministic for a given seed
+
+    Mirrors the structure the extractors look for (.prose answer with
+    headings, lists and citation links, .sources, .related-questions) and pads
+    the head with inline script, as the real pages carry large hydration blobs.
+    """
+    rng = random.Random(seed)
+    words = ["quantum", "model", "answer", "source", "india", "cars", "engine", "price",
+             "battery", "range", "safety", "design", "market", "growth", "policy", "data"]
+
+    def sentence():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(8, 20))).capitalize() + "."
+
+    body = []
+    for s in range(sections):
+        body.append(f"<h2>Section {s + 1}: {sentence()}</h2>")
+        for _ in range(paragraphs):
+            cite = rng.randint(1, sources)
+            body.append(f'<p>{sentence()} {sentence()} <a href="https://source{cite}.example.com/page" '
+                        f'class="citation">[{cite}]</a> {sentence()}</p>')
+        body.append("<ul>" + "".join(f"<li><strong>{rng.choice(words)}</strong>: {sentence()}</li>"
+                                     for _ in range(4)) + "</ul>")
+
+    source_links = "".join(f'<a href="https://source{i}.example.com/page">Source {i}</a>'
+                           for i in range(1, sources + 1))
+    related = "".join(f"<li>{sentence()[:-1]}?</li>" for _ in range(5))
+    padding = "x" * (padding_kb * 1024)
+    return f"""<!doctype html>
+<html><head><meta charset="utf-8"><title>Shared answer {seed} - Perplexity</title>
+<script>self.__next_f=self.__next_f||[];self.__next_f.push([1,"{padding}"])</script>
+</head><body>
+<nav><a href="/">Home</a><a href="/discover">Discover</a></nav>
+<main>
+<h1>Shared answer {seed}</h1>
+<div class="prose answer-content">{"".join(body)}</div>
+<div class="sources">{source_links}</div>
+<ul class="related-questions">{related}</ul>
+</main>
+<footer><a href="https://www.perplexity.ai/hub">Hub</a></footer>
+</body></html>"""
+
+
+class SocketIOStandIn:
+    """Minimal socket.io (EIO=4) server speaking the protocol PerplexityWebSocketMonitor expects
+
+    Every `42["query", {...}]` gets `progress_steps` progress_update frames,
+    each carrying the next `delta` of the answer, and after `latency` seconds
+    a query_response echoing the query's session_id. Runs on the caller's
+    asyncio loop via aiohttp.
+    """
+
+    def __init__(self, latency=0.05, progress_steps=2):
+        self.latency = latency
+        self.progress_steps = progress_steps
+        self.runner = None
+        self.port = None
+        self.queries = 0
+
+    @property
+    def ws_url(self):
+        return f"ws://127.0.0.1:{self.port}/socket.io/?EIO=4&transport=websocket"
+
+    async def start(self):
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get("/socket.io/", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def answer(self, ws, query):
+        import asyncio
+
+        session_id = query.get("session_id")
+        answer = f"Answer to: {query.get('query')}. " + "Streamed text. " * 8
+        size = -(-len(answer) // max(self.progress_steps, 1))
+        for step in range(1, self.progress_steps + 1):
+            await asyncio.sleep(self.latency / (self.progress_steps + 1))
+            await ws.send_str("42" + json.dumps(["progress_update", {
+                "session_id": session_id, "progress": int(step * 100 / (self.progress_steps + 1)),
+                "delta": answer[(step - 1) * size:step * size]}]))
+        await asyncio.sleep(self.latency / (self.progress_steps + 1))
+        await ws.send_str("42" + json.dumps(["query_response", {
+            "session_id": session_id,
+            "query": query.get("query"),
+            "answer": answer,
+            "sources": [{"title": "Example", "url": "https://example.com"}],
+            "related_questions": ["What next?"]
+        }]))
+
+    async def handle(self, request):
+        import asyncio
+        from aiohttp import web, WSMsgType
+
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_str('0{"sid":"standin","upgrades":[],"pingInterval":25000,"pingTimeout":20000}')
+        tasks = set()
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            if msg.data.startswith("40"):
+                await ws.send_str('40{"sid":"standin-socket"}')
+            elif msg.data.startswith("42"):
+                event, data = json.loads(msg.data[2:])[:2]
+                if event == "query":
+                    self.queries += 1
+                    task = asyncio.create_task(self.answer(ws, data))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+        return ws
+
+
+class RateLimitedProxyHandler(QuietHandler):
+    """Stand-in for one upstream proxy that rate-limits like the real site
+
+    Answers any GET (including absolute-URI proxy requests) with a shared-link
+    page. Requests over `rate` per second or beyond `max_in_flight` concurrent
+    ones get 429 with Retry-After. Latency grows with the number of requests
+    in flight, so an overloaded proxy is visibly slower before it refuses.
+    Use rate_limited_proxy() to get a handler class with its own limits.
+    """
+    rate = 20
+    max_in_flight = 4
+    latency = 0.05
+    latency_per_request = 0.02
+    bucket = None
+    lock = None
+    in_flight = 0
+    counts = None
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            limited = cls.in_flight >= cls.max_in_flight or cls.bucket.try_acquire() > 0
+            if not limited:
+                cls.in_flight += 1
+            cls.counts["limited" if limited else "served"] += 1
+        if limited:
+            self.send_body("rate limited", status=429, headers={"Retry-After": "1"})
+            return
+        try:
+            time.sleep(self.latency + self.latency_per_request * (cls.in_flight - 1))
+            self.send_body(shared_link_html(hash(self.path) % 1000, padding_kb=4))
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+
+def rate_limited_proxy(rate=20, max_in_flight=4, latency=0.05):
+    """A RateLimitedProxyHandler subclass with its own bucket and counters"""
+    from rate_limit import TokenBucket
+
+    return type("RateLimitedProxy", (RateLimitedProxyHandler,), {
+        "rate": rate,
+        "max_in_flight": max_in_flight,
+        "latency": latency,
+        "bucket": TokenBucket(rate, capacity=max_in_flight),
+        "lock": threading.Lock(),
+        "in_flight": 0,
+        "counts": {"served": 0, "limited": 0},
+    })
+
+
+class ApifyHandler(QuietHandler):
+    """Stand-in for the Apify v2 endpoints ApifyRunManager uses
+
+    POST /v2/acts/<actor>/runs starts a run that succeeds `run_seconds` later
+    (input "runSeconds" overrides it; "fail": true makes it fail).
+    GET /v2/actor-runs/<id> honours waitForFinish. GET
+    /v2/datasets/<id>/items pages through the run's items with offset/limit,
+    one item per input "maxResults" (default `items_per_run`). Use
+    apify_handler() to get a handler class with its own run table.
+    """
+    run_seconds = 0.5
+    items_per_run = 250
+    runs = None
+    lock = None
+    counts = None
+
+    def _route(self):
+        from urllib.parse import parse_qs, urlsplit
+
+        parts = urlsplit(self.path)
+        return parts.path.rstrip("/").split("/"), {k: v[-1] for k, v in parse_qs(parts.query).items()}
+
+    def _run_view(self, run):
+        status = run["status"]
+        if status == "RUNNING" and time.monotonic() >= run["finishes_at"]:
+            status = run["status"] = "FAILED" if run["fail"] else "SUCCEEDED"
+        return {"id": run["id"], "status": status, "defaultDatasetId": run["dataset"]}
+
+    def do_POST(self):
+        cls = type(self)
+        path, _ = self._route()
+        if len(path) != 5 or path[2] != "acts" or path[4] != "runs":
+            self.send_json({"error": "not found"}, status=404)
+            return
+        data = json.loads(self.read_body() or b"{}")
+        with cls.lock:
+            run_id = f"run{len(cls.runs) + 1:06d}"
+            cls.runs[run_id] = {
+                "id": run_id,
+                "dataset": f"ds-{run_id}",
+                "status": "RUNNING",
+                "fail": bool(data.get("fail")),
+                "items": int(data.get("maxResults", self.items_per_run)),
+                "query": data.get("query"),
+                "finishes_at": time.monotonic() + float(data.get("runSeconds", self.run_seconds)),
+            }
+            cls.counts["starts"] += 1
+            run = self._run_view(cls.runs[run_id])
+        self.send_json({"data": run}, status=201)
+
+    def do_GET(self):
+        cls = type(self)
+        path, query = self._route()
+        if len(path) == 4 and path[2] == "actor-runs" and path[3] in cls.runs:
+            run = cls.runs[path[3]]
+            wait = min(float(query.get("waitForFinish", 0)), max(0, run["finishes_at"] - time.monotonic()))
+            if wait:
+                time.sleep(wait)
+            with cls.lock:
+                cls.counts["polls"] += 1
+            self.send_json({"data": self._run_view(run)})
+        elif len(path) == 5 and path[2] == "datasets" and path[4] == "items":
+            run = cls.runs.get(path[3][len("ds-"):])
+            if not run:
+                self.send_json({"error": "not found"}, status=404)
+                return
+            offset = int(query.get("offset", 0))
+            limit = int(query.get("limit", 1000))
+            items = [{"query": run["query"], "rank": i, "url": f"https://www.perplexity.ai/search/{run['id']}-{i}"}
+                     for i in range(offset, min(offset + limit, run["items"]))]
+            with cls.lock:
+                cls.counts["pages"] += 1
+            self.send_json(items, headers={"X-Apify-Pagination-Total": str(run["items"])})
+        else:
+            self.send_json({"error": "not found"}, status=404)
+
+
+def apify_handler(run_seconds=0.5, items_per_run=250):
+    """An ApifyHandler subclass with its own run table and counters"""
+    return type("Apify", (ApifyHandler,), {
+        "run_seconds": run_seconds,
+        "items_per_run": items_per_run,
+        "runs": {},
+        "lock": threading.Lock(),
+        "counts": {"starts": 0, "polls": 0, "pages": 0},
+    })
+
+
+class ScrapingBeeHandler(QuietHandler):
+    """Stand-in for ScrapingBee's HTML API (GET /api/v1/?url=...)
+
+    Each target URL deterministically needs a parameter tier to succeed:
+    plain (about 45% of URLs), render_js (35%), premium_proxy (13%) or
+    stealth_proxy (7%). Below that tier, JS pages come back as an empty shell
+    and proxy-gated pages as 403. Responses carry Spb-Cost, richer tiers are
+    slower, and requests over `max_concurrent` get 429. Use
+    scrapingbee_handler() to get a handler class with its own counters.
+    """
+    max_concurrent = 5
+    costs = (1, 5, 25, 75)
+    latencies = (0.05, 0.2, 0.3, 0.6)
+    lock = None
+    in_flight = 0
+    counts = None
+
+    def required_tier(self, url):
+        import zlib
+
+        bucket = zlib.crc32(url.encode("utf-8")) % 100
+        return 0 if bucket < 45 else 1 if bucket < 80 else 2 if bucket < 93 else 3
+
+    def do_GET(self):
+        from urllib.parse import parse_qs, urlsplit
+
+        cls = type(self)
+        params = {k: v[-1] for k, v in parse_qs(urlsplit(self.path).query).items()}
+        with cls.lock:
+            busy = cls.in_flight >= cls.max_concurrent
+            if not busy:
+                cls.in_flight += 1
+            cls.counts["busy" if busy else "requests"] += 1
+        if busy:
+            self.send_json({"message": "Too many concurrent requests"}, status=429)
+            return
+        try:
+            tier = (3 if params.get("stealth_proxy") == "true" else 2 if params.get("premium_proxy") == "true"
+                    else 1 if params.get("render_js", "true") == "true" else 0)
+            url = params.get("url", "")
+            needed = self.required_tier(url)
+            time.sleep(self.latencies[tier])
+            headers = {"Spb-Cost": str(self.costs[tier])}
+            if tier >= needed:
+                self.send_body(shared_link_html(len(url), padding_kb=4), headers=headers)
+            elif needed == 1:
+                self.send_body("<html><head><title>Perplexity</title></head><body><div id='root'></div></body></html>",
+                               headers=headers)
+            else:
+                self.send_body("Forbidden", status=403, headers=headers)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+
+def scrapingbee_handler(max_concurrent=5):
+    """A ScrapingBeeHandler subclass with its own concurrency limit and counters"""
+    return type("ScrapingBee", (ScrapingBeeHandler,), {
+        "max_concurrent": max_concurrent,
+        "lock": threading.Lock(),
+        "in_flight": 0,
+        "counts": {"requests": 0, "busy": 0},
+    })
+
+
+class TieredSiteHandler(QuietHandler):
+    """Origin site whose URL patterns need different fetch tiers
+
+    /static/... serves the full answer in the HTML, /app/... a JavaScript
+    shell with no answer, and /gated/... a 403 to clients without a browser
+    or premium proxy. Anything else is a 404.
+    """
+    latency = 0.02
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        time.sleep(self.latency)
+        if path.startswith("/static/"):
+            self.send_body(shared_link_html(len(path), padding_kb=4))
+        elif path.startswith("/app/"):
+            self.send_body("<html><head><title>Perplexity</title></head><body><div id='root'></div>"
+                           "<script src='/app.js'></script></body></html>")
+        elif path.startswith("/gated/"):
+            self.send_body("Forbidden", status=403)
+        else:
+            self.send_body("not found", status=404)
+
+
+class StandInElement:
+    def __init__(self, element):
+        self.element = element
+
+    @property
+    def text(self):
+        return " ".join(self.element.text_content().split())
+
+    def get_attribute(self, name):
+        return self.element.get(name)
+
+    def click(self):
+        pass
+
+
+class StandInDriver:
+    """Minimal Selenium WebDriver stand-in that loads pages over plain HTTP
+
+    Startup sleeps `launch_seconds` to stand for launching Chrome and
+    applying stealth, so driver reuse can be measured without a browser.
+    Supports what selinum.PerplexityScraper uses: get, page_source,
+    current_url, title, find_element by CSS selector, save_screenshot, quit.
+    """
+
+    def __init__(self, launch_seconds=1.0):
+        time.sleep(launch_seconds)
+        self.current_url = None
+        self.page_source = ""
+        self.closed = False
+
+    def get(self, url):
+        import urllib.request
+
+        if self.closed:
+            raise RuntimeError("invalid session id")
+        self.current_url = url
+        try:
+            with urllib.request.urlopen(url, timeout=10) as response:
+                self.page_source = response.read().decode("utf-8", "replace")
+        except Exception:
+            self.page_source = "<html><body></body></html>"
+
+    @property
+    def title(self):
+        import lxml.html
+
+        found = lxml.html.document_fromstring(self.page_source or "<html/>").findtext(".//title")
+        return found or ""
+
+    def find_element(self, by, selector):
+        import lxml.html
+        from selenium.common.exceptions import NoSuchElementException
+
+        found = lxml.html.document_fromstring(self.page_source or "<html/>").cssselect(selector)
+        if not found:
+            raise NoSuchElementException(f"No element matches {selector}")
+        return StandInElement(found[0])
+
+    def save_screenshot(self, path):
+        return True
+
+    def quit(self):
+        self.closed = True
+
+
+class FixtureSiteHandler(QuietHandler):
+    """Offline Perplexity-like site for the benchmark suite
+
+    GET /search/<n>       saved (or synthetic) shared-link page number n
+    GET /limited/<n>      the same page behind a token bucket (429 + Retry-After)
+    GET /stream           search page whose answer streams in (SearchPageHandler)
+    GET /api/v1/?url=...  ScrapingBee-style HTML API over the pages above
+
+    Absolute-URI (proxy) requests are answered by path, so the site can also
+    be used as the spider's proxy. Use fixture_site() to get a handler class
+    with its own pages and limits.
+    """
+    pages = ()
+    bucket = None
+    lock = None
+    counts = None
+    latency = 0.01
+
+    def page_for(self, url):
+        from urllib.parse import urlsplit
+
+        parts = urlsplit(url).path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] in ("search", "limited") and parts[1].isdigit() and self.pages:
+            return parts[0], self.pages[int(parts[1]) % len(self.pages)]
+        return parts[0], None
+
+    def do_GET(self):
+        from urllib.parse import parse_qs, urlsplit
+
+        cls = type(self)
+        parts = urlsplit(self.path)
+        if parts.path == "/stream":
+            self.send_body(SEARCH_PAGE.replace("ANSWER_DELAY_MS", "300").replace("CHUNKS", "10")
+                           .replace("CHUNK_MS", "50"))
+            return
+        if parts.path.startswith("/api/v1"):
+            kind, page = self.page_for(parse_qs(parts.query).get("url", [""])[-1])
+        else:
+            kind, page = self.page_for(self.path)
+        if page is None:
+            self.send_body("not found", status=404)
+            return
+        if kind == "limited":
+            with cls.lock:
+                limited = cls.bucket.try_acquire() > 0
+                cls.counts["limited" if limited else "served"] += 1
+            if limited:
+                self.send_body("rate limited", status=429, headers={"Retry-After": "1"})
+                return
+        time.sleep(self.latency)
+        self.send_body(page, headers={"Spb-Cost": "1"} if parts.path.startswith("/api/v1") else None)
+
+
+def fixture_site(pages, rate=50, latency=0.01):
+    """A FixtureSiteHandler subclass serving `pages` (HTML bytes or str)"""
+    from rate_limit import TokenBucket
+
+    return type("FixtureSite", (FixtureSiteHandler,), {
+        "pages": list(pages),
+        "latency": latency,
+        "bucket": TokenBucket(rate, capacity=max(1, rate // 5)),
+        "lock": threading.Lock(),
+        "counts": {"served": 0, "limited": 0},
+    })
@@ -0,0 +1,421 @@
+import argparse
+import bisect
+import glob
+import hashlib
+import json
+import mmap
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from array import array
+
+from export_markdown import normalize_record, read_records
+
+_WORD = re.compile(r"\w+")
+
+BINS = 64          # signature length: one 8-bit MinHash value per bin
+BANDS = 16         # LSH bands of ROWS bins each; candidates share a whole band
+ROWS = BINS // BANDS
+BUCKET_BITS = 16   # band values are looked up through 2**16-entry offset tables
+BUCKET_SHIFT = 8 * ROWS - BUCKET_BITS
+EMPTY = 1 << 32
+# Spreads copied values when filling empty bins, so they rarely collide by chance
+FILL_STEP = 0x9E3779B1
+# Low bit of every byte of a signature, for counting equal bytes of two signatures
+BYTE_LSBS = int.from_bytes(b"\x01" * BINS, "little")
+
+
+def shingles(text, size=3):
+    """Distinct lowercased word shingles of `text`; the words themselves for very short texts"""
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return set(words)
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def signature(text):
+    """64-byte one-permutation MinHash signature of the word shingles of `text`
+
+    Each shingle is hashed once (CRC-32); its low six bits pick one of 64
+    bins and each bin keeps the smallest hash. Empty bins copy the next
+    filled bin (densification). Only one byte of every minimum is kept:
+    equal bytes still estimate Jaccard similarity (see similarity()) at a
+    quarter of the size.
+    """
+    mins = [EMPTY] * BINS
+    for s in shingles(text):
+        h = zlib.crc32(s.encode("utf-8"))
+        b = h & 63
+        if h < mins[b]:
+            mins[b] = h
+    if mins.count(EMPTY) == BINS:
+        return bytes(BINS)
+    for i in range(BINS):
+        if mins[i] == EMPTY:
+            distance = 1
+            while mins[(i + distance) % BINS] == EMPTY:
+                distance += 1
+            mins[i] = (mins[(i + distance) % BINS] + distance * FILL_STEP) | EMPTY
+    return bytes(((m >> 6) ^ (m >> 32)) & 0xFF for m in mins)
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    x = int.from_bytes(a, "little") ^ int.from_bytes(b, "little")
+    # Fold every byte onto its low bit: 1 where the signatures differ
+    x |= x >> 4
+    x |= x >> 2
+    x |= x >> 1
+    equal = BINS - (x & BYTE_LSBS).bit_count()
+    # Unequal minima still agree on the kept byte 1 time in 256
+    return max(0.0, (equal / BINS - 1 / 256) / (1 - 1 / 256))
+
+
+def answer_text(record):
+    """The answer text of any backend's result record (main_content, main_answer, answer)"""
+    return normalize_record(record)["answer"] or ""
+
+
+def record_key(record):
+    """Identity of a result record: its share URL, else a digest of the whole record"""
+    url = normalize_record(record)["url"]
+    if url:
+        return url
+    data = json.dumps(record, sort_keys=True, default=str).encode("utf-8")
+    return "record:" + hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class NearDuplicateIndex:
+    """Streaming near-duplicate detector over MinHash signatures with LSH banding
+
+    Answers are near duplicates when the estimated Jaccard similarity of
+    their word 3-shingles is at least `threshold` (0.8 is roughly "one word
+    in thirty edited"). Signatures are split into 16 bands of 4 bytes; only
+    items sharing a whole band with the new answer are compared, so an insert
+    scores a handful of candidates even at millions of items. Items are
+    clustered greedily: an answer joins the cluster of its most similar
+    match, or starts a new cluster. Only cluster representatives go into the
+    band tables, so a thousand copies of one answer cost one bucket entry.
+
+    save() writes the index as one flat file that is memory-mapped on open:
+    signatures, cluster ids, and per band the representatives' (band value,
+    id) pairs sorted, with a 2**16-entry offset table over the top bits of
+    the band value (under 200 bytes per item). Items added since live in
+    compact in-memory arrays until the next save(). Item ids are sequential
+    from 0, in insertion order. Thread safe.
+    """
+
+    MAGIC = b"NDX1"
+
+    def __init__(self, path=None, threshold=0.8):
+        self.path = path
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.stats = {"added": 0, "duplicates": 0, "candidates": 0}
+
+        self.mm = None
+        self.base = 0  # items in the mapped file
+        self.base_signatures = b""
+        self.base_clusters = array("I")
+        self.base_tables = [(array("I", bytes(4 * ((1 << BUCKET_BITS) + 1))), array("Q"))] * BANDS
+        self.signatures = bytearray()
+        self.clusters = array("I")
+        self.delta = [{} for _ in range(BANDS)]  # band bucket -> array of band value << 32 | id
+        if path and os.path.exists(path):
+            self._open(path)
+
+    def __len__(self):
+        return self.base + len(self.clusters)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- lookup ----
+
+    def signature_of(self, item_id):
+        if item_id < self.base:
+            return self.base_signatures[item_id * BINS:(item_id + 1) * BINS]
+        start = (item_id - self.base) * BINS
+        return self.signatures[start:start + BINS]
+
+    def cluster(self, item_id):
+        """Id of the cluster representative `item_id` belongs to (itself if unique)"""
+        return self.base_clusters[item_id] if item_id < self.base else self.clusters[item_id - self.base]
+
+    def _candidates(self, sig):
+        """Ids of representatives that share at least one whole band with `sig`"""
+        found = set()
+        for band, ((offsets, entries), delta) in enumerate(zip(self.base_tables, self.delta)):
+            value = int.from_bytes(sig[band * ROWS:(band + 1) * ROWS], "big")
+            bucket = value >> BUCKET_SHIFT
+            key = value << 32
+            end = offsets[bucket + 1]
+            k = bisect.bisect_left(entries, key, offsets[bucket], end)
+            while k < end and entries[k] >> 32 == value:
+                found.add(entries[k] & 0xFFFFFFFF)
+                k += 1
+            for entry in delta.get(bucket, ()):
+                if entry >> 32 == value:
+                    found.add(entry & 0xFFFFFFFF)
+        return found
+
+    def _match(self, sig):
+        """(representative id, similarity) of the most similar indexed item at or above threshold"""
+        best, best_similarity = -1, self.threshold
+        candidates = self._candidates(sig)
+        self.stats["candidates"] += len(candidates)
+        for item_id in candidates:
+            score = similarity(sig, self.signature_of(item_id))
+            if score > best_similarity or (score == best_similarity and (best < 0 or item_id < best)):
+                best, best_similarity = item_id, score
+        return (best, best_similarity) if best >= 0 else None
+
+    def query(self, text):
+        """(cluster id, similarity) of the closest near duplicate of `text`, or None"""
+        sig = signature(text)
+        with self.lock:
+            return self._match(sig)
+
+    def add(self, text):
+        """Index `text`; returns (item id, cluster id it duplicates or None)"""
+        return self.add_signature(signature(text))
+
+    def add_signature(self, sig):
+        with self.lock:
+            match = self._match(sig)
+            item_id = len(self)
+            self.signatures += sig
+            self.stats["added"] += 1
+            if match:
+                self.clusters.append(match[0])
+                self.stats["duplicates"] += 1
+                return item_id, match[0]
+            self.clusters.append(item_id)
+            for band, delta in enumerate(self.delta):
+                value = int.from_bytes(sig[band * ROWS:(band + 1) * ROWS], "big")
+                entries = delta.get(value >> BUCKET_SHIFT)
+                if entries is None:
+                    entries = delta[value >> BUCKET_SHIFT] = array("Q")
+                entries.append(value << 32 | item_id)
+            return item_id, None
+
+    def clusters_of(self, min_size=2):
+        """{representative id: [member ids]} for clusters with at least `min_size` items"""
+        with self.lock:
+            members = {}
+            for item_id in range(len(self)):
+                members.setdefault(self.cluster(item_id), []).append(item_id)
+        return {rep: ids for rep, ids in members.items() if len(ids) >= min_size}
+
+    # ---- file ----
+
+    @staticmethod
+    def _layout(count, representatives):
+        """Byte offsets of the signatures, the cluster ids and each band's (offsets, entries) table"""
+        signatures = 16  # magic, padding, item count, representative count
+        clusters = signatures + BINS * count
+        offset = clusters + 4 * count
+        tables = []
+        for _ in range(BANDS):
+            tables.append((offset, offset + 4 * ((1 << BUCKET_BITS) + 1)))
+            offset = tables[-1][1] + 8 * representatives
+        return signatures, clusters, tables
+
+    def _open(self, path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = self.mm[:16]
+        if header[:4] != self.MAGIC:
+            raise ValueError(f"Not a near-duplicate index: {path}")
+        self.base = count = int.from_bytes(header[8:12], "little")
+        representatives = int.from_bytes(header[12:16], "little")
+        signatures, clusters, tables = self._layout(count, representatives)
+        view = memoryview(self.mm)
+        self.base_signatures = view[signatures:clusters]
+        self.base_clusters = view[clusters:clusters + 4 * count].cast("I")
+        self.base_tables = [(view[start:entries].cast("I"), view[entries:entries + 8 * representatives].cast("Q"))
+                            for start, entries in tables]
+
+    def _release(self):
+        if self.mm is not None:
+            for offsets, entries in self.base_tables:
+                offsets.release()
+                entries.release()
+            self.base_signatures.release()
+            self.base_clusters.release()
+            self.mm.close()
+            self.mm = None
+
+    def save(self, path=None):
+        """Write mapped and new items to one file atomically, then map it"""
+        path = path or self.path
+        with self.lock:
+            count = len(self)
+            signatures = bytes(self.base_signatures) + bytes(self.signatures)
+            clusters = array("I")
+            clusters.frombytes(memoryview(self.base_clusters).cast("B"))
+            clusters.extend(self.clusters)
+            representatives = [i for i, c in enumerate(clusters) if i == c]
+
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(self.MAGIC + bytes(4) + count.to_bytes(4, "little")
+                        + len(representatives).to_bytes(4, "little"))
+                f.write(signatures)
+                clusters.tofile(f)
+                for band in range(BANDS):
+                    start = band * ROWS
+                    entries = array("Q", sorted(
+                        int.from_bytes(signatures[i * BINS + start:i * BINS + start + ROWS], "big") << 32 | i
+                        for i in representatives))
+                    offsets = array("I", bytes(4 * ((1 << BUCKET_BITS) + 1)))
+                    for entry in entries:
+                        offsets[(entry >> 32 >> BUCKET_SHIFT) + 1] += 1
+                    for bucket in range(1, len(offsets)):
+                        offsets[bucket] += offsets[bucket - 1]
+                    offsets.tofile(f)
+                    entries.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+
+            self._release()
+            self.signatures = bytearray()
+            self.clusters = array("I")
+            self.delta = [{} for _ in range(BANDS)]
+            self.path = path
+            self._open(path)
+
+    @property
+    def nbytes(self):
+        """Size of the mapped file plus the unsaved arrays"""
+        delta = sum(len(entries) * 8 for table in self.delta for entries in table.values())
+        return (len(self.mm) if self.mm is not None else 0) + len(self.signatures) + 4 * len(self.clusters) + delta
+
+    def close(self):
+        with self.lock:
+            self._release()
+
+
+class IndexedKeys:
+    """Keys of the records already in a NearDuplicateIndex, in SQLite next to it
+
+    Maps record_key() to item id, so running dedupe over the same files
+    again looks records up instead of indexing them a second time. Keys
+    added since the last commit() are held in memory.
+    """
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS keys (key TEXT PRIMARY KEY, item INTEGER NOT NULL);
+        """)
+        self.pending = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, key):
+        """Item id of an indexed record key, or None"""
+        item_id = self.pending.get(key)
+        if item_id is None:
+            row = self.db.execute("SELECT item FROM keys WHERE key = ?", (key,)).fetchone()
+            item_id = row[0] if row else None
+        return item_id
+
+    def add(self, key, item_id):
+        self.pending[key] = item_id
+
+    def clear(self):
+        self.pending.clear()
+        self.db.execute("DELETE FROM keys")
+        self.db.commit()
+
+    def commit(self):
+        """Write the keys added since the last commit; call once the index is saved"""
+        self.db.executemany("INSERT OR REPLACE INTO keys VALUES (?, ?)", self.pending.items())
+        self.db.commit()
+        self.pending.clear()
+
+    def close(self):
+        self.db.close()
+
+
+def flag_duplicates(records, index, keys=None, stats=None):
+    """Yield records with "dedupe_id" and, for near duplicates, "duplicate_of" added
+
+    Records without answer text are passed through unflagged and not
+    indexed. With `keys` (an IndexedKeys), records indexed before keep their
+    item id and are not added again. `stats` counts "empty" and "known"
+    records.
+    """
+    stats = stats if stats is not None else {}
+    for record in records:
+        text = answer_text(record)
+        if not _WORD.search(text):
+            stats["empty"] = stats.get("empty", 0) + 1
+            yield record
+            continue
+        key = record_key(record) if keys is not None else None
+        item_id = keys.get(key) if key is not None else None
+        if item_id is not None and item_id < len(index):
+            stats["known"] = stats.get("known", 0) + 1
+            duplicate_of = index.cluster(item_id)
+            duplicate_of = duplicate_of if duplicate_of != item_id else None
+        else:
+            item_id, duplicate_of = index.add(text)
+            if key is not None:
+                keys.add(key, item_id)
+        flagged = dict(record, dedupe_id=item_id)
+        if duplicate_of is not None:
+            flagged["duplicate_of"] = duplicate_of
+        yield flagged
+
+
+def dedupe(paths, index_path, threshold=0.8):
+    """Flag near-duplicate answers in sink files against a persistent index; returns the index stats
+
+    Records already in the index (by share URL, else by content) are looked
+    up rather than added again, so re-runs over the same files are stable.
+    """
+    os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+    counts = {"empty": 0, "known": 0}
+    with NearDuplicateIndex(index_path, threshold=threshold) as index, \
+            IndexedKeys(f"{index_path}.keys.sqlite3") as keys:
+        if not len(index):
+            keys.clear()  # keys of an index that was deleted
+        for path in paths:
+            for record in flag_duplicates(read_records(path), index, keys, counts):
+                if "duplicate_of" in record:
+                    url = normalize_record(record)["url"]
+                    print(f"{path}: item {record['dedupe_id']} ({url}) duplicates item {record['duplicate_of']}")
+        index.save()
+        keys.commit()
+        stats = dict(index.stats, **counts, indexed=len(index), clusters=len(index.clusters_of()))
+    print(f"{stats['added']} answers indexed, {stats['duplicates']} near duplicates, "
+          f"{stats['known']} already indexed, {stats['empty']} without an answer, "
+          f"{stats['clusters']} duplicate clusters in the index")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flag near-duplicate answers in result sink files")
+    parser.add_argument("inputs", nargs="+", help="JSONL/Parquet files or glob patterns")
+    parser.add_argument("--index", default=".cache/near_duplicates.idx", help="index file, reused across runs")
+    parser.add_argument("--threshold", type=float, default=0.8, help="estimated Jaccard similarity of duplicates")
+    args = parser.parse_args(argv)
+    dedupe([p for pattern in args.inputs for p in sorted(glob.glob(pattern))], args.index, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
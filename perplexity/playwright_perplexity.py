@@ -1,119 +1,232 @@
 from playwright.sync_api import sync_playwright
+import asyncio
 import random
+import sys
 import time
 from datetime import datetime
 import json
 
-def scrape_perplexity_shared_link(url):
+from browser_pool import BrowserPool
+from debug_artifacts import default_artifacts
+from extractor import extract
+from fetch_cache import FetchCache, normalize_url, strip_scripts
+from metrics import count, timer
+from proxy_pool import BAN_STATUSES, THROTTLE_STATUSES, ProxyBlocked, parse_retry_after, playwright_proxy
+from resource_filter import ResourceFilter
+from result_sink import ResultSink
+
+# Answer container the scrapers wait for before extracting
+CONTENT_SELECTOR = ".prose, .answer-content, [role='article']"
+
+CONTEXT_OPTIONS = {
+    "viewport": {"width": 1280, "height": 720},
+    "locale": "en-US",
+    "timezone_id": "America/New_York"
+}
+
+STEALTH_SCRIPT = """
+    delete navigator.webdriver;
+    Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3]});
+"""
+
+def launch_args():
+    """Chromium flags with a randomised desktop user agent"""
+    return [
+        "--disable-blink-features=AutomationControlled",
+        f"--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{random.randint(100, 120)}.0.0.0 Safari/537.36"
+    ]
+
+def cached_snapshot(cache, url):
+    """Fresh cached snapshot body for url, or None"""
+    if not cache:
+        return None
+    entry = cache.get(url, "playwright", revalidate=True)
+    return entry.body if entry else None
+
+def is_same_url(url):
+    """page.route matcher for exactly this (normalized) URL"""
+    target = normalize_url(url)
+    return lambda candidate: normalize_url(candidate) == target
+
+def check_blocked(response):
+    """Raise ProxyBlocked if the target refused the page"""
+    if response and response.status in BAN_STATUSES + THROTTLE_STATUSES:
+        count("block", backend="playwright")
+        raise ProxyBlocked(response.status, parse_retry_after(response.headers.get("retry-after")))
+
+def scrape_perplexity_shared_link(url, resource_filter=None, cache=None, proxy_pool=None, artifacts=None):
     """Scrape content from a Perplexity.ai shared link"""
+    html = render_shared_link(url, resource_filter, cache, proxy_pool, artifacts)
+    return build_result(url, html) if html else None
+
+def render_shared_link(url, resource_filter=None, cache=None, proxy_pool=None, artifacts=None):
+    """Rendered HTML of a shared link once its answer is on the page, or None"""
+    resource_filter = resource_filter or ResourceFilter()
+    artifacts = artifacts or default_artifacts
+    snapshot = cached_snapshot(cache, url)
+    proxy = proxy_pool.pick() if proxy_pool and not snapshot else None
     with sync_playwright() as p:
         # Configure browser with stealth settings
-        browser = p.chromium.launch(
-            headless=False,
-            args=[
-                "--disable-blink-features=AutomationControlled",
-                f"--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{random.randint(100, 120)}.0.0.0 Safari/537.36"
-            ]
-        )
-        
-        context = browser.new_context(
-            viewport={"width": 1280, "height": 720},
-            locale="en-US",
-            timezone_id="America/New_York"
-        )
-
-        # Stealth modifications
-        context.add_init_script("""
-            delete navigator.webdriver;
-            Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3]});
-        """)
-
-        page = context.new_page()
+        options = {"headless": False, "args": launch_args()}
+        if proxy:
+            options["proxy"] = playwright_proxy(proxy)
+        with timer("launch", "playwright"):
+            browser = p.chromium.launch(**options)
+            
+            context = browser.new_context(**CONTEXT_OPTIONS)
+
+            # Stealth modifications
+            context.add_init_script(STEALTH_SCRIPT)
+
+            page = context.new_page()
+            page_stats = resource_filter.install(page)
+        if snapshot:
+            # Replay the cached snapshot instead of downloading the page again
+            page.route(is_same_url(url), lambda route: route.fulfill(
+                status=200, content_type="text/html; charset=utf-8", body=snapshot))
         
         try:
             # Navigate to the shared link
-            page.goto(url, timeout=60000)
+            start = time.perf_counter()
+            with timer("goto", "playwright"):
+                response = page.goto(url, timeout=60000)
+            check_blocked(response)
             
             # Wait for content to load
-            page.wait_for_selector(".prose, .answer-content, [role='article']", timeout=15000)
+            with timer("wait", "playwright"):
+                page.wait_for_selector(CONTENT_SELECTOR, timeout=15000)
+            if proxy:
+                proxy_pool.report_success(proxy, time.perf_counter() - start)
             
-            # Extract content structure
-            result = {
-                "title": get_element_text(page, "h1") or page.title(),
-                "timestamp": datetime.now().isoformat(),
-                "source_url": url,
-                "content": {}
-            }
-
-            # Main content
-            result["content"]["main_answer"] = get_element_text(
-                page, 
-                ".prose, .answer-content, [role='article']"
-            )
-
-            # Sources/references
-            result["content"]["sources"] = page.eval_on_selector_all(
-                ".sources a, a[href*='http']", 
-                "elements => elements.map(el => ({text: el.innerText, url: el.href}))"
-            )
-
-            # Related questions
-            result["content"]["related_questions"] = page.eval_on_selector_all(
-                ".related-question, .related-questions li", 
-                "elements => elements.map(el => el.innerText)"
-            )
-
-            # Save screenshot for debugging
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            page.screenshot(path=f"perplexity_{timestamp}.png")
+            html = page.content()
 
-            return result
+            # Debug screenshot, if the artifact policy samples this page
+            artifacts.capture(page, url)
+
+            print(f"Requests: {page_stats.allowed} loaded ({page_stats.bytes_loaded // 1024} KB), {page_stats.blocked} saved")
+            if cache and not snapshot:
+                cache.put(url, "playwright", strip_scripts(html),
+                          headers=response.headers if response else None)
+            return html
 
         except Exception as e:
             print(f"Error scraping {url}: {str(e)}")
-            page.screenshot(path="error.png")
+            if proxy:
+                proxy_pool.report_error(proxy, e)
+            artifacts.capture(page, url, failed=True)
             return None
 
         finally:
             browser.close()
 
-def get_element_text(page, selector):
-    """Helper to safely get text content"""
+def build_result(url, html):
+    """Result dict for a loaded shared-link page"""
+    with timer("extract", "playwright"):
+        extracted = extract(html, url=url)
+    return {
+        "title": extracted["title"],
+        "timestamp": datetime.now().isoformat(),
+        "source_url": url,
+        "content": {
+            "main_answer": extracted["main_answer"],
+            "sources": extracted["sources"],
+            "related_questions": extracted["related_questions"]
+        }
+    }
+
+async def scrape_perplexity_shared_link_async(pool, url, cache=None, artifacts=None):
+    """Scrape one shared link in a page borrowed from a BrowserPool"""
+    artifacts = artifacts or default_artifacts
+    # Cache lookups hit SQLite and may revalidate against the origin with a
+    # blocking request, so they run off the event loop
+    snapshot = await asyncio.to_thread(cached_snapshot, cache, url)
     try:
-        return page.locator(selector).first.text_content()
-    except:
+        async with pool.page() as page:
+            if snapshot:
+                async def replay(route):
+                    await route.fulfill(status=200, content_type="text/html; charset=utf-8", body=snapshot)
+                await page.route(is_same_url(url), replay)
+
+            try:
+                with timer("goto", "playwright"):
+                    response = await page.goto(url, timeout=60000)
+                check_blocked(response)
+                with timer("wait", "playwright"):
+                    await page.wait_for_selector(CONTENT_SELECTOR, timeout=15000)
+            except Exception:
+                await artifacts.capture_async(page, url, failed=True)
+                raise
+
+            html = await page.content()
+            await artifacts.capture_async(page, url)
+            result = build_result(url, html)
+            if cache and not snapshot:
+                await asyncio.to_thread(cache.put, url, "playwright", strip_scripts(html),
+                                        headers=response.headers if response else None)
+            return result
+    except Exception as e:
+        print(f"Error scraping {url}: {str(e)}")
         return None
 
+async def scrape_perplexity_shared_links(urls, concurrency=8, pages_per_context=4,
+                                         max_uses_per_context=50, headless=True, resource_filter=None,
+                                         cache=None, proxy_pool=None):
+    """Scrape many shared links in one browser, yielding (url, result) as each finishes"""
+    pool = BrowserPool(
+        headless=headless,
+        launch_args=launch_args(),
+        context_options=CONTEXT_OPTIONS,
+        init_script=STEALTH_SCRIPT,
+        contexts=max(1, -(-concurrency // pages_per_context)),
+        pages_per_context=pages_per_context,
+        max_uses_per_context=max_uses_per_context,
+        resource_filter=resource_filter or ResourceFilter(),
+        proxy_pool=proxy_pool
+    )
+
+    async def scrape(url):
+        return url, await scrape_perplexity_shared_link_async(pool, url, cache)
+
+    async with pool:
+        tasks = [asyncio.ensure_future(scrape(url)) for url in urls]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+async def _run_batch(urls, sink):
+    ok = 0
+    async for url, result in scrape_perplexity_shared_links(urls, cache=FetchCache()):
+        if result:
+            ok += 1
+            sink.write(dict(result, backend="playwright"))
+    print(f"{ok}/{len(urls)} links scraped")
+
 if __name__ == "__main__":
+    # Results go to a rotating JSONL sink; render Markdown later with export_markdown.py
+    sink = ResultSink(prefix="perplexity_playwright")
+
+    # Batch mode: python playwright_perplexity.py URL [URL ...]  (or @file with one URL per line)
+    if len(sys.argv) > 1:
+        urls = sys.argv[1:]
+        if len(urls) == 1 and urls[0].startswith("@"):
+            with open(urls[0][1:], encoding="utf-8") as f:
+                urls = [line.strip() for line in f if line.strip()]
+        with sink:
+            asyncio.run(_run_batch(urls, sink))
+        sys.exit(0)
+
     # Example shared link (replace with your target URL)
     SHARED_LINK = "shared_link_1"
     
     print(f"Scraping {SHARED_LINK}...")
-    results = scrape_perplexity_shared_link(SHARED_LINK)
+    results = scrape_perplexity_shared_link(SHARED_LINK, cache=FetchCache())
     
-    md_filename = f"perplexity_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
-    with open(md_filename, 'w') as f:
-        f.write(f"# Scraping Results for {SHARED_LINK}\n\n")
-        if results:
-            f.write(f"## Title: {results.get('title', '')}\n")
-            f.write(f"**Timestamp:** {results.get('timestamp', '')}\n")
-            f.write(f"**Source URL:** {results.get('source_url', '')}\n\n")
-            f.write("### Main Answer\n")
-            f.write(results['content'].get('main_answer', 'No answer found.') + "\n\n")
-            f.write("### Sources\n")
-            sources = results['content'].get('sources', [])
-            if sources:
-                for src in sources:
-                    f.write(f"- [{src.get('text','')}]({src.get('url','')})\n")
-            else:
-                f.write("No sources found.\n")
-            f.write("\n### Related Questions\n")
-            related = results['content'].get('related_questions', [])
-            if related:
-                for q in related:
-                    f.write(f"- {q}\n")
-            else:
-                f.write("No related questions found.\n")
-        else:
-            f.write("Scraping failed.\n")
-    print(f"Results saved to {md_filename}")
\ No newline at end of file
+    if results:
+        with sink:
+            sink.write(dict(results, backend="playwright"))
+        print(f"Results saved to {sink.path}")
+    else:
+        print("Scraping failed.")
@@ -1,10 +1,23 @@
-import requests
+import asyncio
+import json
+import os
+import random
+import sys
 import time
 
+import aiohttp
+import requests
+
+from result_sink import ResultSink
+
 # API URLs
 POST_URL = "https://api.apify.com/v2/actor-runs/2i8atIASOvGQnPcvo/resurrect?token=apify_api_7vRwaaAlsHHoR6CVsuTJIlfKOTjao401V7fE"
 GET_URL = "https://api.apify.com/v2/actor-runs/2i8atIASOvGQnPcvo?token=apify_api_7vRwaaAlsHHoR6CVsuTJIlfKOTjao401V7fE"
 
+API_BASE = "https://api.apify.com/v2"
+TERMINAL_STATUSES = {"SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT"}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
 def send_input_to_apify(input_data):
     """Send input to Apify actor"""
     response = requests.post(POST_URL, json=input_data)
@@ -15,23 +28,198 @@ def get_results_from_apify():
     response = requests.get(GET_URL)
     return response.json()
 
-def run_apify_task(input_data, wait_time=5):
-    """Send input and wait for results"""
+def run_apify_task(input_data, wait_time=5, timeout=600):
+    """Send input and poll until the run finishes
+
+    Polls start after one second and back off exponentially to at most
+    `wait_time` seconds apart; gives up after `timeout` seconds.
+    """
     # Send input
     print("Sending input to Apify...")
     post_result = send_input_to_apify(input_data)
     print(f"Input sent: {post_result}")
     
     # Wait for processing
-    time.sleep(wait_time)
+    delay = 1
+    deadline = time.monotonic() + timeout
+    while True:
+        results = get_results_from_apify()
+        status = results.get("data", {}).get("status")
+        if status in TERMINAL_STATUSES or time.monotonic() >= deadline:
+            break
+        print(f"Run status: {status}, checking again in {delay}s")
+        time.sleep(delay)
+        delay = min(delay * 2, wait_time)
     
-    # Get results
     print("Getting results...")
-    results = get_results_from_apify()
     return results
 
+class ApifyRunManager:
+    """Run many Apify actor runs concurrently and stream their datasets
+
+    Each run is started, then polled with exponential backoff (plus jitter)
+    from `poll_initial` up to `poll_max` seconds until it reaches a terminal
+    status. Each poll also asks Apify to hold the request open for up to
+    `wait_for_finish` seconds. Dataset items of successful runs are fetched
+    `page_size` at a time. At most `concurrency` HTTP requests are in flight.
+    """
+
+    def __init__(self, actor_id, token=None, base_url=API_BASE, concurrency=32, poll_initial=1.0,
+                 poll_max=30.0, wait_for_finish=5, run_timeout=3600, page_size=1000, timeout=90,
+                 max_retries=3):
+        self.actor_id = actor_id
+        self.token = token or os.environ.get("APIFY_TOKEN")
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.poll_initial = poll_initial
+        self.poll_max = poll_max
+        self.wait_for_finish = wait_for_finish
+        self.run_timeout = run_timeout
+        self.page_size = page_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.semaphore = None
+        self.session = None
+        self.stats = {"runs": 0, "polls": 0, "pages": 0, "items": 0, "failed": 0}
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def open(self):
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=30),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"Authorization": f"Bearer {self.token}"} if self.token else None
+        )
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def _request(self, method, path, **kwargs):
+        """JSON request with retries on 429/5xx and connection errors"""
+        for attempt in range(self.max_retries + 1):
+            delay = 2 ** attempt
+            try:
+                async with self.semaphore:
+                    async with self.session.request(method, f"{self.base_url}{path}", **kwargs) as response:
+                        if response.status < 400:
+                            return await response.json()
+                        if response.status not in RETRY_STATUSES or attempt == self.max_retries:
+                            response.raise_for_status()
+                        retry_after = response.headers.get("Retry-After")
+                        if retry_after and retry_after.isdigit():
+                            delay = int(retry_after)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == self.max_retries:
+                    raise
+            await asyncio.sleep(delay)
+
+    async def start_run(self, input_data):
+        """Start one actor run; returns the run object"""
+        data = await self._request("POST", f"/acts/{self.actor_id}/runs", json=input_data)
+        self.stats["runs"] += 1
+        return data["data"]
+
+    async def wait_for_run(self, run_id):
+        """Poll a run with exponential backoff until it reaches a terminal status"""
+        delay = self.poll_initial
+        deadline = time.monotonic() + self.run_timeout
+        while True:
+            data = await self._request("GET", f"/actor-runs/{run_id}",
+                                       params={"waitForFinish": self.wait_for_finish})
+            self.stats["polls"] += 1
+            run = data["data"]
+            if run["status"] in TERMINAL_STATUSES:
+                return run
+            if time.monotonic() >= deadline:
+                raise asyncio.TimeoutError(f"Run {run_id} still {run['status']} after {self.run_timeout}s")
+            await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+            delay = min(delay * 2, self.poll_max)
+
+    async def iter_dataset(self, dataset_id):
+        """Yield dataset items page by page"""
+        offset = 0
+        while True:
+            items = await self._request("GET", f"/datasets/{dataset_id}/items", params={
+                "format": "json", "clean": "true", "offset": offset, "limit": self.page_size
+            })
+            self.stats["pages"] += 1
+            for item in items:
+                yield item
+            self.stats["items"] += len(items)
+            if len(items) < self.page_size:
+                return
+            offset += len(items)
+
+    async def run(self, input_data, sink, index=None):
+        """Start, await and drain one run into `sink`; returns a run summary"""
+        summary = {"index": index, "run_id": None, "status": None, "items": 0, "error": None}
+        start = time.perf_counter()
+        try:
+            run = await self.start_run(input_data)
+            summary["run_id"] = run["id"]
+            run = await self.wait_for_run(run["id"])
+            summary["status"] = run["status"]
+            if run["status"] == "SUCCEEDED":
+                async for item in self.iter_dataset(run["defaultDatasetId"]):
+                    sink.write(dict(item, backend="apify", run_id=run["id"], input_index=index))
+                    summary["items"] += 1
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            summary["error"] = str(e) or type(e).__name__
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            # Malformed JSON or an unexpected shape fails this run, not the batch
+            summary["error"] = f"malformed response: {type(e).__name__}: {e}"
+        if summary["status"] != "SUCCEEDED":
+            self.stats["failed"] += 1
+        summary["elapsed"] = time.perf_counter() - start
+        return summary
+
+    async def run_many(self, inputs, sink):
+        """Run every input concurrently, yielding run summaries as runs finish"""
+        tasks = [asyncio.ensure_future(self.run(data, sink, i)) for i, data in enumerate(inputs)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+def load_inputs(path):
+    """Read actor inputs from a JSONL file, one JSON object per line"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+async def run_batch(actor_id, inputs, sink=None, **manager_kwargs):
+    """Run many actor inputs and stream all dataset items into a ResultSink"""
+    owns_sink = sink is None
+    sink = sink or ResultSink(prefix="perplexity_apify")
+    ok = 0
+    try:
+        async with ApifyRunManager(actor_id, **manager_kwargs) as manager:
+            async for summary in manager.run_many(inputs, sink):
+                ok += summary["status"] == "SUCCEEDED"
+                print(f"Run {summary['run_id']}: {summary['status'] or summary['error']}, "
+                      f"{summary['items']} items in {summary['elapsed']:.1f}s")
+    finally:
+        if owns_sink:
+            sink.close()
+    print(f"{ok}/{len(inputs)} runs succeeded")
+    return ok
+
 # Example usage
 if __name__ == "__main__":
+    # Batch mode: python preplextiy.py ACTOR_ID inputs.jsonl  (token from APIFY_TOKEN)
+    if len(sys.argv) > 2:
+        asyncio.run(run_batch(sys.argv[1], load_inputs(sys.argv[2])))
+        sys.exit(0)
+
     # Replace with your actual input data
     my_input = {
         "query": "top 10 cars in indiapip",
@@ -0,0 +1,226 @@
+import math
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+BAN_STATUSES = (403,)
+THROTTLE_STATUSES = (429,)
+
+
+class ProxyBlocked(Exception):
+    """Raised by a backend when the target answered with a block status"""
+
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"Blocked with HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class ProxyHealth:
+    """Outcome history and ban state of one proxy (or ScrapingBee region)"""
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.successes = 0
+        self.failures = 0
+        self.bans = 0
+        self.consecutive_failures = 0
+        self.consecutive_bans = 0
+        self.latency = None  # EWMA, seconds
+        self.cooldown_until = 0
+        self.quarantined_until = 0
+
+    @property
+    def success_rate(self):
+        # Laplace smoothing: an untried proxy starts at 0.5, not 0 or 1
+        return (self.successes + 1) / (self.successes + self.failures + 2)
+
+    def as_dict(self):
+        return {
+            "proxy": self.proxy,
+            "successes": self.successes,
+            "failures": self.failures,
+            "bans": self.bans,
+            "success_rate": round(self.success_rate, 3),
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "cooling": self.cooldown_until > time.monotonic(),
+            "quarantined": self.quarantined_until > time.monotonic(),
+        }
+
+
+class ProxyPool:
+    """Health-scored proxy pool shared by all backends
+
+    Each pick is a weighted random choice among proxies that are not cooling
+    down or quarantined. The weight is success rate divided by
+    (1 + latency EWMA / `target_latency`), so reliable, fast proxies are used
+    most while the rest still get occasional traffic. A failure cools a proxy
+    down for `failure_cooldown` seconds per consecutive failure, or for
+    Retry-After when the target sent one (429). A ban (403) cools it down for
+    `ban_cooldown`, doubled for each consecutive ban, and `quarantine_after`
+    bans in a row take it out of rotation for `quarantine` seconds. Entries
+    can be proxy URLs or anything else worth rotating, such as ScrapingBee
+    country codes. Safe to share between threads.
+    """
+
+    def __init__(self, proxies=(), alpha=0.3, target_latency=2.0, failure_cooldown=5,
+                 ban_cooldown=60, quarantine_after=3, quarantine=1800, max_cooldown=900):
+        self.alpha = alpha
+        self.target_latency = target_latency
+        self.failure_cooldown = failure_cooldown
+        self.ban_cooldown = ban_cooldown
+        self.quarantine_after = quarantine_after
+        self.quarantine = quarantine
+        self.max_cooldown = max_cooldown
+        self.lock = threading.Lock()
+        self.health = {}
+        for proxy in proxies:
+            self.add(proxy)
+
+    def __len__(self):
+        return len(self.health)
+
+    def __iter__(self):
+        return iter(list(self.health))
+
+    def add(self, proxy):
+        with self.lock:
+            self.health.setdefault(proxy, ProxyHealth(proxy))
+
+    def remove(self, proxy):
+        with self.lock:
+            self.health.pop(proxy, None)
+
+    def weight(self, health):
+        latency = health.latency if health.latency is not None else self.target_latency
+        return health.success_rate / (1 + latency / self.target_latency)
+
+    def is_available(self, proxy, now=None):
+        health = self.health.get(proxy)
+        now = now or time.monotonic()
+        return bool(health) and health.cooldown_until <= now and health.quarantined_until <= now
+
+    def _candidates(self, among, exclude):
+        """Health records a pick may choose from (lock held)"""
+        candidates = [self.health[p] for p in (among if among is not None else self.health)
+                      if p in self.health and p not in exclude]
+        return candidates or [h for h in self.health.values() if h.proxy not in exclude] or list(self.health.values())
+
+    def pick(self, among=None, exclude=()):
+        """Weighted pick of a healthy proxy; None if the pool is empty
+
+        `among` restricts the choice to those proxies, `exclude` skips some
+        (e.g. the one that just failed). When every candidate is cooling
+        down the pick is still weighted, so load stays spread; quarantined
+        proxies are only used when nothing else is left. Callers that can
+        wait should check ready_in() first, so cooldowns and Retry-After
+        are honoured instead of sending to a cooling proxy.
+        """
+        now = time.monotonic()
+        with self.lock:
+            candidates = self._candidates(among, exclude)
+            if not candidates:
+                return None
+            ready = ([h for h in candidates if h.cooldown_until <= now and h.quarantined_until <= now]
+                     or [h for h in candidates if h.quarantined_until <= now] or candidates)
+            weights = [self.weight(h) for h in ready]
+            return random.choices(ready, weights=weights)[0].proxy
+
+    def ready_in(self, among=None, exclude=()):
+        """Seconds until a candidate of pick() is out of cooldown; 0 if one is ready now
+
+        Quarantined proxies only count when every candidate is quarantined.
+        """
+        now = time.monotonic()
+        with self.lock:
+            candidates = self._candidates(among, exclude)
+            if not candidates:
+                return 0
+            usable = [h for h in candidates if h.quarantined_until <= now] or candidates
+            ready_at = min(max(h.cooldown_until, h.quarantined_until) for h in usable)
+            return max(0.0, ready_at - now)
+
+    def report_success(self, proxy, latency=None):
+        with self.lock:
+            health = self.health.get(proxy)
+            if not health:
+                return
+            health.successes += 1
+            health.consecutive_failures = 0
+            health.consecutive_bans = 0
+            if latency is not None:
+                health.latency = latency if health.latency is None else (
+                    self.alpha * latency + (1 - self.alpha) * health.latency)
+
+    def report_failure(self, proxy, banned=False, retry_after=None):
+        """Record a failed attempt; `banned` for block responses (403)"""
+        now = time.monotonic()
+        with self.lock:
+            health = self.health.get(proxy)
+            if not health:
+                return
+            health.failures += 1
+            health.consecutive_failures += 1
+            if banned:
+                health.bans += 1
+                health.consecutive_bans += 1
+                cooldown = self.ban_cooldown * 2 ** (health.consecutive_bans - 1)
+                if health.consecutive_bans >= self.quarantine_after:
+                    health.quarantined_until = now + self.quarantine
+                    print(f"Proxy {proxy} quarantined after {health.consecutive_bans} bans")
+            else:
+                cooldown = self.failure_cooldown * health.consecutive_failures
+            if retry_after is not None:
+                cooldown = retry_after
+            health.cooldown_until = max(health.cooldown_until, now + min(cooldown, self.max_cooldown))
+
+    def report_status(self, proxy, status, latency=None, retry_after=None):
+        """Record an HTTP outcome: 2xx/3xx success, 403 ban, 429 throttled, else failure
+
+        Statuses that say nothing about the proxy (e.g. 404) count as success.
+        """
+        if status in BAN_STATUSES:
+            self.report_failure(proxy, banned=True, retry_after=retry_after)
+        elif status in THROTTLE_STATUSES or status >= 500:
+            self.report_failure(proxy, retry_after=retry_after)
+        else:
+            self.report_success(proxy, latency)
+
+    def report_error(self, proxy, error):
+        """Record an exception raised while using `proxy`"""
+        if isinstance(error, ProxyBlocked):
+            self.report_status(proxy, error.status, retry_after=error.retry_after)
+        else:
+            self.report_failure(proxy)
+
+    def stats(self):
+        with self.lock:
+            return sorted((h.as_dict() for h in self.health.values()), key=lambda d: -d["success_rate"])
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header holding a delay, else None"""
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return None
+    return seconds if seconds >= 0 and not math.isinf(seconds) else None
+
+
+def proxy_url(proxy):
+    """Proxy URL with a scheme, as Scrapy and requests expect"""
+    return proxy if "://" in proxy else f"http://{proxy}"
+
+
+def playwright_proxy(proxy):
+    """Playwright `proxy` option for a proxy URL, with credentials split out"""
+    if not proxy:
+        return None
+    parts = urlsplit(proxy_url(proxy))
+    option = {"server": f"{parts.scheme}://{parts.hostname}:{parts.port}" if parts.port
+              else f"{parts.scheme}://{parts.hostname}"}
+    if parts.username:
+        option["username"] = parts.username
+        option["password"] = parts.password or ""
+    return option
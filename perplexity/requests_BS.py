@@ -1,11 +1,34 @@
 import random
 import time
 from playwright.sync_api import sync_playwright
-from datetime import datetime
+
+from completion import CompletionDetector
+from debug_artifacts import default_artifacts
+from metrics import count, timed, timer
+from resource_filter import ResourceFilter
+
+SEARCH_URL = "https://www.perplexity.ai/search/hi-i-want-to-sracp-from-the-in-PeGJB0VsQ3qi1JRTkjjgJA"
 
 class PerplexityScraper:
-    def __init__(self, headless=False):
+    def __init__(self, headless=False, search_url=SEARCH_URL, visit_google=True, resource_filter=None,
+                 wait_strategy="stable", quiet_ms=1500, stream_url_pattern=None, artifacts=None):
         self.headless = headless
+        self.artifacts = artifacts or default_artifacts
+        self.search_url = search_url
+        self.visit_google = visit_google
+        self.resource_filter = resource_filter or ResourceFilter()
+        
+        # "stable" waits for the answer to stop changing, "sleep" is the old fixed delay
+        self.wait_strategy = wait_strategy
+        self.quiet_ms = quiet_ms
+        self.stream_url_pattern = stream_url_pattern
+        
+        # Persistent session state (see start_session)
+        self.playwright = None
+        self.browser = None
+        self.page = None
+        self.page_ready = False
+        self.session_launches = 0
         self.user_agents = [
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36",
             "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36",
@@ -43,11 +66,13 @@ class PerplexityScraper:
                 "main >> div >> nth=2"
             ]
             
-            for selector in selectors:
+            for i, selector in enumerate(selectors):
                 try:
                     page.wait_for_selector(selector, state="visible", timeout=15000)
                     content = page.inner_text(selector)
                     if content and len(content) > 50:  # Minimum content length
+                        if i:
+                            count("selector_fallback", backend="requests_bs", stage=selector)
                         return content
                 except:
                     continue
@@ -56,113 +81,143 @@ class PerplexityScraper:
             print(f"Error extracting results: {str(e)}")
             return None
     
+    @timed("launch", "requests_bs")
+    def launch(self, p):
+        """Launch a stealth-configured browser and return (browser, page)"""
+        # Configure browser with stealth options
+        browser = p.chromium.launch(
+            headless=self.headless,
+            args=[
+                "--disable-blink-features=AutomationControlled",
+                "--start-maximized",
+                f"--user-agent={random.choice(self.user_agents)}"
+            ]
+        )
+        
+        context = browser.new_context(
+            viewport={"width": random.randint(1000, 1400), "height": random.randint(800, 1000)},
+            locale="en-US",
+            timezone_id="America/New_York",
+            color_scheme="light"
+        )
+        
+        # Add stealth scripts
+        context.add_init_script("""
+            delete navigator.webdriver;
+            window.chrome = {runtime: {}};
+            Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3]});
+        """)
+        
+        page = context.new_page()
+        self.resource_filter.install(page)
+        return browser, page
+    
+    @timed("goto", "requests_bs")
+    def open_search_page(self, page):
+        """Organic navigation to the search page"""
+        # Random browsing pattern
+        if self.visit_google and random.random() > 0.7:
+            page.goto("https://www.google.com/search?q=perplexity+ai", timeout=60000)
+            self.random_delay(1, 3)
+        
+        # Main page navigation
+        page.goto(self.search_url, timeout=60000)
+        self.random_delay(2, 4)
+        
+        # Human-like mouse movement
+        self.mouse_movement(page)
+    
+    def run_query(self, page, query):
+        """Type and submit a query on an open search page, return the answer text"""
+        # Find search box with multiple fallbacks
+        # Updated selectors (check manually via DevTools)
+        search_selectors = [
+            "textarea[placeholder*='ask']",  # Case-insensitive match
+            "div[contenteditable='true']",   # New rich-text input
+            "input.search-box-input",         # Class-based selector
+            "xpath=//textarea | //input[@type='text']"  # Broad fallback
+        ]
+        
+        search_box = None
+        for selector in search_selectors:
+            try:
+                search_box = page.wait_for_selector(selector, state="visible", timeout=10000)
+                if search_box:
+                    search_box.highlight()  # Visual confirmation
+                    break
+            except:
+                continue
+        
+        if not search_box:
+            raise Exception("Search box not found")
+        
+        # Human-like interaction
+        search_box.click()
+        self.random_delay(0.5, 1)
+        self.human_type(search_box, query)
+        self.random_delay(0.3, 0.7)
+        
+        # Submit search with multiple methods
+        button_selectors = [
+            "button[aria-label='Search']",
+            "button:has-text('Search')",
+            "xpath=//button[contains(., 'Search')]"
+        ]
+        
+        submitted = False
+        detector = None
+        if self.wait_strategy != "sleep":
+            detector = CompletionDetector(
+                page,
+                quiet_ms=self.quiet_ms,
+                stream_url_pattern=self.stream_url_pattern
+            ).arm()
+        
+        for selector in button_selectors:
+            try:
+                button = page.wait_for_selector(selector, timeout=5000)
+                button.click()
+                submitted = True
+                break
+            except:
+                continue
+        
+        if not submitted:
+            search_box.press("Enter")  # Fallback
+        
+        # Get results
+        with timer("wait", "requests_bs"):
+            if detector:
+                result = detector.wait() or self.get_search_results(page, query)
+            else:
+                self.random_delay(3, 6)  # Wait for results to load
+                result = self.get_search_results(page, query)
+        
+        if not result:
+            raise Exception("No results found")
+        
+        # Debug screenshot, if the artifact policy samples this query
+        self.artifacts.capture(page, query)
+        return result
+    
     def scrape(self, query, max_retries=3):
         """Main scraping function"""
+        if self.playwright:
+            return self.scrape_in_session(query, max_retries)
+        
         for attempt in range(max_retries):
             try:
                 with sync_playwright() as p:
-                    # Configure browser with stealth options
-                    browser = p.chromium.launch(
-                        headless=self.headless,
-                        args=[
-                            "--disable-blink-features=AutomationControlled",
-                            "--start-maximized",
-                            f"--user-agent={random.choice(self.user_agents)}"
-                        ]
-                    )
-                    
-                    context = browser.new_context(
-                        viewport={"width": random.randint(1000, 1400), "height": random.randint(800, 1000)},
-                        locale="en-US",
-                        timezone_id="America/New_York",
-                        color_scheme="light"
-                    )
-                    
-                    # Add stealth scripts
-                    context.add_init_script("""
-                        delete navigator.webdriver;
-                        window.chrome = {runtime: {}};
-                        Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3]});
-                    """)
-                    
-                    page = context.new_page()
+                    browser, page = self.launch(p)
                     
                     try:
-                        # Random browsing pattern
-                        if random.random() > 0.7:
-                            page.goto("https://www.google.com/search?q=perplexity+ai", timeout=60000)
-                            self.random_delay(1, 3)
-                        
-                        # Main page navigation
-                        page.goto("https://www.perplexity.ai/search/hi-i-want-to-sracp-from-the-in-PeGJB0VsQ3qi1JRTkjjgJA", timeout=60000)
-                        self.random_delay(2, 4)
-                        
-                        # Human-like mouse movement
-                        self.mouse_movement(page)
-                        
-                        # Find search box with multiple fallbacks
-                        # Updated selectors (check manually via DevTools)
-                        search_selectors = [
-                            "textarea[placeholder*='ask']",  # Case-insensitive match
-                            "div[contenteditable='true']",   # New rich-text input
-                            "input.search-box-input",         # Class-based selector
-                            "xpath=//textarea | //input[@type='text']"  # Broad fallback
-                        ]
-                        
-                        search_box = None
-                        for selector in search_selectors:
-                            try:
-                                search_box = page.wait_for_selector(selector, state="visible", timeout=10000)
-                                if search_box:
-                                    search_box.highlight()  # Visual confirmation
-                                    break
-                            except:
-                                continue
-                        
-                        if not search_box:
-                            raise Exception("Search box not found")
-                        
-                        # Human-like interaction
-                        search_box.click()
-                        self.random_delay(0.5, 1)
-                        self.human_type(search_box, query)
-                        self.random_delay(0.3, 0.7)
-                        
-                        # Submit search with multiple methods
-                        button_selectors = [
-                            "button[aria-label='Search']",
-                            "button:has-text('Search')",
-                            "xpath=//button[contains(., 'Search')]"
-                        ]
-                        
-                        submitted = False
-                        for selector in button_selectors:
-                            try:
-                                button = page.wait_for_selector(selector, timeout=5000)
-                                button.click()
-                                submitted = True
-                                break
-                            except:
-                                continue
-                        
-                        if not submitted:
-                            search_box.press("Enter")  # Fallback
-                        
-                        # Get results
-                        self.random_delay(3, 6)  # Wait for results to load
-                        result = self.get_search_results(page, query)
-                        
-                        if result:
-                            # Save screenshot for debugging
-                            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                            page.screenshot(path=f"perplexity_result_{timestamp}.png")
-                            return result
-                        else:
-                            raise Exception("No results found")
+                        self.open_search_page(page)
+                        return self.run_query(page, query)
                     
                     except Exception as e:
                         print(f"Attempt {attempt + 1} failed: {str(e)}")
-                        page.screenshot(path=f"error_{attempt}.png")
+                        count("retry", backend="requests_bs")
+                        self.artifacts.capture(page, query, failed=True)
                         continue
                     
                     finally:
@@ -174,6 +229,90 @@ class PerplexityScraper:
                 continue
         
         return None
+    
+    # ---- Session mode: one warm browser and page reused across queries ----
+    
+    def __enter__(self):
+        self.start_session()
+        return self
+    
+    def __exit__(self, *exc):
+        self.close_session()
+    
+    def start_session(self):
+        """Start Playwright once and open a warmed search page"""
+        if not self.playwright:
+            self.playwright = sync_playwright().start()
+        self.rebuild_session()
+    
+    def rebuild_session(self):
+        """(Re)launch the browser and navigate to the search page"""
+        if self.browser:
+            try:
+                self.browser.close()
+            except Exception:
+                pass
+        self.browser, self.page = self.launch(self.playwright)
+        self.session_launches += 1
+        self.open_search_page(self.page)
+        self.page_ready = True
+    
+    def session_alive(self):
+        """True while the session browser and page are still usable"""
+        return bool(self.browser and self.browser.is_connected() and self.page and not self.page.is_closed())
+    
+    def scrape_in_session(self, query, max_retries=3):
+        """Run a query on the session page, relaunching only if the browser died"""
+        for attempt in range(max_retries):
+            try:
+                if not self.session_alive():
+                    print("Session browser lost, relaunching")
+                    self.rebuild_session()
+                elif not self.page_ready:
+                    # Back to a fresh search box; browser, cookies and cache stay warm
+                    with timer("goto", "requests_bs"):
+                        self.page.goto(self.search_url, timeout=60000, wait_until="domcontentloaded")
+                
+                self.page_ready = False
+                return self.run_query(self.page, query)
+            
+            except Exception as e:
+                print(f"Attempt {attempt + 1} failed: {str(e)}")
+                count("retry", backend="requests_bs")
+                if self.session_alive():
+                    self.artifacts.capture(self.page, query, failed=True)
+        
+        return None
+    
+    def close_session(self):
+        """Close the session browser and stop Playwright"""
+        if self.browser:
+            try:
+                self.browser.close()
+            except Exception:
+                pass
+        if self.playwright:
+            self.playwright.stop()
+        self.playwright = self.browser = self.page = None
+    
+    def scrape_many(self, queries, max_retries=3):
+        """Run queries through one session and report throughput"""
+        start = time.perf_counter()
+        results = []
+        owns_session = not self.playwright
+        if owns_session:
+            self.start_session()
+        try:
+            for query in queries:
+                results.append(self.scrape(query, max_retries))
+        finally:
+            if owns_session:
+                self.close_session()
+        elapsed = time.perf_counter() - start
+        qpm = len(queries) / elapsed * 60 if elapsed else 0
+        print(f"{len(queries)} queries in {elapsed:.1f}s ({qpm:.1f} queries/minute, "
+              f"{self.session_launches} browser launch(es))")
+        return results
 
 if __name__ == "__main__":
     scraper = PerplexityScraper(headless=False)  # Set to True in production
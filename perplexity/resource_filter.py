@@ -0,0 +1,136 @@
+from urllib.parse import urlparse
+
+# We only read text, so by default skip everything that is purely visual
+DEFAULT_ALLOWED_TYPES = {"document", "script", "xhr", "fetch", "websocket", "eventsource", "other"}
+
+DEFAULT_DENIED_DOMAINS = {
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "facebook.net",
+    "segment.io",
+    "segment.com",
+    "sentry.io",
+    "hotjar.com",
+    "intercom.io",
+    "datadoghq.com",
+    "cloudflareinsights.com"
+}
+
+
+class PageStats:
+    """Per-page request accounting kept by ResourceFilter"""
+
+    def __init__(self):
+        self.allowed = 0
+        self.blocked = 0
+        self.bytes_loaded = 0
+        self.blocked_by_reason = {}
+
+    def as_dict(self):
+        return {
+            "requests_allowed": self.allowed,
+            "requests_blocked": self.blocked,
+            # Every blocked request is one the page never made
+            "requests_saved": self.blocked,
+            "bytes_loaded": self.bytes_loaded,
+            "blocked_by_reason": dict(self.blocked_by_reason)
+        }
+
+
+class ResourceFilter:
+    """Configurable page.route filter shared by the Playwright backends
+
+    A request is aborted when its resource type is not in `allowed_types`
+    or its host is (a subdomain of) an entry in `denied_domains`. Pass
+    `allowed_types=None` to allow every type. Blocked requests are counted
+    per page as requests saved, and the body bytes actually received for
+    allowed requests are summed (Playwright's request.sizes(), which also
+    covers chunked and compressed responses that have no Content-Length),
+    so runs with and without the filter can be compared for bytes saved.
+    """
+
+    def __init__(self, allowed_types=DEFAULT_ALLOWED_TYPES, denied_domains=DEFAULT_DENIED_DOMAINS):
+        self.allowed_types = set(allowed_types) if allowed_types is not None else None
+        self.denied_domains = {d.lower().lstrip(".") for d in denied_domains}
+        self.pages = 0
+        self.totals = PageStats()
+
+    def block_reason(self, request):
+        """Why a request should be blocked, or None to let it through"""
+        if self.allowed_types is not None and request.resource_type not in self.allowed_types:
+            return f"type:{request.resource_type}"
+        host = (urlparse(request.url).hostname or "").lower()
+        parts = host.split(".")
+        for i in range(len(parts)):
+            if ".".join(parts[i:]) in self.denied_domains:
+                return f"domain:{'.'.join(parts[i:])}"
+        return None
+
+    def _block(self, stats, reason):
+        for s in (stats, self.totals):
+            s.blocked += 1
+            s.blocked_by_reason[reason] = s.blocked_by_reason.get(reason, 0) + 1
+
+    def _count_loaded(self, stats, size):
+        for s in (stats, self.totals):
+            s.allowed += 1
+            s.bytes_loaded += size
+
+    @staticmethod
+    def _body_size(sizes):
+        """Received (encoded) body bytes from request.sizes()"""
+        return max(sizes.get("responseBodySize") or 0, 0)
+
+    def install(self, page):
+        """Attach the filter to a sync Playwright page and return its PageStats"""
+        stats = PageStats()
+
+        def handle(route):
+            reason = self.block_reason(route.request)
+            if reason:
+                self._block(stats, reason)
+                route.abort()
+            else:
+                route.continue_()
+
+        def finished(request):
+            try:
+                size = self._body_size(request.sizes())
+            except Exception:
+                size = 0  # page closed before the sizes were read
+            self._count_loaded(stats, size)
+
+        page.route("**/*", handle)
+        page.on("requestfinished", finished)
+        self.pages += 1
+        return stats
+
+    async def install_async(self, page):
+        """Attach the filter to an async Playwright page and return its PageStats"""
+        stats = PageStats()
+
+        async def handle(route):
+            reason = self.block_reason(route.request)
+            if reason:
+                self._block(stats, reason)
+                await route.abort()
+            else:
+                await route.continue_()
+
+        async def finished(request):
+            try:
+                size = self._body_size(await request.sizes())
+            except Exception:
+                size = 0  # page closed before the sizes were read
+            self._count_loaded(stats, size)
+
+        await page.route("**/*", handle)
+        page.on("requestfinished", finished)
+        self.pages += 1
+        return stats
+
+    def summary(self):
+        """Totals over every page the filter has been installed on"""
+        return dict(self.totals.as_dict(), pages=self.pages)
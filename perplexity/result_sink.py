@@ -0,0 +1,255 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from metrics import timer
+
+FSYNC_POLICIES = ("never", "rotate", "flush")
+
+
+def infer_schema(rows, base=None):
+    """Parquet schema for flattened records, in first-seen column order
+
+    A column is bool, int64 or float64 only if every non-null value is;
+    columns that are empty or mix types are strings. With a `base` schema
+    the result widens it: its columns come first and keep their type unless
+    `rows` need a wider one (int64 -> float64, anything else -> string).
+    """
+    import pyarrow as pa
+
+    kinds = {}
+    for field in base or ():
+        if pa.types.is_boolean(field.type):
+            kinds[field.name] = {bool}
+        elif pa.types.is_integer(field.type):
+            kinds[field.name] = {int}
+        elif pa.types.is_floating(field.type):
+            kinds[field.name] = {float}
+        else:
+            kinds[field.name] = {str}
+    for row in rows:
+        for name, value in row.items():
+            seen = kinds.setdefault(name, set())
+            if value is not None:
+                seen.add(bool if isinstance(value, bool) else type(value))
+    fields = []
+    for name, seen in kinds.items():
+        if seen == {bool}:
+            fields.append(pa.field(name, pa.bool_()))
+        elif seen == {int}:
+            fields.append(pa.field(name, pa.int64()))
+        elif seen and seen <= {int, float}:
+            fields.append(pa.field(name, pa.float64()))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+def coerce_row(row, schema):
+    """Fit a flattened record to a Parquet schema that covers its columns
+
+    Scalars stored in string columns
+    become JSON text (200 -> "200", True -> "true"); ints and integral
+    floats are converted between numeric columns. Raises TypeError or
+    ValueError for values the column cannot hold.
+    """
+    import pyarrow as pa
+
+    out = {}
+    for field in schema:
+        value = row.get(field.name)
+        if value is not None:
+            if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+                if not isinstance(value, str):
+                    value = json.dumps(value)
+            elif pa.types.is_integer(field.type):
+                if isinstance(value, float) and value.is_integer():
+                    value = int(value)
+                elif not isinstance(value, int):
+                    raise TypeError(f"{field.name}: {value!r} does not fit {field.type}")
+            elif pa.types.is_floating(field.type):
+                if not isinstance(value, (int, float)):
+                    raise TypeError(f"{field.name}: {value!r} does not fit {field.type}")
+                value = float(value)
+            elif pa.types.is_boolean(field.type) and not isinstance(value, bool):
+                raise TypeError(f"{field.name}: {value!r} does not fit {field.type}")
+        out[field.name] = value
+    return out
+
+
+class ResultSink:
+    """Buffered, rotating result writer shared by all backends
+
+    Records (dicts) are buffered in memory and appended in batches to
+    `directory/prefix-<timestamp>-<seq>.jsonl`. With format="parquet" the
+    batches become row groups of a Parquet file instead (needs pyarrow);
+    a batch that adds columns or needs wider types starts a new file.
+    A file is rotated once it reaches `max_bytes` or is older than
+    `max_age` seconds. fsync runs never, when a file is rotated/closed
+    ("rotate"), or after every batch ("flush"). A batch whose write fails
+    is retried on the next flush, up to `max_retries` times.
+    """
+
+    def __init__(self, directory="results", prefix="perplexity", format="jsonl",
+                 buffer_records=500, flush_interval=5.0, max_bytes=256 * 1024 * 1024,
+                 max_age=3600, fsync="rotate", max_retries=3):
+        if format not in ("jsonl", "parquet"):
+            raise ValueError(f"Unknown sink format: {format}")
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}")
+        self.directory = directory
+        self.prefix = prefix
+        self.format = format
+        self.buffer_records = buffer_records
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.fsync = fsync
+        self.max_retries = max_retries
+        self.failed_flushes = 0
+
+        self.buffer = []
+        self.lock = threading.RLock()
+        self.last_flush = time.monotonic()
+        self.file = None
+        self.path = None
+        self.opened_at = None
+        self.file_bytes = 0
+        self.sequence = 0
+        self.parquet_writer = None
+        self.parquet_schema = None
+        self.stats = {"records": 0, "batches": 0, "files": 0, "dropped": 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, record):
+        """Queue one record; flushes when the buffer is full or old enough"""
+        with self.lock:
+            self.buffer.append(record)
+            self.stats["records"] += 1
+            if (len(self.buffer) >= self.buffer_records
+                    or time.monotonic() - self.last_flush >= self.flush_interval):
+                self.flush()
+
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        """Write buffered records as one batch"""
+        with self.lock:
+            self.last_flush = time.monotonic()
+            if not self.buffer:
+                return
+            try:
+                with timer("write", "sink"):
+                    self._maybe_rotate()
+                    if self.format == "jsonl":
+                        self._write_jsonl(self.buffer)
+                    else:
+                        self._write_parquet(self.buffer)
+            except Exception:
+                # A failed batch is kept for the next flush, up to max_retries
+                # times, so a persistent error can't grow the buffer forever
+                self.failed_flushes += 1
+                if self.failed_flushes > self.max_retries:
+                    print(f"Sink dropped {len(self.buffer)} records after {self.failed_flushes} failed writes")
+                    self.stats["dropped"] += len(self.buffer)
+                    self.buffer = []
+                    self.failed_flushes = 0
+                raise
+            self.buffer = []
+            self.failed_flushes = 0
+            self.stats["batches"] += 1
+            if self.fsync == "flush":
+                self._sync()
+
+    def close(self):
+        """Flush what is left and close the current file"""
+        with self.lock:
+            try:
+                self.flush()
+            finally:
+                self._close_file()
+
+    # ---- file handling ----
+
+    def _new_path(self):
+        self.sequence += 1
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        extension = "jsonl" if self.format == "jsonl" else "parquet"
+        return os.path.join(self.directory, f"{self.prefix}-{timestamp}-{self.sequence:04d}.{extension}")
+
+    def _open_file(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = self._new_path()
+        self.file = open(self.path, "ab")
+        self.opened_at = time.monotonic()
+        self.file_bytes = 0
+        self.stats["files"] += 1
+
+    def _close_file(self):
+        if not self.file:
+            return
+        if self.parquet_writer:
+            self.parquet_writer.close()
+            self.parquet_writer = None
+        if self.fsync in ("rotate", "flush"):
+            self._sync()
+        self.file.close()
+        self.file = None
+
+    def _maybe_rotate(self):
+        if self.file and (self.file_bytes >= self.max_bytes
+                          or time.monotonic() - self.opened_at >= self.max_age):
+            self._close_file()
+        if not self.file:
+            self._open_file()
+
+    def _sync(self):
+        if self.file and not self.file.closed:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def _write_jsonl(self, batch):
+        data = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in batch)
+        data = data.encode("utf-8")
+        self.file.write(data)
+        self.file.flush()
+        self.file_bytes += len(data)
+
+    def _write_parquet(self, batch):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("format='parquet' needs pyarrow (pip install pyarrow)")
+
+        # Nested values (sources, content dicts) are stored as JSON strings so
+        # the schema stays flat and stable across backends
+        rows = [
+            {k: v if v is None or isinstance(v, (str, int, float, bool)) else json.dumps(v, ensure_ascii=False, default=str)
+             for k, v in r.items()}
+            for r in batch
+        ]
+        schema = infer_schema(rows, self.parquet_schema)
+        if self.parquet_writer is not None and schema != self.parquet_schema:
+            # New columns (error, change...) or a column that needs a wider
+            # type: the current file keeps its schema, later rows go to a new
+            # file with the widened one
+            self._close_file()
+            self._open_file()
+        self.parquet_schema = schema
+        rows = [coerce_row(r, schema) for r in rows]
+        table = pa.Table.from_pylist(rows, schema=self.parquet_schema)
+        if self.parquet_writer is None:
+            self.parquet_writer = pq.ParquetWriter(self.file, self.parquet_schema)
+        self.parquet_writer.write_table(table)
+        # Uncompressed size; close enough to decide when to rotate
+        self.file_bytes += table.nbytes
@@ -1,26 +1,150 @@
 import time
 import random
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium_stealth import stealth
-from fake_useragent import UserAgent
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from functools import lru_cache
+
+from debug_artifacts import default_artifacts
+from extractor import extract
+from metrics import timed, timer
+
+# Selenium, selenium-stealth and fake-useragent are imported on first use, so
+# importing this module (or the CLI) stays cheap
+
+@lru_cache(maxsize=1)
+def user_agents():
+    """fake_useragent.UserAgent, loaded once per process and shared by all scrapers"""
+    from fake_useragent import UserAgent
+    return UserAgent()
+
+class _DriverSlot:
+    """One live driver and how often it has been used"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+
+class DriverPool:
+    """Up to `size` warm WebDrivers shared by worker threads
+
+    Drivers are created on demand by `factory()` and handed out one thread
+    at a time. A driver is quit and replaced after `max_uses` pages, or
+    straight away when the code using it raises (crashed browser, dead
+    session), so one bad driver never poisons later URLs.
+    """
+
+    def __init__(self, factory, size=4, max_uses=50):
+        self.factory = factory
+        self.size = size
+        self.max_uses = max_uses
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.live = 0
+        self.stats = {"created": 0, "pages": 0, "recycled": 0, "crashes": 0}
+
+    def _take(self):
+        while True:
+            try:
+                return self.idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self.lock:
+                create = self.live < self.size
+                if create:
+                    self.live += 1
+            if create:
+                break
+            # Wake up now and then: a crashed driver frees a slot without
+            # returning anything to the idle queue
+            try:
+                return self.idle.get(timeout=0.5)
+            except queue.Empty:
+                pass
+        try:
+            slot = _DriverSlot(self.factory())
+        except Exception:
+            with self.lock:
+                self.live -= 1
+            raise
+        with self.lock:
+            self.stats["created"] += 1
+        return slot
+
+    def _discard(self, slot):
+        with self.lock:
+            self.live -= 1
+        try:
+            slot.driver.quit()
+        except Exception:
+            pass
+
+    @contextmanager
+    def driver(self):
+        """Borrow a driver for one page"""
+        slot = self._take()
+        slot.uses += 1
+        try:
+            yield slot.driver
+        except Exception:
+            with self.lock:
+                self.stats["crashes"] += 1
+            self._discard(slot)
+            raise
+        with self.lock:
+            self.stats["pages"] += 1
+        if slot.uses >= self.max_uses:
+            with self.lock:
+                self.stats["recycled"] += 1
+            self._discard(slot)
+        else:
+            self.idle.put(slot)
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self.idle.get_nowait())
+            except queue.Empty:
+                break
 
 class PerplexityScraper:
-    def __init__(self, headless=False):
+    def __init__(self, headless=False, pool_size=4, max_uses=50, visit_google=True, driver_factory=None,
+                 artifacts=None):
         self.headless = headless
-        self.ua = UserAgent()
+        self.artifacts = artifacts or default_artifacts
+        self.visit_google = visit_google
+        self.warmup_url = "https://www.google.com"
+        # Warm drivers are reused across links; setup and the Google visit
+        # are paid once per driver instead of once per link
+        self.pool = DriverPool(driver_factory or self.warm_driver, size=pool_size, max_uses=max_uses)
+        
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def close(self):
+        self.pool.close()
         
     def random_delay(self, min_t=1, max_t=3):
         time.sleep(random.uniform(min_t, max_t))
     
+    @property
+    def ua(self):
+        return user_agents()
+    
     def human_type(self, element, text):
         for char in text:
             element.send_keys(char)
             time.sleep(random.uniform(0.1, 0.3))
     
+    @timed("launch", "selenium")
     def setup_driver(self):
+        from selenium import webdriver
+        from selenium_stealth import stealth
+        
         options = webdriver.ChromeOptions()
         
         if self.headless:
@@ -44,17 +168,52 @@ class PerplexityScraper:
         
         return driver
     
-    def scrape_shared_link(self, url):
+    def warm_driver(self):
+        """New driver that has already made its first, human-looking navigation"""
         driver = self.setup_driver()
+        if self.visit_google:
+            try:
+                driver.get(self.warmup_url)
+                self.random_delay(1, 2)
+            except Exception:
+                driver.quit()
+                raise
+        return driver
+    
+    def scrape_shared_link(self, url):
+        try:
+            with self.pool.driver() as driver:
+                return self.scrape_with(driver, url)
+        except Exception as e:
+            print(f"Error during scraping: {e}")
+            return None
+    
+    def scrape_many(self, urls):
+        """Yield (url, result) as links finish, one worker thread per pooled driver"""
+        with ThreadPoolExecutor(max_workers=self.pool.size) as executor:
+            pending = {}
+            for url in urls:
+                pending[executor.submit(self.scrape_shared_link, url)] = url
+                if len(pending) >= self.pool.size * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield pending.pop(future), future.result()
+            # Drain the tail in completion order too
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+    
+    def scrape_with(self, driver, url):
+        """Scrape one link in a borrowed driver; raises if the driver itself failed"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
         
         try:
-            # Initial navigation with random delays
-            driver.get("https://www.google.com")
-            self.random_delay(1, 2)
-            
-            # Access the shared link
-            driver.get(url)
-            self.random_delay(3, 5)
+            # Access the shared link; the answer wait below replaces a fixed sleep
+            with timer("goto", "selenium"):
+                driver.get(url)
             
             # Bypass potential paywalls/interstitials
             try:
@@ -67,32 +226,22 @@ class PerplexityScraper:
             content = {}
             
             try:
-                # 1. Main answer content
-                main_answer = WebDriverWait(driver, 15).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, ".prose, .answer-content")))
-                content['main_answer'] = main_answer.text
+                # 1. Wait for the main answer to render
+                with timer("wait", "selenium"):
+                    WebDriverWait(driver, 15).until(
+                        EC.presence_of_element_located((By.CSS_SELECTOR, ".prose, .answer-content")))
             except Exception as e:
                 print(f"Main answer not found: {e}")
-                content['main_answer'] = "Not found"
-            
-            try:
-                # 2. Sources/references
-                sources = driver.find_elements(By.CSS_SELECTOR, ".sources a")
-                content['sources'] = [s.get_attribute('href') for s in sources]
-            except Exception as e:
-                print(f"Sources not found: {e}")
-                content['sources'] = []
             
-            try:
-                # 3. Related questions
-                related = driver.find_elements(By.CSS_SELECTOR, ".related-question")
-                content['related_questions'] = [q.text for q in related]
-            except Exception as e:
-                print(f"Related questions not found: {e}")
-                content['related_questions'] = []
+            # 2. Answer, sources and related questions from the rendered HTML
+            with timer("extract", "selenium"):
+                extracted = extract(driver.page_source, url=driver.current_url)
+            content['main_answer'] = extracted['main_answer'] or "Not found"
+            content['sources'] = [s['url'] for s in extracted['sources']]
+            content['related_questions'] = extracted['related_questions']
             
             try:
-                # 4. Metadata
+                # 3. Metadata
                 content['title'] = driver.find_element(By.CSS_SELECTOR, "h1").text
                 content['date'] = driver.find_element(By.CSS_SELECTOR, "time").get_attribute('datetime')
             except Exception as e:
@@ -102,26 +251,25 @@ class PerplexityScraper:
             
             return content
             
-        except Exception as e:
-            print(f"Error during scraping: {e}")
-            driver.save_screenshot("error.png")
-            return None
-            
-        finally:
-            driver.quit()
+        except Exception:
+            self.artifacts.capture(driver, url, failed=True)
+            raise
 
 if __name__ == "__main__":
-    scraper = PerplexityScraper(headless=False)
-    shared_url = "shared_link_1"
-    result = scraper.scrape_shared_link(shared_url)
+    shared_urls = ["shared_link_1"]
+    with PerplexityScraper(headless=False, pool_size=2) as scraper:
+        results = list(scraper.scrape_many(shared_urls))
     
-    if result:
+    for shared_url, result in results:
+        print(f"\n{shared_url}")
+        if not result:
+            print("Scraping failed")
+            continue
+
         print("Scraped Content:")
         print(f"Title: {result.get('title')}")
         print(f"Date: {result.get('date')}")
         print("\nMain Answer:")
         print(result.get('main_answer', '')[:500] + "...")
         print(f"\nSources: {len(result.get('sources', []))}")
-        print(f"Related Questions: {len(result.get('related_questions', []))}")
-    else:
-        print("Scraping failed")
\ No newline at end of file
+        print(f"Related Questions: {len(result.get('related_questions', []))}")
\ No newline at end of file
@@ -0,0 +1,396 @@
+import argparse
+import glob
+import os
+import sqlite3
+import threading
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from urllib.parse import urlsplit, urlunsplit
+
+from export_markdown import normalize_record, read_records
+from fetch_cache import normalize_url
+
+URL, DOMAIN = 0, 1
+CHUNK_IDS = 65536  # share ids per posting chunk; appends only rewrite the last chunk
+
+# Common second-level public suffixes, under which every name is a separate
+# site (bbc.co.uk, abc.net.au). A stand-in for the full public suffix list:
+# domains under other multi-label suffixes still index their suffix.
+PUBLIC_SUFFIXES = frozenset("""
+    co.uk org.uk ac.uk gov.uk me.uk ltd.uk plc.uk net.uk sch.uk nhs.uk police.uk
+    com.au net.au org.au edu.au gov.au asn.au id.au
+    co.nz net.nz org.nz ac.nz govt.nz
+    co.jp ne.jp or.jp ac.jp go.jp
+    co.kr or.kr ac.kr go.kr
+    com.cn net.cn org.cn gov.cn edu.cn ac.cn
+    com.hk org.hk edu.hk gov.hk
+    com.tw org.tw edu.tw gov.tw
+    com.sg org.sg edu.sg gov.sg
+    co.in net.in org.in ac.in gov.in edu.in
+    co.id ac.id go.id or.id
+    com.my gov.my edu.my
+    com.ph gov.ph
+    co.th ac.th go.th
+    com.vn gov.vn
+    com.pk gov.pk
+    co.il org.il ac.il gov.il
+    com.tr org.tr gov.tr edu.tr
+    com.sa gov.sa
+    com.eg
+    co.za org.za gov.za ac.za
+    com.ng gov.ng
+    co.ke ac.ke
+    com.br net.br org.br gov.br edu.br
+    com.ar gob.ar
+    com.mx org.mx gob.mx edu.mx
+    com.co gov.co
+    com.ua gov.ua
+    com.pl
+""".split())
+
+
+@lru_cache(maxsize=1 << 16)
+def normalize_source(url):
+    """Canonical form of a cited URL, or None if it is not an http(s) link
+
+    normalize_url() plus: http and https are the same source, and a leading
+    "www." is dropped.
+    """
+    url = (url or "").strip()
+    if not url.lower().startswith(("http://", "https://")):
+        return None
+    parts = urlsplit(normalize_url(url))
+    host = parts.netloc[4:] if parts.netloc.startswith("www.") else parts.netloc
+    if not host:
+        return None
+    return urlunsplit(("https", host, parts.path, parts.query, ""))
+
+
+def domains_of(url):
+    """The host of a normalized source URL and its parent domains, e.g.
+    en.m.wikipedia.org, m.wikipedia.org, wikipedia.org; ports and public
+    suffixes (org, co.uk) are left out"""
+    host = urlsplit(url).hostname
+    labels = host.split(".")
+    if labels[-1].isdigit():
+        return [host]  # IP address
+    registrable = 3 if len(labels) > 2 and ".".join(labels[-2:]) in PUBLIC_SUFFIXES else 2
+    return [".".join(labels[i:]) for i in range(max(1, len(labels) - registrable + 1))]
+
+
+def normalize_domain(domain):
+    domain = domain.strip().lower().rstrip(".")
+    if "//" in domain:
+        domain = urlsplit(domain).hostname or ""
+    return domain[4:] if domain.startswith("www.") else domain
+
+
+def record_sources(record):
+    """(share key, [source URLs]) of any backend's result record
+
+    The share key is the share URL when there is one, else "query:<query>"
+    from the record's query (WebSocket) or prompt (API); None if the record
+    has none of them.
+    """
+    r = normalize_record(record)
+    query = record.get("query") or record.get("prompt")
+    key = r["url"] or (f"query:{query}" if query else None)
+    return key, [s["url"] for s in r["sources"]]
+
+
+class SourceIndex:
+    """Inverted index from cited URLs and domains to the answers that cite them
+
+    Shares, URLs and domains get dense integer ids in SQLite. Each URL and
+    each domain (a host and its parent domains, so "wikipedia.org" also finds
+    "en.wikipedia.org") has a posting list: the sorted share ids citing it,
+    stored as raw uint32 arrays in chunks of CHUNK_IDS. New shares get
+    increasing ids, so new postings are appended to the last chunk of a
+    list; a query reads the list back with array.frombytes. Re-adding a
+    share replaces its sources, using a forward table of each share's URL
+    ids. Additions are buffered and written every `flush_every` shares, on
+    flush() and before queries. Thread safe.
+    """
+
+    def __init__(self, path=".cache/sources.sqlite3", flush_every=10000, cache_size=1_000_000):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.flush_every = flush_every
+        self.cache_size = cache_size
+        self.lock = threading.RLock()
+        self.cache = {}     # normalized URL -> (url id, domain ids)
+        self.domain_cache = {}
+        self.pending = {}   # (kind, term id) -> array of share ids to add
+        self.pending_shares = 0
+        self.stats = {"shares": 0, "citations": 0, "skipped": 0, "reindexed": 0}
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS shares (id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE);
+            CREATE TABLE IF NOT EXISTS domains (id INTEGER PRIMARY KEY, domain TEXT NOT NULL UNIQUE);
+            CREATE TABLE IF NOT EXISTS urls (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL UNIQUE,
+                domains BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS forward (share INTEGER PRIMARY KEY, urls BLOB NOT NULL);
+            CREATE TABLE IF NOT EXISTS postings (
+                kind INTEGER NOT NULL,
+                term INTEGER NOT NULL,
+                first INTEGER NOT NULL,
+                ids BLOB NOT NULL,
+                PRIMARY KEY (kind, term, first)
+            ) WITHOUT ROWID;
+        """)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _id(self, table, column, value):
+        cursor = self.db.execute(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", (value,))
+        if cursor.rowcount:
+            return cursor.lastrowid
+        return self.db.execute(f"SELECT id FROM {table} WHERE {column} = ?", (value,)).fetchone()[0]
+
+    def _url(self, url):
+        """(url id, domain ids) of a normalized URL, assigning ids on first sight"""
+        found = self.cache.get(url)
+        if found:
+            return found
+        row = self.db.execute("SELECT id, domains FROM urls WHERE url = ?", (url,)).fetchone()
+        if row:
+            found = (row[0], tuple(array("I", row[1])))
+        else:
+            domain_ids = array("I", (self._domain(d) for d in domains_of(url)))
+            url_id = self.db.execute("INSERT INTO urls (url, domains) VALUES (?, ?)",
+                                     (url, domain_ids.tobytes())).lastrowid
+            found = (url_id, tuple(domain_ids))
+        if len(self.cache) >= self.cache_size:
+            self.cache.clear()
+        self.cache[url] = found
+        return found
+
+    def _domain(self, domain):
+        domain_id = self.domain_cache.get(domain)
+        if domain_id is None:
+            if len(self.domain_cache) >= self.cache_size:
+                self.domain_cache.clear()
+            domain_id = self.domain_cache[domain] = self._id("domains", "domain", domain)
+        return domain_id
+
+    def add(self, share, sources):
+        """Index the sources cited by `share` (a share URL or other answer key)
+
+        `sources` may be URL strings or {"url": ...} dicts. Adding a share
+        again replaces its sources. Returns the share id.
+        """
+        if share.startswith(("http://", "https://")):
+            share = normalize_url(share)
+        with self.lock:
+            urls = {}
+            for source in sources or ():
+                url = normalize_source(source.get("url") if isinstance(source, dict) else source)
+                if url:
+                    url_id, domain_ids = self._url(url)
+                    urls[url_id] = domain_ids
+                else:
+                    self.stats["skipped"] += 1
+            share_id = self._id("shares", "key", share)
+            old = self.db.execute("SELECT urls FROM forward WHERE share = ?", (share_id,)).fetchone()
+            url_ids = array("I", sorted(urls))
+            self.db.execute("INSERT OR REPLACE INTO forward VALUES (?, ?)", (share_id, url_ids.tobytes()))
+            terms = {(URL, u) for u in urls} | {(DOMAIN, d) for ds in urls.values() for d in ds}
+            if old:
+                self.stats["reindexed"] += 1
+                old_terms = self._terms(array("I", old[0]))
+                for kind, term in old_terms - terms:
+                    self._remove(kind, term, share_id)
+                terms -= old_terms
+            for key in terms:
+                ids = self.pending.get(key)
+                if ids is None:
+                    ids = self.pending[key] = array("I")
+                ids.append(share_id)
+            self.stats["shares"] += 1
+            self.stats["citations"] += len(urls)
+            self.pending_shares += 1
+            if self.pending_shares >= self.flush_every:
+                self.flush()
+        return share_id
+
+    def add_record(self, record):
+        """Index a result record from any backend; returns the share id or None"""
+        key, sources = record_sources(record)
+        return self.add(key, sources) if key else None
+
+    def _terms(self, url_ids):
+        terms = set()
+        for url_id in url_ids:
+            (domains,) = self.db.execute("SELECT domains FROM urls WHERE id = ?", (url_id,)).fetchone()
+            terms.add((URL, url_id))
+            terms.update((DOMAIN, d) for d in array("I", domains))
+        return terms
+
+    def _chunk(self, kind, term, share_id):
+        """(first, ids) of the chunk of a posting list that would hold `share_id`, or None"""
+        row = self.db.execute(
+            "SELECT first, ids FROM postings WHERE kind = ? AND term = ? AND first <= ? "
+            "ORDER BY first DESC LIMIT 1", (kind, term, share_id)).fetchone()
+        return (row[0], array("I", row[1])) if row else None
+
+    def _remove(self, kind, term, share_id):
+        pending = self.pending.get((kind, term))
+        if pending and share_id in pending:
+            pending.remove(share_id)
+            return
+        chunk = self._chunk(kind, term, share_id)
+        if chunk is None or share_id not in chunk[1]:
+            return
+        first, ids = chunk
+        ids.remove(share_id)
+        self.db.execute("DELETE FROM postings WHERE kind = ? AND term = ? AND first = ?", (kind, term, first))
+        if ids:
+            self.db.execute("INSERT INTO postings VALUES (?, ?, ?, ?)", (kind, term, ids[0], ids.tobytes()))
+
+    def flush(self):
+        """Merge buffered postings into their lists and commit"""
+        with self.lock:
+            for (kind, term), new in self.pending.items():
+                if new:
+                    self._merge(kind, term, new)
+            self.pending = {}
+            self.pending_shares = 0
+            self.db.commit()
+
+    def _merge(self, kind, term, new):
+        """Merge share ids into a posting list, rewriting only the chunks they fall in"""
+        firsts = [first for (first,) in self.db.execute(
+            "SELECT first FROM postings WHERE kind = ? AND term = ? ORDER BY first", (kind, term))]
+        groups = {}
+        for share_id in sorted(set(new)):
+            # Ids below the first chunk go into it; the rest into the chunk before the next
+            at = max(bisect_right(firsts, share_id) - 1, 0)
+            groups.setdefault(firsts[at] if firsts else None, array("I")).append(share_id)
+        for first, added in groups.items():
+            ids = array("I")
+            if first is not None:
+                (data,) = self.db.execute("SELECT ids FROM postings WHERE kind = ? AND term = ? AND first = ?",
+                                          (kind, term, first)).fetchone()
+                ids.frombytes(data)
+                self.db.execute("DELETE FROM postings WHERE kind = ? AND term = ? AND first = ?",
+                                (kind, term, first))
+            if not ids or added[0] > ids[-1]:
+                ids.extend(added)  # the usual case: new shares have the highest ids
+            else:
+                ids = array("I", sorted(set(ids).union(added)))
+            self.db.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", [
+                (kind, term, ids[i], ids[i:i + CHUNK_IDS].tobytes()) for i in range(0, len(ids), CHUNK_IDS)])
+
+    def _postings(self, kind, term):
+        ids = array("I")
+        for (data,) in self.db.execute(
+                "SELECT ids FROM postings WHERE kind = ? AND term = ? ORDER BY first", (kind, term)):
+            ids.frombytes(data)
+        return ids
+
+    def domain_ids(self, domain):
+        """Sorted share ids of answers citing `domain` or any of its subdomains"""
+        with self.lock:
+            if self.pending:
+                self.flush()
+            row = self.db.execute("SELECT id FROM domains WHERE domain = ?", (normalize_domain(domain),)).fetchone()
+            return self._postings(DOMAIN, row[0]) if row else array("I")
+
+    def url_ids(self, url):
+        """Sorted share ids of answers citing `url` (after normalization)"""
+        url = normalize_source(url)
+        with self.lock:
+            if self.pending:
+                self.flush()
+            row = self.db.execute("SELECT id FROM urls WHERE url = ?", (url,)).fetchone() if url else None
+            return self._postings(URL, row[0]) if row else array("I")
+
+    def share_keys(self, share_ids, limit=None):
+        """Share keys (normalized share URLs) of share ids, in the given order"""
+        share_ids = list(share_ids[:limit] if limit else share_ids)
+        keys = {}
+        with self.lock:
+            for i in range(0, len(share_ids), 900):
+                batch = share_ids[i:i + 900]
+                keys.update(self.db.execute(
+                    f"SELECT id, key FROM shares WHERE id IN ({','.join('?' * len(batch))})", batch))
+        return [keys[i] for i in share_ids]
+
+    def citing_domain(self, domain, limit=None):
+        """Shares citing `domain` or its subdomains"""
+        return self.share_keys(self.domain_ids(domain), limit)
+
+    def citing_url(self, url, limit=None):
+        return self.share_keys(self.url_ids(url), limit)
+
+    def top_domains(self, n=20):
+        """[(domain, number of citing shares)] for the most cited domains"""
+        with self.lock:
+            if self.pending:
+                self.flush()
+            return self.db.execute(
+                "SELECT d.domain, SUM(LENGTH(p.ids)) / 4 AS shares FROM postings p JOIN domains d ON d.id = p.term "
+                "WHERE p.kind = ? GROUP BY p.term ORDER BY shares DESC LIMIT ?", (DOMAIN, n)).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            self.db.close()
+
+
+def build(paths, index_path):
+    """Add every record of the given sink files to the index; returns its stats"""
+    with SourceIndex(index_path) as index:
+        for path in paths:
+            for record in read_records(path):
+                index.add_record(record)
+        stats = dict(index.stats)
+    print(f"Indexed {stats['shares']} answers with {stats['citations']} cited sources into {index_path}")
+    return stats
+
+
+def report(index_path, domain=None, url=None, top=None, limit=50):
+    """Print the answers citing a domain or URL, or the `top` most cited domains"""
+    with SourceIndex(index_path) as index:
+        if top:
+            for name, shares in index.top_domains(top):
+                print(f"{shares:>10}  {name}")
+        queries = []
+        if domain:
+            queries.append((f"domain {domain}", index.domain_ids(domain)))
+        if url:
+            queries.append((f"url {url}", index.url_ids(url)))
+        for label, ids in queries:
+            print(f"{len(ids)} answers cite {label}")
+            for key in index.share_keys(ids, limit):
+                print(key)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index and query the sources cited by scraped answers")
+    parser.add_argument("inputs", nargs="*", help="JSONL/Parquet sink files or glob patterns to add first")
+    parser.add_argument("--index", default=".cache/sources.sqlite3")
+    parser.add_argument("--domain", help="list answers citing this domain or its subdomains")
+    parser.add_argument("--url", help="list answers citing this URL")
+    parser.add_argument("--top", type=int, metavar="N", help="list the N most cited domains")
+    parser.add_argument("-n", "--limit", type=int, default=50, help="answers listed per query")
+    args = parser.parse_args(argv)
+
+    if args.inputs:
+        build([p for pattern in args.inputs for p in sorted(glob.glob(pattern))], args.index)
+    report(args.index, args.domain, args.url, args.top, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,97 +1,199 @@
 from scrapingbee import ScrapingBeeClient
+from w3lib.encoding import html_to_unicode
 import json
 from datetime import datetime
 import time
 import random
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from urllib.parse import urlparse
-import re
+
+from extractor import extract, has_answer
+from html_markdown import to_markdown
+from fetch_cache import FetchCache
+from metrics import count, timed, timer
+from proxy_pool import ProxyPool
+from result_sink import ResultSink
+
+COUNTRY_CODES = ['us', 'gb', 'ca', 'de', 'fr', 'jp']
+
+# Parameter sets from cheapest to most expensive. Credits follow ScrapingBee's
+# pricing and are only used when a response has no Spb-Cost header.
+PARAM_TIERS = [
+    ('plain', {'render_js': 'false'}, 1),
+    ('js', {'render_js': 'true', 'wait_for': '.prose, .shared-content-container'}, 5),
+    ('premium', {'render_js': 'true', 'premium_proxy': 'true',
+                 'wait_for': '.prose, .shared-content-container', 'block_ads': 'true'}, 25),
+    ('stealth', {
+        'render_js': 'true',
+        'stealth_proxy': 'true',
+        'premium_proxy': 'true',
+        'wait': 8000,  # Longer wait for shared links
+        'wait_for': '.prose, .shared-content-container',
+        'block_ads': 'true',
+        'custom_google': 'true'  # Bypass Googlebot checks
+    }, 75),
+]
 
 class PerplexitySharedLinkScraper:
-    def __init__(self, api_key):
+    def __init__(self, api_key, cache=None, country_pool=None, tiers=PARAM_TIERS, change_store=None):
         self.client = ScrapingBeeClient(api_key=api_key)
+        self.cache = cache  # optional FetchCache, saves credits on repeat links
+        # Optional ChangeStore: unchanged links are not parsed and come back
+        # as {'unchanged': True} results for the caller to skip
+        self.change_store = change_store
+        # Proxy regions scored by outcome, so blocked regions stop eating retries
+        self.country_pool = country_pool or ProxyPool(COUNTRY_CODES, ban_cooldown=300)
+        self.tiers = tiers
         self.user_agents = [
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36",
             "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36"
         ]
+        # Credit accounting, shared by executor threads
+        self.lock = threading.Lock()
+        self.credits = {'spent': 0, 'pages': 0, 'requests': 0,
+                        'by_tier': {name: {'requests': 0, 'successes': 0, 'credits': 0} for name, _, _ in tiers}}
         
     def random_delay(self):
         """Avoid rate limiting"""
         time.sleep(random.uniform(1, 3))
+
+    @property
+    def credits_per_page(self):
+        return self.credits['spent'] / self.credits['pages'] if self.credits['pages'] else None
+
+    def _charge(self, tier, cost, success):
+        with self.lock:
+            stats = self.credits['by_tier'][tier]
+            stats['requests'] += 1
+            stats['credits'] += cost
+            stats['successes'] += success
+            self.credits['requests'] += 1
+            self.credits['spent'] += cost
+            self.credits['pages'] += success
+
+    def fetch(self, shared_url, tier_params, cost, busy_retries=3):
+        """One ScrapingBee request with a parameter tier; returns (status, html)"""
+        params = dict(tier_params, user_agent=random.choice(self.user_agents))
+        # Regions only apply to (and only say something about) premium proxies
+        country = None
+        if 'premium_proxy' in tier_params or 'stealth_proxy' in tier_params:
+            country = params['country_code'] = self.country_pool.pick()
+        for attempt in range(busy_retries + 1):
+            start = time.perf_counter()
+            with timer("fetch", "scrapingbee"):
+                response = self.client.get(shared_url, params=dict(params))
+            if response.status_code != 429 or attempt == busy_retries:
+                break
+            # Over the account's concurrency limit; nothing was charged
+            count("retry", backend="scrapingbee", stage="busy")
+            time.sleep(2 ** attempt)
+        if country:
+            self.country_pool.report_status(country, response.status_code, time.perf_counter() - start)
+        charged = response.headers.get('Spb-Cost')
+        if response.status_code == 200 or response.status_code in (403, 404, 410):
+            # ScrapingBee also bills pages that came back blocked or missing
+            credits = int(charged) if charged and charged.isdigit() else cost
+        else:
+            credits = 0
+        return response, credits
     
     def scrape_shared_link(self, shared_url, retries=3):
         """Extract content from Perplexity shared links"""
-        params = {
-            'render_js': 'true',
-            'stealth_proxy': 'true',
-            'premium_proxy': 'true',
-            'wait': 8000,  # Longer wait for shared links
-            'wait_for': '.prose, .shared-content-container',
-            'block_ads': 'true',
-            'country_code': random.choice(['us', 'gb', 'ca']),
-            'user_agent': random.choice(self.user_agents),
-            'custom_google': 'true'  # Bypass Googlebot checks
-        }
+        html = self.fetch_html(shared_url, retries)
+        if not html:
+            return None
+        changes = self.change_store
+        if changes is not None and changes.raw_unchanged(shared_url, html, backend="scrapingbee"):
+            return self.unchanged(shared_url)
+        result = self.parse_shared_link_content(html, shared_url)
+        if changes is not None:
+            content = result['content']
+            result['change'] = changes.record(shared_url, html, content.get('main_answer'), content['sources'],
+                                              content['related'], backend="scrapingbee")
+            if result['change'] is None:
+                return self.unchanged(shared_url)
+        return result
+
+    @staticmethod
+    def unchanged(shared_url):
+        """Result for a link whose content is the same as on the last run"""
+        return {'metadata': {'url': shared_url, 'timestamp': datetime.now().isoformat()}, 'unchanged': True}
+
+    def fetch_html(self, shared_url, retries=3):
+        """HTML (decoded text) of a shared link that has answer content, or None
+
+        Parameter tiers are tried from cheapest to most expensive; a tier
+        only escalates when its page has no answer (.prose) content. The
+        last tier is retried up to `retries` times in other regions.
+        """
+        if self.cache:
+            entry = self.cache.get(shared_url, 'scrapingbee', revalidate=True)
+            if entry:
+                # Pages are cached as decoded text, i.e. UTF-8
+                return entry.body.decode('utf-8', 'replace')
         
-        for attempt in range(retries):
+        last = len(self.tiers) - 1
+        attempts = [(i, 0) for i in range(last)] + [(last, n) for n in range(retries)]
+        for index, attempt in attempts:
+            tier, tier_params, cost = self.tiers[index]
+            if attempt:
+                self.random_delay()
             try:
-                response = self.client.get(shared_url, params=params)
-                
-                if response.status_code == 200:
-                    return self.parse_shared_link_content(response.content, shared_url)
-                elif response.status_code == 403:
-                    print(f"Blocked - rotating parameters (attempt {attempt + 1})")
-                    params['country_code'] = random.choice(['de', 'fr', 'jp'])  # Different country
-                    params['user_agent'] = random.choice(self.user_agents)
-                else:
-                    print(f"HTTP Error {response.status_code}")
+                response, credits = self.fetch(shared_url, tier_params, cost)
             except Exception as e:
-                print(f"Attempt {attempt + 1} failed: {str(e)}")
-            
-            self.random_delay()
+                print(f"{tier} attempt {attempt + 1} failed: {str(e)}")
+                continue
+
+            with timer("check", "scrapingbee"):
+                # Decode with the header charset, then BOM, then <meta>, like Scrapy does
+                html = html_to_unicode(response.headers.get('Content-Type'), response.content)[1]
+                found = response.status_code == 200 and has_answer(html)
+            self._charge(tier, credits, found)
+
+            if found:
+                if self.cache:
+                    # ScrapingBee forwards origin headers with an Spb- prefix
+                    self.cache.put(shared_url, 'scrapingbee', html, headers={
+                        'etag': response.headers.get('Spb-ETag'),
+                        'last-modified': response.headers.get('Spb-Last-Modified')
+                    })
+                return html
+            elif response.status_code == 403:
+                count("block", backend="scrapingbee", stage=tier)
+                print(f"Blocked with '{tier}' parameters - escalating (attempt {attempt + 1})")
+            elif response.status_code != 200:
+                print(f"HTTP Error {response.status_code} with '{tier}' parameters")
         
         return None
     
     def parse_shared_link_content(self, html, url):
         """Parse shared link specific structure"""
-        from bs4 import BeautifulSoup
-        
-        soup = BeautifulSoup(html, 'html.parser')
+        with timer("extract", "scrapingbee"):
+            parsed = extract(html, url=url, with_markdown=True)
         result = {
             'metadata': {
                 'url': url,
                 'timestamp': datetime.now().isoformat(),
-                'title': soup.title.string if soup.title else "Perplexity Shared Link"
+                'title': parsed['title'] or "Perplexity Shared Link"
             },
             'content': {}
         }
         
-        # Extract main content (shared links have different structure)
-        content_div = soup.find('div', class_=re.compile(r'prose|shared-content|answer-container'))
-        if content_div:
-            result['content']['main_answer'] = self.clean_html(str(content_div))
-        
-        # Extract sources (shared links often put these in footers)
-        result['content']['sources'] = [
-            {'text': a.get_text(strip=True), 'url': a['href']}
-            for a in soup.select('footer a[href^="http"]')
-        ]
+        # Main content, converted to markdown from the parsed tree
+        if parsed['main_markdown']:
+            result['content']['main_answer'] = parsed['main_markdown']
         
-        # Extract related content
-        result['content']['related'] = [
-            li.get_text(strip=True) 
-            for li in soup.select('.related-content li, .suggested-questions li')
-        ]
+        result['content']['sources'] = parsed['sources']
+        result['content']['related'] = parsed['related_questions']
         
         return result
     
-    def clean_html(self, html):
+    def clean_html(self, html, base_url=None):
         """Convert HTML to clean markdown"""
-        import html2text
-        h = html2text.HTML2Text()
-        h.ignore_links = False
-        h.ignore_images = True
-        return h.handle(html).strip()
+        return to_markdown(html, base_url=base_url)
     
+    @timed("write", "scrapingbee")
     def save_to_markdown(self, data, filename=None):
         """Save to markdown with shared link formatting"""
         if not filename:
@@ -126,25 +228,78 @@ class PerplexitySharedLinkScraper:
         print(f"Saved shared link content to {filename}")
         return filename
 
+class ScrapingBeeExecutor:
+    """Scrape many shared links in parallel within the account's concurrency limit
+
+    Runs scraper.scrape_shared_link on `concurrency` threads (set it to your
+    plan's concurrent request limit) and keeps at most twice that many links
+    queued, so the input can be a generator of any size.
+    """
+
+    def __init__(self, scraper, concurrency=5):
+        self.scraper = scraper
+        self.concurrency = concurrency
+
+    def scrape_many(self, urls):
+        """Yield (url, result) as each link finishes; result is None on failure"""
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            pending = {}
+            for url in urls:
+                pending[pool.submit(self.scraper.scrape_shared_link, url)] = url
+                if len(pending) >= self.concurrency * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield self._outcome(pending.pop(future), future)
+            # Drain the tail in completion order too
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield self._outcome(pending.pop(future), future)
+
+    @staticmethod
+    def _outcome(url, future):
+        """(url, result), or (url, None) if the worker raised, so one bad link doesn't end the batch"""
+        try:
+            return url, future.result()
+        except Exception as e:
+            print(f"Error scraping {url}: {e}")
+            count("error", backend="scrapingbee", stage="scrape")
+            return url, None
+
+    def report(self):
+        credits = self.scraper.credits
+        print(f"{credits['pages']} pages for {credits['spent']} credits "
+              f"({self.scraper.credits_per_page or 0:.1f} per page, {credits['requests']} requests)")
+        for tier, stats in credits['by_tier'].items():
+            if stats['requests']:
+                print(f"  {tier}: {stats['successes']}/{stats['requests']} succeeded, {stats['credits']} credits")
+        if self.scraper.change_store is not None:
+            print(f"Changes: {self.scraper.change_store.stats}")
+
 # Usage Example
 if __name__ == "__main__":
     API_KEY = "D0MT0DIIZGECAZIU5Q3356UCT40W8R9GXM01HD8VQE5X76JINAXUL985CH09HJGMXZKIZV80C8OYKFL6"  # Replace with your key
     
-    scraper = PerplexitySharedLinkScraper(API_KEY)
+    scraper = PerplexitySharedLinkScraper(API_KEY, cache=FetchCache())
     
     # Example shared links (replace with yours)
     SHARED_LINKS = [
         "https://www.perplexity.ai/search/top-10-cars-in-india-LNcLFbJ4Q4WaCFPZbJvdog"
     ]
     
-    for link in SHARED_LINKS:
-        print(f"\nProcessing shared link: {link}")
-        result = scraper.scrape_shared_link(link)
-        
-        if result:
-            md_file = scraper.save_to_markdown(result)
-            print(f"✅ Success! First 50 chars: {result['content'].get('main_answer','')[:50]}...")
-        else:
-            print("❌ Failed to scrape shared link")
-        
-        scraper.random_delay()  # Be polite between requests
\ No newline at end of file
+    # Results are appended to a rotating JSONL sink; render Markdown later
+    # with export_markdown.py (or call scraper.save_to_markdown per result)
+    # Links run in parallel up to the plan's concurrency limit
+    executor = ScrapingBeeExecutor(scraper, concurrency=5)
+    with ResultSink(prefix="perplexity_scrapingbee") as sink:
+        for link, result in executor.scrape_many(SHARED_LINKS):
+            print(f"\nProcessed shared link: {link}")
+            
+            if result and result.get('unchanged'):
+                print("Unchanged since the last run")
+            elif result:
+                sink.write(dict(result, backend="scrapingbee"))
+                print(f"✅ Success! First 50 chars: {result['content'].get('main_answer','')[:50]}...")
+            else:
+                print("❌ Failed to scrape shared link")
+    executor.report()
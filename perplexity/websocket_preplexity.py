@@ -2,17 +2,86 @@ import websocket  # This should be from websocket-client, not any other package
 import json
 import time
 import random
+import uuid
+import asyncio
 from threading import Thread
-from queue import Queue
+from queue import Queue, Empty
 import ssl
 
+import aiohttp
+
+from result_sink import ResultSink
+
+def event_name(message):
+    """Event name of a '42["name", ...]' frame without parsing the whole payload"""
+    if not message.startswith('42["'):
+        return None
+    end = message.find('"', 4)
+    return message[4:end] if end > 0 else None
+
+class AnswerAssembler:
+    """Builds one streamed answer incrementally from partial frames
+
+    A frame may carry a `delta` (new text only) or a cumulative `answer`
+    (the text so far), in which case only the unseen suffix is applied.
+    Text beyond `max_chars` is dropped and `truncated` is set, so memory
+    per in-flight query stays bounded.
+    """
+
+    def __init__(self, max_chars=200_000, callback=None):
+        self.max_chars = max_chars
+        self.callback = callback
+        self.chunks = []
+        self.length = 0
+        self.frames = 0
+        self.truncated = False
+        self.progress = 0
+        self.started = time.perf_counter()
+        self.first_chunk_at = None
+
+    def apply(self, data):
+        """Apply one partial frame and return the newly added text"""
+        self.frames += 1
+        self.progress = data.get("progress", self.progress)
+        if data.get("delta"):
+            delta = data["delta"]
+        elif data.get("answer"):
+            delta = data["answer"][self.length:]
+        else:
+            return ""
+        room = self.max_chars - self.length
+        if len(delta) > room:
+            delta = delta[:max(room, 0)]
+            self.truncated = True
+        if delta:
+            if self.first_chunk_at is None:
+                self.first_chunk_at = time.perf_counter()
+            self.chunks.append(delta)
+            self.length += len(delta)
+            if len(self.chunks) > 64:
+                self.chunks = ["".join(self.chunks)]
+        return delta
+
+    @property
+    def text(self):
+        if len(self.chunks) > 1:
+            self.chunks = ["".join(self.chunks)]
+        return self.chunks[0] if self.chunks else ""
+
 class PerplexityWebSocketMonitor:
-    def __init__(self):
+    def __init__(self, sink=None):
+        # Completed responses are appended to a rotating JSONL sink
+        self.sink = sink or ResultSink(prefix="perplexity_ws")
+        
         # Correct WebSocket endpoint for Perplexity.ai
         self.ws_url = "wss://www.perplexity.ai/socket.io/?EIO=4&transport=websocket"
         self.message_queue = Queue()
         self.connection_active = False
         self.ws = None
+        
+        # Streamed answers being assembled, keyed by session_id
+        self.assemblers = {}
+        self.on_partial = None  # optional callback(session_id, delta, assembler)
 
     def on_message(self, ws, message):
         """Handle incoming WebSocket messages"""
@@ -26,6 +95,11 @@ class PerplexityWebSocketMonitor:
                     self.process_response(data)
                 elif event_type == "progress_update":
                     print(f"Progress: {data.get('progress', 0)}%")
+                    assembler = self.assemblers.get(str(data.get("session_id")))
+                    if assembler:
+                        delta = assembler.apply(data)
+                        if delta and self.on_partial:
+                            self.on_partial(data.get("session_id"), delta, assembler)
                 
             self.message_queue.put(message)
         except Exception as e:
@@ -54,19 +128,17 @@ class PerplexityWebSocketMonitor:
 
     def process_response(self, data):
         """Process and save complete responses"""
+        assembler = self.assemblers.pop(str(data.get("session_id")), None)
         response = {
             "timestamp": int(time.time()),
             "query": data.get("query"),
-            "answer": data.get("answer"),
+            "answer": data.get("answer") or (assembler.text if assembler else None),
             "sources": data.get("sources", []),
             "related": data.get("related_questions", [])
         }
         
-        filename = f"perplexity_ws_{response['timestamp']}.json"
-        with open(filename, 'w') as f:
-            json.dump(response, f, indent=2)
-        
-        print(f"Saved response to {filename}")
+        self.sink.write(dict(response, backend="websocket"))
+        print(f"Queued response for {self.sink.directory}")
 
     def start_connection(self):
         """Establish WebSocket connection with SSL context"""
@@ -109,6 +181,7 @@ class PerplexityWebSocketMonitor:
             "session_id": str(random.randint(100000, 999999))
         }
         
+        self.assemblers[query_payload["session_id"]] = AnswerAssembler()
         message = f'42["query",{json.dumps(query_payload)}]'
         self.ws.send(message)
         return True
@@ -120,16 +193,245 @@ class PerplexityWebSocketMonitor:
         
         try:
             while time.time() - start_time < duration:
-                if not self.message_queue.empty():
-                    message = self.message_queue.get()
-                    print(f"Raw Message: {message[:200]}...")  # Truncate long messages
-                
-                time.sleep(0.1)
+                # Block on the queue instead of polling it
+                try:
+                    message = self.message_queue.get(timeout=max(0.0, duration - (time.time() - start_time)))
+                except Empty:
+                    continue
+                print(f"Raw Message: {message[:200]}...")  # Truncate long messages
                 
         except KeyboardInterrupt:
             print("Stopping monitor...")
         finally:
             self.ws.close()
+            self.sink.close()
+
+class AsyncPerplexityWebSocketClient:
+    """Asyncio socket.io client that multiplexes many queries over one connection
+
+    A reader task decodes engine.io/socket.io frames (answering pings) and
+    puts events on an asyncio.Queue. A consumer task waits on that queue and
+    resolves the per-query future whose `session_id` matches each
+    `query_response`. At most `max_in_flight` queries are outstanding.
+    """
+
+    def __init__(self, ws_url=None, headers=None, max_in_flight=64, query_timeout=120, sink=None,
+                 on_partial=None, max_answer_chars=200_000):
+        self.ws_url = ws_url or "wss://www.perplexity.ai/socket.io/?EIO=4&transport=websocket"
+        self.headers = headers or {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            "Origin": "https://www.perplexity.ai"
+        }
+        self.max_in_flight = max_in_flight
+        self.query_timeout = query_timeout
+        self.sink = sink
+        self.on_partial = on_partial  # callback(session_id, delta, assembler) for every streamed chunk
+        self.max_answer_chars = max_answer_chars
+
+        self.session = None
+        self.ws = None
+        self.events = None
+        self.pending = {}
+        self.assemblers = {}
+        self.semaphore = None
+        self.tasks = []
+        self.connected = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def connect(self):
+        """Open the socket, run the socket.io handshake and start the worker tasks"""
+        self.events = asyncio.Queue()
+        self.semaphore = asyncio.Semaphore(self.max_in_flight)
+        self.connected = asyncio.get_running_loop().create_future()
+        self.session = aiohttp.ClientSession(headers=self.headers)
+        ssl_context = ssl.create_default_context()
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+        self.ws = await self.session.ws_connect(self.ws_url, ssl=ssl_context, heartbeat=None)
+        self.tasks = [
+            asyncio.create_task(self._reader()),
+            asyncio.create_task(self._consumer())
+        ]
+        await asyncio.wait_for(self.connected, timeout=30)
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        self._fail_pending(ConnectionError("WebSocket closed"))
+        if self.ws:
+            await self.ws.close()
+        if self.session:
+            await self.session.close()
+
+    def _fail_pending(self, error):
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pending.clear()
+
+    async def _reader(self):
+        """Decode engine.io packets; socket.io events go to the queue"""
+        try:
+            async for msg in self.ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                data = msg.data
+                if data.startswith("0"):
+                    # engine.io open -> socket.io connect
+                    await self.ws.send_str('40{"token":null,"deviceId":"' + f"web:{random.randint(1000000000, 9999999999)}" + '"}')
+                elif data == "2":
+                    await self.ws.send_str("3")  # pong
+                elif data.startswith("40"):
+                    if not self.connected.done():
+                        self.connected.set_result(True)
+                elif data.startswith("42"):
+                    await self.events.put(data)
+        finally:
+            if not self.connected.done():
+                self.connected.set_exception(ConnectionError("WebSocket closed during handshake"))
+            self._fail_pending(ConnectionError("WebSocket closed"))
+
+    async def _consumer(self):
+        """Wait on the event queue and route responses to their query futures"""
+        while True:
+            message = await self.events.get()
+            if event_name(message) not in ("query_response", "progress_update"):
+                continue
+            try:
+                event_type, data = json.loads(message[2:])[:2]
+            except (ValueError, TypeError):
+                continue
+            # One bad event must not stop the consumer, or every query would hang
+            try:
+                if event_type == "query_response":
+                    self.handle_response(data)
+                elif event_type == "progress_update":
+                    self.handle_progress(data)
+            except Exception as e:
+                print(f"Error handling {event_type}: {e}")
+                session_id = data.get("session_id") if isinstance(data, dict) else None
+                self._fail(str(session_id), e)
+
+    def _fail(self, session_id, error):
+        """Fail one query's future without touching the others"""
+        future = self.pending.pop(session_id, None)
+        self.assemblers.pop(session_id, None)
+        if future and not future.done():
+            future.set_exception(error)
+
+    def handle_response(self, data):
+        """Resolve the future of the query this response belongs to"""
+        future = self.pending.pop(str(data.get("session_id")), None)
+        assembler = self.assemblers.pop(str(data.get("session_id")), None)
+        response = {
+            "timestamp": int(time.time()),
+            "session_id": data.get("session_id"),
+            "query": data.get("query"),
+            "answer": data.get("answer") or (assembler.text if assembler else None),
+            "sources": data.get("sources", []),
+            "related": data.get("related_questions", [])
+        }
+        if self.sink:
+            try:
+                self.sink.write(dict(response, backend="websocket"))
+            except Exception as e:
+                # The answer itself arrived; still hand it to the caller
+                print(f"Sink write failed for session {response['session_id']}: {e}")
+        if future and not future.done():
+            future.set_result(response)
+
+    def handle_progress(self, data):
+        """Apply a partial-answer frame and notify partial-result listeners"""
+        session_id = str(data.get("session_id"))
+        assembler = self.assemblers.get(session_id)
+        if not assembler:
+            return
+        delta = assembler.apply(data)
+        if not delta:
+            return
+        for callback in (assembler.callback, self.on_partial):
+            if callback:
+                try:
+                    callback(session_id, delta, assembler)
+                except Exception as e:
+                    print(f"on_partial callback failed for session {session_id}: {e}")
+                    self._fail(session_id, e)
+                    return
+
+    async def query(self, question, on_partial=None):
+        """Send one query and wait for its response
+
+        `on_partial(session_id, delta, assembler)` is called for every streamed
+        chunk of this query's answer before the final response arrives.
+        """
+        async with self.semaphore:
+            session_id = uuid.uuid4().hex
+            future = asyncio.get_running_loop().create_future()
+            self.pending[session_id] = future
+            assembler = AnswerAssembler(self.max_answer_chars, on_partial)
+            self.assemblers[session_id] = assembler
+            payload = {
+                "query": question,
+                "source": "web",
+                "language": "en",
+                "version": "2.0",
+                "session_id": session_id
+            }
+            start = assembler.started = time.perf_counter()
+            try:
+                await self.ws.send_str(f'42["query",{json.dumps(payload)}]')
+                response = await asyncio.wait_for(future, timeout=self.query_timeout)
+                response["latency"] = time.perf_counter() - start
+                response["first_chunk_latency"] = (assembler.first_chunk_at - start
+                                                   if assembler.first_chunk_at else response["latency"])
+                return response
+            finally:
+                self.pending.pop(session_id, None)
+                self.assemblers.pop(session_id, None)
+
+    async def stream(self, question):
+        """Yield ("partial", delta) as the answer streams in, then ("final", response)"""
+        chunks = asyncio.Queue()
+        task = asyncio.ensure_future(
+            self.query(question, on_partial=lambda sid, delta, assembler: chunks.put_nowait(delta)))
+        try:
+            while True:
+                getter = asyncio.ensure_future(chunks.get())
+                done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    yield "partial", getter.result()
+                    continue
+                getter.cancel()
+                while not chunks.empty():
+                    yield "partial", chunks.get_nowait()
+                yield "final", task.result()
+                return
+        finally:
+            task.cancel()
+
+    async def query_many(self, questions):
+        """Run many queries concurrently, yielding (question, response or exception) as they finish"""
+        async def run(question):
+            try:
+                return question, await self.query(question)
+            except Exception as e:
+                return question, e
+
+        tasks = [asyncio.ensure_future(run(q)) for q in questions]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
 
 if __name__ == "__main__":
     monitor = PerplexityWebSocketMonitor()